@@ -0,0 +1,2 @@
+# Offline benchmarks for both games, run against a local OpenAI-compatible stand-in server.
+# Usage: python -m benchmarks {serve,micro,games} --help
@@ -0,0 +1,69 @@
+import argparse
+import logging
+
+from .fake_server import FakeOpenAIServer, bracket_responder, wordle_responder, cached_responder
+
+def add_server_arguments(parser):
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds before each response (default: 0).")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Up to this many extra seconds of latency (default: 0).")
+    parser.add_argument("--stream-chunk-latency", type=float, default=0.0, help="Seconds between streamed chunks (default: 0).")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with a 500 (default: 0).")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with a 429 (default: 0).")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429s (default: 1).")
+    parser.add_argument("--cache-path", type=str, default=None, help="Serve responses recorded in this LLM response cache when present.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for latency jitter and injected failures (default: 0).")
+
+def make_server(args, game: str, port: int = 0) -> FakeOpenAIServer:
+    responder = bracket_responder if game == "bracket" else wordle_responder
+    if args.cache_path:
+        responder = cached_responder(args.cache_path, responder)
+    return FakeOpenAIServer(responder, latency=args.latency, jitter=args.jitter, stream_chunk_latency=args.stream_chunk_latency,
+                            error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate, retry_after=args.retry_after,
+                            seed=args.seed, port=port)
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Offline benchmarks against a local OpenAI-compatible server.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve = subparsers.add_parser("serve", help="Run the stand-in server in the foreground.")
+    serve.add_argument("--game", choices=["bracket", "wordle"], default="bracket", help="Which game's scripted responses to serve.")
+    serve.add_argument("--port", type=int, default=8765, help="Port to listen on (default: 8765).")
+    add_server_arguments(serve)
+
+    micro = subparsers.add_parser("micro", help="Time prompt building and response parsing on real puzzles.")
+    micro.add_argument("--dates", type=str, nargs="+", required=True, help="Puzzle dates to benchmark with.")
+    micro.add_argument("--repeat", type=int, default=5, help="timeit repeats; the best is reported (default: 5).")
+
+    games = subparsers.add_parser("games", help="Measure end-to-end games per second against the stand-in server.")
+    games.add_argument("--game", choices=["bracket", "wordle"], default="bracket")
+    games.add_argument("--models", type=str, nargs="+", default=["benchmark/model"], help="Model names sent to the server.")
+    games.add_argument("--puzzles", type=str, nargs="+", required=True, help="Puzzle dates (bracket) or target words (wordle).")
+    games.add_argument("--num-steps", type=int, default=20, help="Maximum steps per Bracket City game (default: 20).")
+    games.add_argument("--concurrency", type=int, default=8, help="Games in flight at once (default: 8).")
+    add_server_arguments(games)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.command == "serve":
+        server = make_server(args, args.game, args.port)
+        print(f"Serving on {server.base_url} (set OPENROUTER_BASE_URL to use it)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    elif args.command == "micro":
+        from . import micro
+        print(micro.format_results(micro.run(args.dates, args.repeat)))
+    else:
+        from . import games as game_benchmarks
+        if args.game == "bracket":
+            options = {"num_steps": args.num_steps, "max_concurrency": args.concurrency, "per_model_concurrency": args.concurrency}
+        else:
+            options = {"workers": args.concurrency}
+        with make_server(args, args.game) as server:
+            summary = game_benchmarks.run(server, args.game, args.models, args.puzzles, **options)
+        print(game_benchmarks.format_summary(summary))
+
+if __name__ == "__main__":
+    main()
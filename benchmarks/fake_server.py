@@ -0,0 +1,210 @@
+# Local OpenAI-compatible chat completions endpoint with scripted responses, latency, errors and 429s.
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_CLUE_ID = re.compile(r"^clue_id: (\S+)$", re.MULTILINE)
+
+def bracket_responder(model_name: str, prompt: str) -> str:
+    """Answers the first active clue listed in a Bracket City prompt (with a wrong answer, so games run to max steps)."""
+    match = _CLUE_ID.search(prompt)
+    return f"clue_id: {match.group(1) if match else 'unknown'}\nanswer: benchmark"
+
+def wordle_responder(model_name: str, prompt: str) -> str:
+    return "guess: crane"
+
+def scripted_responder(responses: list[str]):
+    """Returns the given responses in turn, cycling through them."""
+    lock = threading.Lock()
+    position = [0]
+    def respond(model_name: str, prompt: str) -> str:
+        with lock:
+            response = responses[position[0] % len(responses)]
+            position[0] += 1
+        return response
+    return respond
+
+def cached_responder(cache_path: str, fallback):
+    """
+    Serves responses recorded by bracket_city_eval.llm_cache, keyed the same way llm_utils keys them
+    (model, prompt and sampling params from the request), and falls back to `fallback` on a miss.
+    """
+    from bracket_city_eval.llm_cache import LLMCache
+    cache = LLMCache(cache_path, mode="read")
+    def respond(model_name: str, prompt: str, body: dict) -> str:
+        params = {"temperature": body.get("temperature"), "top_p": body.get("top_p"), "max_tokens": body.get("max_tokens")}
+        cached = cache.get(LLMCache.make_key(model_name, prompt, params))
+        return cached if cached is not None else fallback(model_name, prompt)
+    respond.wants_body = True
+    return respond
+
+class FakeOpenAIServer:
+    """
+    Serves POST <base_url>/chat/completions, streaming or not, from a responder(model_name, prompt) -> text.
+
+    latency: seconds before each response (plus up to `jitter` more), or per streamed chunk when
+    stream_chunk_latency is set. error_rate and rate_limit_rate are the fractions of requests answered
+    with a 500 or with a 429 carrying Retry-After. Usage counts are whitespace-split word counts; like
+    OpenRouter, usage includes a cost (price_per_token per token) when the request asks for it.
+    """
+
+    def __init__(self, responder=bracket_responder, latency: float = 0.0, jitter: float = 0.0,
+                 stream_chunk_latency: float = 0.0, error_rate: float = 0.0, rate_limit_rate: float = 0.0,
+                 retry_after: float = 1.0, price_per_token: float = 1e-6, seed: int | None = None,
+                 host: str = "127.0.0.1", port: int = 0):
+        self.responder = responder
+        self.latency = latency
+        self.jitter = jitter
+        self.stream_chunk_latency = stream_chunk_latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.price_per_token = price_per_token
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self.stats_lock = threading.Lock()
+        self.stats = {"requests": 0, "completions": 0, "errors": 0, "rate_limited": 0, "handling_seconds": 0.0}
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "FakeOpenAIServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def _roll(self) -> float:
+        with self._random_lock:
+            return self._random.random()
+
+    def _delay(self) -> float:
+        with self._random_lock:
+            return self.latency + self._random.random() * self.jitter
+
+    def _count(self, field: str, amount=1):
+        with self.stats_lock:
+            self.stats[field] += amount
+
+    def _respond(self, body: dict) -> str:
+        prompt = "\n".join(str(message.get("content", "")) for message in body.get("messages", []))
+        if getattr(self.responder, "wants_body", False):
+            return self.responder(body.get("model", ""), prompt, body)
+        return self.responder(body.get("model", ""), prompt)
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out in separate writes; with Nagle's algorithm the body would wait for the
+            # client's delayed ACK of the headers, adding ~40 ms to every response on a keep-alive connection
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status: int, payload: dict, headers: dict | None = None):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_chunk(self, data: str):
+                encoded = data.encode()
+                self.wfile.write(f"{len(encoded):x}\r\n".encode() + encoded + b"\r\n")
+                self.wfile.flush()
+
+            def do_POST(self):
+                start = time.perf_counter()
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                server._count("requests")
+                try:
+                    if not self.path.rstrip("/").endswith("/chat/completions"):
+                        self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+                        return
+                    roll = server._roll()
+                    if roll < server.rate_limit_rate:
+                        server._count("rate_limited")
+                        self._send_json(429, {"error": {"message": "Rate limit exceeded", "code": 429}},
+                                        {"Retry-After": str(server.retry_after)})
+                        return
+                    if roll < server.rate_limit_rate + server.error_rate:
+                        server._count("errors")
+                        self._send_json(500, {"error": {"message": "Injected server error", "code": 500}})
+                        return
+                    text = server._respond(body)
+                    if body.get("stream"):
+                        self._stream(body, text)
+                    else:
+                        time.sleep(server._delay())
+                        self._send_json(200, self._completion(body, text))
+                    server._count("completions")
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the client cancelled, e.g. a stream stopped early
+                finally:
+                    server._count("handling_seconds", time.perf_counter() - start)
+
+            def _usage(self, body: dict, text: str) -> dict:
+                prompt_tokens = sum(len(str(message.get("content", "")).split()) for message in body.get("messages", []))
+                completion_tokens = len(text.split())
+                usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                         "total_tokens": prompt_tokens + completion_tokens}
+                if (body.get("usage") or {}).get("include"):
+                    usage["cost"] = usage["total_tokens"] * server.price_per_token
+                return usage
+
+            def _completion(self, body: dict, text: str) -> dict:
+                return {"id": f"chatcmpl-{uuid.uuid4().hex}", "object": "chat.completion", "created": int(time.time()),
+                        "model": body.get("model", ""),
+                        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                        "usage": self._usage(body, text)}
+
+            def _stream(self, body: dict, text: str):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+                time.sleep(server._delay())
+                # One chunk per word, keeping the whitespace, like a token stream
+                for piece in re.findall(r"\s*\S+\s*", text) or [text]:
+                    chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                             "model": body.get("model", ""),
+                             "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+                    self._send_chunk(f"data: {json.dumps(chunk)}\n\n")
+                    if server.stream_chunk_latency:
+                        time.sleep(server.stream_chunk_latency)
+                if (body.get("stream_options") or {}).get("include_usage"):
+                    usage = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                             "model": body.get("model", ""), "choices": [], "usage": self._usage(body, text)}
+                    self._send_chunk(f"data: {json.dumps(usage)}\n\n")
+                self._send_chunk("data: [DONE]\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+
+        return Handler
@@ -0,0 +1,85 @@
+# End-to-end games per second and per-step harness overhead against the local stand-in server.
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bracket_city_eval"))
+
+def _span_seconds(results: list[dict], node: str) -> float:
+    return sum(span["seconds"] for result in results for span in result.get("timeline", []) if span["node"] == node)
+
+def summarize(results: list[dict], wall_seconds: float, steps: int, server_stats: dict) -> dict:
+    """
+    Throughput and overhead figures. Harness overhead per step is the game time not spent in call_llm;
+    client overhead per request is call_llm time not spent inside the server's request handler or queued
+    in the rate limiter.
+    """
+    llm_seconds = _span_seconds(results, "call_llm") + _span_seconds(results, "heal")
+    queue_seconds = sum(span.get("queue_seconds", 0.0) for result in results for span in result.get("timeline", []))
+    game_seconds = sum(span["seconds"] for result in results for span in result.get("timeline", []) if span["node"] != "heal")
+    requests = max(server_stats["requests"], 1)
+    return {
+        "games": len(results),
+        "steps": steps,
+        "wall_seconds": wall_seconds,
+        "games_per_second": len(results) / wall_seconds if wall_seconds else 0.0,
+        "steps_per_second": steps / wall_seconds if wall_seconds else 0.0,
+        "harness_overhead_per_step_ms": (game_seconds - llm_seconds) / max(steps, 1) * 1000,
+        "client_overhead_per_request_ms": (llm_seconds - queue_seconds - server_stats["handling_seconds"]) / requests * 1000,
+        "queue_seconds": queue_seconds,
+        "server": dict(server_stats),
+    }
+
+def run_bracket(models: list[str], dates: list[str], num_steps: int = 20, max_concurrency: int = 8,
+                per_model_concurrency: int = 4) -> tuple[list[dict], float, int]:
+    """Runs a sweep through sweep.run_sweep; the caller points OPENROUTER_BASE_URL at the server first."""
+    from sweep import run_sweep
+
+    with tempfile.TemporaryDirectory() as results_dir:
+        start = time.perf_counter()
+        results = asyncio.run(run_sweep(models, dates, num_steps=num_steps, max_concurrency=max_concurrency,
+                                        per_model_concurrency=per_model_concurrency, results_dir=results_dir))
+        wall_seconds = time.perf_counter() - start
+    return results, wall_seconds, sum(result["number_of_steps"] for result in results)
+
+def run_wordle(models: list[str], words: list[str], workers: int = 8) -> tuple[list[dict], float, int]:
+    """
+    Runs a batch through wordle_agent.batch.run_batch. Games use the streaming call path, since that is the
+    one whose base URL can be pointed at the server; llmutils picks its own endpoint.
+    """
+    from wordle_agent.batch import run_batch
+
+    with tempfile.TemporaryDirectory() as results_dir:
+        start = time.perf_counter()
+        results = run_batch(models, words, workers=workers, results_dir=results_dir, stream=True)
+        wall_seconds = time.perf_counter() - start
+    return results, wall_seconds, sum(result["turns"] for result in results)
+
+def run(server, game: str, models: list[str], puzzles: list[str], **kwargs) -> dict:
+    """
+    Points both games' LLM clients at `server` and runs one benchmark. The base URL is read when the
+    LLM modules are first imported, so this must run before anything imports them.
+    """
+    os.environ["OPENROUTER_BASE_URL"] = server.base_url
+    os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+    logging.getLogger().setLevel(logging.WARNING)
+    if game == "bracket":
+        results, wall_seconds, steps = run_bracket(models, puzzles, **kwargs)
+    else:
+        results, wall_seconds, steps = run_wordle(models, puzzles, **kwargs)
+    return summarize(results, wall_seconds, steps, server.stats)
+
+def format_summary(summary: dict) -> str:
+    server = summary["server"]
+    return "\n".join([
+        f"Games: {summary['games']} ({summary['steps']} steps) in {summary['wall_seconds']:.2f}s",
+        f"Throughput: {summary['games_per_second']:.2f} games/s, {summary['steps_per_second']:.1f} steps/s",
+        f"Harness overhead: {summary['harness_overhead_per_step_ms']:.2f} ms/step",
+        f"Client overhead: {summary['client_overhead_per_request_ms']:.2f} ms/request",
+        f"Rate limiter queue: {summary['queue_seconds']:.2f}s",
+        f"Server: {server['requests']} requests, {server['completions']} completions, "
+        f"{server['errors']} errors, {server['rate_limited']} rate limited",
+    ])
@@ -0,0 +1,64 @@
+# Microbenchmarks of the prompt building and response parsing done on every step, against real puzzles.
+import logging
+import os
+import sys
+import timeit
+
+# The bracket_city_eval modules import each other as top-level modules
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bracket_city_eval"))
+
+BRACKET_RESPONSE = "I think the clue refers to billiards.\nclue_id: {clue_id}\nanswer: billiards\n"
+WORDLE_RESPONSE = "The remaining letters suggest a common word.\nguess: crane"
+WORDLE_GUESSES = ["slate", "crony", "brick", "flame"]
+
+def time_call(function, repeat: int = 5) -> float:
+    """Best per-call time in seconds over `repeat` timeit runs of an autoranged number of calls."""
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+def bracket_benchmarks(dates: list[str], repeat: int = 5) -> dict:
+    """Per-call seconds for the Bracket City prompt and parsing functions, averaged over the puzzles of `dates`."""
+    from bracket_city_mcp.puzzle_loader import load_game_data_by_date
+    from bracket_city_mcp.game.game import Game
+    from graph import PromptBuilder, build_llm_message, parse_llm_response
+    from puzzles import new_game
+
+    totals = {"Game(load_game_data_by_date)": 0.0, "puzzles.new_game (cached)": 0.0, "build_llm_message": 0.0,
+              "PromptBuilder.build (cached)": 0.0, "parse_llm_response": 0.0}
+    for date_str in dates:
+        totals["Game(load_game_data_by_date)"] += time_call(lambda: Game(load_game_data_by_date(date_str)), repeat)
+        totals["puzzles.new_game (cached)"] += time_call(lambda: new_game(date_str), repeat)
+        game = new_game(date_str)
+        builder = PromptBuilder(game)
+        builder.build()
+        response = BRACKET_RESPONSE.format(clue_id=next(iter(game.active_clues)))
+        totals["build_llm_message"] += time_call(lambda: build_llm_message(game), repeat)
+        totals["PromptBuilder.build (cached)"] += time_call(builder.build, repeat)
+        totals["parse_llm_response"] += time_call(lambda: parse_llm_response(response), repeat)
+    return {name: total / len(dates) for name, total in totals.items()}
+
+def wordle_benchmarks(word: str = "crane", repeat: int = 5) -> dict:
+    from wordle import wordle
+    from wordle_agent.graph import format_history, parse_guess
+
+    game = wordle.Wordle(word, 6)
+    for guess in WORDLE_GUESSES:
+        game.guess_word(guess)
+    return {
+        "format_history": time_call(lambda: format_history(game), repeat),
+        "parse_guess": time_call(lambda: parse_guess(WORDLE_RESPONSE), repeat),
+    }
+
+def format_results(results: dict) -> str:
+    lines = [f"{'function':<32} {'per call':>12}"]
+    for name, seconds in results.items():
+        lines.append(f"{name:<32} {seconds * 1e6:>9.1f} us")
+    return "\n".join(lines)
+
+def run(dates: list[str], repeat: int = 5) -> dict:
+    logging.getLogger().setLevel(logging.WARNING)
+    results = {}
+    results.update(bracket_benchmarks(dates, repeat))
+    results.update(wordle_benchmarks(repeat=repeat))
+    return results
@@ -0,0 +1,77 @@
+import os
+import argparse
+import sys
+import logging
+import time
+
+# Add the script's directory to sys.path to allow direct import of repair
+sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+
+from error_log import DEFAULT_ERROR_LOG_DIR, load_errors
+from repair import repair_clue_answer
+from timeline import percentile
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+logger = logging.getLogger(__name__)
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure how many saved parse errors the local repair stage fixes, and how fast.")
+    parser.add_argument("--error-dir", default=None, help=f"Parse error log directory (default: {DEFAULT_ERROR_LOG_DIR}).")
+    parser.add_argument("--repeat", type=int, default=20, help="Times to repair each response when timing it (default: 20).")
+    parser.add_argument("--print-failures", action="store_true", help="Print the responses the local stage could not repair.")
+    parser.add_argument("--verbose", action="store_true", help="Print the repaired clue_id/answer of every response.")
+    args = parser.parse_args()
+
+    error_dir = args.error_dir or DEFAULT_ERROR_LOG_DIR
+    if not os.path.isdir(error_dir):
+        sys.exit(f"Error: The directory {error_dir} does not exist.")
+
+    entries = load_errors(error_dir)
+    if not entries:
+        logger.warning(f"No parse errors found in {error_dir}.")
+        return
+
+    # Logged entries carry the clues that were active, which the graph maps repaired clue ids onto;
+    # legacy .txt entries have no context, so they are repaired without it and reported separately
+    fixed = {True: 0, False: 0}
+    totals = {True: 0, False: 0}
+    failures = []
+    latencies = []
+    for number, entry in enumerate(entries):
+        text = entry["response"]
+        active_clues = entry.get("active_clue_ids")
+        has_context = active_clues is not None
+        # Legacy entries are named after their file, logged ones after their run and step
+        filename = entry.get("file") or f"#{number} (run {entry.get('run_id')}, step {entry.get('step')})"
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            clue_id, answer = repair_clue_answer(text, active_clues)
+        latencies.append((time.perf_counter() - start) / args.repeat)
+
+        totals[has_context] += 1
+        if clue_id and answer:
+            fixed[has_context] += 1
+            if args.verbose:
+                logger.info(f"{filename}: clue_id='{clue_id}', answer='{answer}'")
+        else:
+            failures.append((filename, text))
+
+    latencies.sort()
+    print(f"\n--- Local Repair Benchmark ---")
+    print(f"Fixed locally: {sum(fixed.values())} / {len(entries)} ({sum(fixed.values()) / len(entries):.1%}); "
+          f"the rest would go to the LLM healer")
+    for has_context, label in ((True, "with active clues"), (False, "legacy, without context")):
+        if totals[has_context]:
+            print(f"  {label}: {fixed[has_context]} / {totals[has_context]} "
+                  f"({fixed[has_context] / totals[has_context]:.1%})")
+    print(f"Latency per response: mean {sum(latencies) / len(latencies) * 1e6:.1f} us, "
+          f"p50 {percentile(latencies, 0.5) * 1e6:.1f} us, p95 {percentile(latencies, 0.95) * 1e6:.1f} us, "
+          f"max {latencies[-1] * 1e6:.1f} us")
+
+    if args.print_failures:
+        for filename, text in failures:
+            print(f"\nFilename: {filename}\n{text}")
+
+if __name__ == "__main__":
+    main()
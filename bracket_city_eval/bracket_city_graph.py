@@ -6,45 +6,134 @@ import os
 import time
 import sys
 
-from bracket_city_mcp.puzzle_loader import load_game_data_by_date
-from bracket_city_mcp.game.game import Game
-from langchain_community.callbacks import get_openai_callback
-
-from graph import app
-
 # Configure logging
 # Logging configuration will be handled after argument parsing
 
+from budget import budget_limits, configure_model_prices
+from checkpoints import invoke_options, load_checkpoint, open_checkpointer, run_config, usage_before_resume
+from error_log import configure_error_log
+from llm_cache import configure_cache
+from puzzles import configure_corpus, new_game
+from rate_limit import configure_rate_limits
+from results_store import append_result
+from startup_profile import start_profile, finish_profile
 from utils import parse_args # Import the new function
 
+def build_result(final_state, cb, date_str, model_name, run_id, start_time, end_time, usage_before_resume=None):
+    """
+    Builds the per-run result record from the final graph state and the token callback. For a resumed
+    run, usage_before_resume holds the tokens spent before the resume (see checkpoints.usage_before_resume).
+    The cost comes from the usage recorded in the state, which includes what OpenRouter reports.
+    """
+    usage_before_resume = usage_before_resume or {}
+    usage = final_state.get("usage")
+    return {
+        "game_completed": final_state["game_won"],
+        "status": final_state.get("status"),
+        "budget_exhausted": final_state.get("budget_exhausted"),
+        "number_of_steps": final_state["step_count"],
+        "llm_calls": final_state.get("llm_calls", 0),
+        "local_repairs": final_state.get("local_repairs", 0),
+        "llm_heals": final_state.get("llm_heals", 0),
+        "multi_answer": final_state.get("multi_answer", False),
+        "wave_mode": final_state.get("wave", False),
+        "waves": final_state.get("waves", 0),
+        "puzzle_date": date_str,
+        "model_name": model_name,
+        "prompt_tokens": cb.prompt_tokens + usage_before_resume.get("prompt_tokens", 0),
+        "prompt_tokens_cached": cb.prompt_tokens_cached,
+        "reasoning_token": cb.reasoning_tokens,
+        "completion_tokens": cb.completion_tokens + usage_before_resume.get("completion_tokens", 0),
+        "total_cost": usage["cost"] if usage else cb.total_cost,
+        "usage": usage,
+        "budget": final_state.get("budget"),
+        "prompt_render_seconds": final_state.get("render_seconds", 0.0),
+        "streaming": final_state.get("stream_stats"),
+        "hedging": final_state.get("hedge_stats"),
+        "timeline": final_state.get("timeline", []),
+        "run_id": run_id,
+        "resumed": bool(usage_before_resume),
+        "start_time": start_time,
+        "end_time": end_time
+    }
+
+def save_result(result, results_dir="./results"):
+    """Writes a result record to <results_dir>/<run_id>.json and the results store, and returns the path."""
+    os.makedirs(results_dir, exist_ok=True)
+
+    result_filepath = os.path.join(results_dir, f"{result['run_id']}.json")
+    with open(result_filepath, 'w') as f:
+        json.dump(result, f, indent=4)
+    append_result(results_dir, "bracket_city", result)
+
+    logging.info(f"Results saved to {result_filepath}")
+    return result_filepath
+
 def main():
     args = parse_args() # Call the new function
+    profiler = start_profile(args.startup_profile)
 
     # Configure logging based on parsed argument
     numeric_logging_level = getattr(logging, args.logging_level.upper(), None)
     if not isinstance(numeric_logging_level, int):
         raise ValueError(f"Invalid log level: {args.logging_level}")
     logging.basicConfig(level=numeric_logging_level, format='%(asctime)s - %(levelname)s - %(module)s - %(message)s')
+    configure_cache(args.cache, args.cache_path, args.cache_max_mb)
+    configure_rate_limits(args.rate_limits)
+    configure_corpus(args.puzzle_corpus)
+    configure_error_log(args.parse_error_dir, args.parse_error_max_mb)
+    # Replays make no calls, so they never fetch the price table
+    configure_model_prices(fetch=args.cache != "read")
 
-    logging.info(f"Using model: {args.model_name}") # Log the model name
-
-    run_id = str(uuid.uuid4())
-    # Load the game data for a specific date
-    game = Game(load_game_data_by_date(args.date_str))
-    logging.info(f"Date selected for puzzle: {args.date_str}")
-    
-    initial_state = {
-        "game": game,
-        "step_count": 0,
-        "max_steps": args.num_steps, # Use parsed num_steps
-        "model_name": args.model_name, # Pass model_name to the graph
-    }
+    # The game, langchain and langgraph modules are only imported once the arguments are valid,
+    # so --help and argument errors return without paying for them
+    from langchain_community.callbacks import get_openai_callback
+    from graph import get_app
+
+    checkpointer = open_checkpointer(args.checkpoint_path) if args.checkpoint or args.resume else None
+    app = get_app(checkpointer)
+    previous_usage = None
+
+    if args.resume:
+        run_id = args.resume
+        saved_state = load_checkpoint(app, run_id)
+        if saved_state is None:
+            sys.exit(f"Error: No checkpoint for run {run_id} in {args.checkpoint_path}.")
+        date_str, model_name = saved_state["puzzle_date"], saved_state["model_name"]
+        previous_usage = usage_before_resume(saved_state)
+        logging.info(f"Resuming run {run_id} at step {saved_state['step_count']}")
+        # None continues from the last checkpoint instead of starting over
+        graph_input = None
+    else:
+        run_id = str(uuid.uuid4())
+        date_str, model_name = args.date_str, args.model_name
+        # Load the game for a specific date from the local puzzle corpus
+        game = new_game(date_str)
+        graph_input = {
+            "game": game,
+            "step_count": 0,
+            "max_steps": args.num_steps, # Use parsed num_steps
+            "model_name": model_name, # Pass model_name to the graph
+            "multi_answer": args.multi_answer,
+            "wave": args.wave,
+            "stream": args.stream,
+            "hedge": args.hedge,
+            "provider_routes": args.race_providers,
+            "puzzle_date": date_str,
+            "run_id": run_id,
+            "budget": budget_limits(args),
+        }
+        if checkpointer is not None:
+            logging.info(f"Checkpointing run {run_id} to {args.checkpoint_path}; continue it with --resume {run_id}")
+
+    logging.info(f"Using model: {model_name}") # Log the model name
+    logging.info(f"Date selected for puzzle: {date_str}")
 
     with get_openai_callback() as cb:
         logging.info("Starting Bracket City Solver Graph...")
         # The graph will stream events as it runs
         start_time = time.time()
-        final_state = app.invoke(initial_state, {"recursion_limit": 1000})
+        final_state = app.invoke(graph_input, run_config(run_id), **invoke_options(checkpointer))
         end_time = time.time()
 
         logging.info("Graph Finished.")
@@ -53,29 +142,10 @@ def main():
         logging.debug(f"Final Game State:\n{final_state['game'].get_rendered_game_text()}")
         logging.debug(f"Token Usage: {cb}")
 
-        result = {
-            "game_completed": final_state["game_won"],
-            "number_of_steps": final_state["step_count"],
-            "puzzle_date": args.date_str, # Use args.date_str
-            "model_name": args.model_name, # Use args.model_name
-            "prompt_tokens": cb.prompt_tokens,
-            "prompt_tokens_cached": cb.prompt_tokens_cached,
-            "reasoning_token": cb.reasoning_tokens,
-            "completion_tokens": cb.completion_tokens,
-            "total_cost": cb.total_cost,
-            "run_id": run_id,
-            "start_time": start_time,
-            "end_time": end_time
-        }
-
-        results_dir = "./results"
-        os.makedirs(results_dir, exist_ok=True)
-
-        result_filepath = os.path.join(results_dir, f"{run_id}.json")
-        with open(result_filepath, 'w') as f:
-            json.dump(result, f, indent=4)
+        result = build_result(final_state, cb, date_str, model_name, run_id, start_time, end_time, previous_usage)
+        save_result(result)
 
-        logging.info(f"Results saved to {result_filepath}")
+    finish_profile(profiler)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
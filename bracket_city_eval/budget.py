@@ -0,0 +1,199 @@
+# Token and cost accounting for the game graphs, with per-game budgets checked before every step and
+# per-sweep budgets shared by all games of the process.
+# Shared by bracket_city_eval and wordle_agent, so it only imports other shared modules,
+# in a way that works both as part of the bracket_city_eval package and as a top-level module.
+import json
+import logging
+import os
+import threading
+import time
+
+try:
+    from .timeline import USAGE_FIELDS, add_usage_listener, record_tokens
+except ImportError:  # loaded as a top-level module by the bracket_city_eval scripts
+    from timeline import USAGE_FIELDS, add_usage_listener, record_tokens
+
+logger = logging.getLogger(__name__)
+
+# Status of a game that was ended by a budget rather than by winning or running out of steps
+BUDGET_EXHAUSTED = "budget_exhausted"
+
+# OpenRouter only reports what a request cost when the request asks for it
+USAGE_REQUEST = {"usage": {"include": True}}
+
+_LIMIT_HELP = {
+    "prompt_tokens": ("--max-prompt-tokens", int, "prompt tokens"),
+    "completion_tokens": ("--max-completion-tokens", int, "completion tokens (including reasoning tokens)"),
+    "reasoning_tokens": ("--max-reasoning-tokens", int, "reasoning tokens"),
+    "cost": ("--max-cost", float, "dollars"),
+}
+
+def add_budget_arguments(parser):
+    """Adds the per-game --max-prompt-tokens, --max-completion-tokens, --max-reasoning-tokens and --max-cost options."""
+    for option, type_, what in _LIMIT_HELP.values():
+        parser.add_argument(option, type=type_, default=None,
+                            help=f"End a game with status {BUDGET_EXHAUSTED} once it has used this many {what}.")
+
+def add_sweep_budget_arguments(parser):
+    """Adds the --sweep-max-* counterparts of add_budget_arguments, limiting all games of the run together."""
+    for option, type_, what in _LIMIT_HELP.values():
+        parser.add_argument(option.replace("--max-", "--sweep-max-"), type=type_, default=None,
+                            help=f"Stop all games once together they have used this many {what}; "
+                                 f"running games end with status {BUDGET_EXHAUSTED} and queued games are skipped.")
+
+def budget_limits(args, prefix: str = "max_") -> dict | None:
+    """The limits set on the command line, keyed by usage field, or None when there are none."""
+    limits = {field: getattr(args, prefix + field) for field in USAGE_FIELDS
+              if getattr(args, prefix + field, None) is not None}
+    return limits or None
+
+def exceeded(usage: dict | None, limits: dict | None) -> str | None:
+    """The first limit that usage has reached, described for logs and results, or None."""
+    for field, limit in (limits or {}).items():
+        used = (usage or {}).get(field, 0)
+        if used >= limit:
+            return f"{field} {used:g} reached the limit of {limit:g}"
+    return None
+
+class SweepBudget:
+    """Usage of every call made in the process, against limits shared by all of its games."""
+
+    def __init__(self, limits: dict):
+        self.limits = limits
+        self.usage = {field: 0 for field in USAGE_FIELDS}
+        self._lock = threading.Lock()
+
+    def charge(self, usage: dict):
+        with self._lock:
+            for field in USAGE_FIELDS:
+                self.usage[field] += usage.get(field, 0)
+
+    def exceeded(self) -> str | None:
+        with self._lock:
+            return exceeded(self.usage, self.limits)
+
+_sweep_budget = None
+
+def configure_sweep_budget(limits: dict | None) -> SweepBudget | None:
+    """Starts charging every recorded call to a process-wide budget with the given limits (None turns it off)."""
+    global _sweep_budget
+    _sweep_budget = SweepBudget(limits) if limits else None
+    return _sweep_budget
+
+def _charge_sweep(usage: dict):
+    budget = _sweep_budget
+    if budget is not None:
+        budget.charge(usage)
+
+add_usage_listener(_charge_sweep)
+
+def get_sweep_usage() -> dict | None:
+    return dict(_sweep_budget.usage) if _sweep_budget is not None else None
+
+def sweep_budget_exhausted() -> str | None:
+    """Why the sweep budget allows no more calls, or None."""
+    reason = _sweep_budget.exceeded() if _sweep_budget is not None else None
+    return f"sweep {reason}" if reason else None
+
+def budget_exhausted(state: dict) -> str | None:
+    """Why the game in state may not make another call: its own budget (state["budget"]) or the sweep's. None if it may."""
+    return exceeded(state.get("usage"), state.get("budget")) or sweep_budget_exhausted()
+
+# --- Cost of a call ---
+
+# Copy of the price table kept on disk, so that runs only fetch it once a day
+DEFAULT_PRICES_PATH = "./model-prices.json"
+PRICES_MAX_AGE_SECONDS = 24 * 3600
+
+_prices_lock = threading.Lock()
+# model -> (dollars per prompt token, dollars per completion token); None until first needed
+_model_prices = None
+_prices_source = {"base_url": None, "path": DEFAULT_PRICES_PATH, "fetch": True}
+
+def load_model_prices(base_url: str) -> dict:
+    """The price table of OpenRouter's model list at base_url. A blocking request; empty if it fails."""
+    import httpx
+    try:
+        response = httpx.get(f"{base_url}/models", timeout=10)
+        response.raise_for_status()
+        return {model["id"]: (float(model["pricing"]["prompt"]), float(model["pricing"]["completion"]))
+                for model in response.json()["data"] if model.get("pricing")}
+    except (httpx.HTTPError, ValueError, KeyError, TypeError) as e:
+        logger.warning(f"Could not load model prices from {base_url}/models; calls without a reported cost count as $0: {e}")
+        return {}
+
+def _read_prices_file(path: str, base_url: str, max_age: float | None) -> dict | None:
+    """The price table saved at path for base_url, or None if there is none or it is older than max_age seconds."""
+    try:
+        with open(path, "r") as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if saved.get("base_url") != base_url or (max_age is not None and time.time() - saved.get("fetched_at", 0) > max_age):
+        return None
+    return {model: tuple(prices) for model, prices in saved.get("prices", {}).items()}
+
+def _write_prices_file(path: str, base_url: str, prices: dict):
+    try:
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "w") as f:
+            json.dump({"base_url": base_url, "fetched_at": time.time(), "prices": prices}, f)
+        os.replace(path + ".tmp", path)
+    except OSError as e:
+        logger.warning(f"Could not save model prices to {path}: {e}")
+
+def configure_model_prices(base_url: str | None = None, path: str = DEFAULT_PRICES_PATH, fetch: bool = True):
+    """
+    Sets where the price table for calls whose response does not report a cost comes from: OpenRouter's
+    model list at base_url (default: $OPENROUTER_BASE_URL), saved at path. Nothing is loaded until a call
+    needs a price. With fetch=False, e.g. when replaying cached responses, only the saved copy is used.
+    """
+    global _model_prices
+    with _prices_lock:
+        _prices_source.update(base_url=base_url, path=path, fetch=fetch)
+        _model_prices = None
+
+def get_model_prices() -> dict:
+    """
+    The price table, loaded on first use from the saved copy, or from the network when that is missing or
+    more than a day old. The first call may block on that request, which is only made once per process.
+    """
+    global _model_prices
+    with _prices_lock:
+        if _model_prices is None:
+            base_url = _prices_source["base_url"] or os.environ.get("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+            path, fetch = _prices_source["path"], _prices_source["fetch"]
+            prices = _read_prices_file(path, base_url, PRICES_MAX_AGE_SECONDS if fetch else None)
+            if prices is None and fetch:
+                prices = load_model_prices(base_url)
+                if prices:
+                    _write_prices_file(path, base_url, prices)
+            _model_prices = prices or {}
+        return _model_prices
+
+def estimate_cost(model_name: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Cost of a call from the model's list prices; 0 for models without a known price."""
+    if not prompt_tokens and not completion_tokens:
+        return 0.0
+    prices = get_model_prices().get(model_name)
+    if prices is None:
+        return 0.0
+    return prompt_tokens * prices[0] + completion_tokens * prices[1]
+
+def record_usage(model_name: str, prompt_tokens: int | None, completion_tokens: int | None,
+                 reasoning_tokens: int | None = None, cost: float | None = None):
+    """
+    Records a call's tokens and cost on the current timeline span (and the sweep budget). Streams and
+    llmutils calls do not get the cost OpenRouter reports, so it is estimated from list prices.
+    """
+    if cost is None:
+        cost = estimate_cost(model_name, prompt_tokens or 0, completion_tokens or 0)
+    record_tokens(prompt_tokens, completion_tokens, reasoning_tokens, cost)
+
+def record_message_usage(message, model_name: str):
+    """record_usage for a langchain chat response, with the cost OpenRouter reported when USAGE_REQUEST was sent."""
+    usage = message.usage_metadata or {}
+    token_usage = (message.response_metadata or {}).get("token_usage") or {}
+    record_usage(model_name, usage.get("input_tokens"), usage.get("output_tokens"),
+                 (usage.get("output_token_details") or {}).get("reasoning"), token_usage.get("cost"))
@@ -0,0 +1,65 @@
+# Optional on-disk checkpointing of the game graphs, so an interrupted run can be resumed by run_id.
+# Shared by bracket_city_eval and wordle_agent, so it must not import sibling modules.
+import pickle
+
+DEFAULT_CHECKPOINT_PATH = "./checkpoints.sqlite"
+
+def add_checkpoint_arguments(parser):
+    """Adds the --checkpoint, --checkpoint-path and --resume options to an argparse parser."""
+    parser.add_argument("--checkpoint", action="store_true",
+                        help="Save the game state after every graph step so the run can be resumed with --resume.")
+    parser.add_argument("--checkpoint-path", type=str, default=DEFAULT_CHECKPOINT_PATH,
+                        help=f"SQLite file holding the checkpoints (default: {DEFAULT_CHECKPOINT_PATH}).")
+    parser.add_argument("--resume", type=str, default=None, metavar="RUN_ID",
+                        help="Continue a checkpointed run from its last completed step (implies --checkpoint).")
+
+def _serializer():
+    from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+    class PickleSerializer(JsonPlusSerializer):
+        """
+        Pickles checkpoints as a whole. The game objects in the state are plain Python classes that
+        msgpack would either reject or rebuild through their constructors, losing internal state, and a
+        single pickle keeps objects shared between channels (e.g. a PromptBuilder and its Game) shared.
+        """
+
+        def dumps_typed(self, obj):
+            if obj is None:
+                return super().dumps_typed(obj)
+            return "pickle", pickle.dumps(obj)
+
+    return PickleSerializer(pickle_fallback=True)
+
+def open_checkpointer(path: str = DEFAULT_CHECKPOINT_PATH):
+    """A SqliteSaver for the graphs' compile(checkpointer=...). Requires langgraph-checkpoint-sqlite."""
+    import sqlite3
+    from langgraph.checkpoint.sqlite import SqliteSaver
+
+    # The saver serializes access with its own lock, and graph nodes may run on other threads
+    conn = sqlite3.connect(path, check_same_thread=False)
+    return SqliteSaver(conn, serde=_serializer())
+
+def invoke_options(checkpointer) -> dict:
+    """
+    Keyword arguments for app.invoke. Nodes mutate the game objects in place, so each checkpoint has to be
+    written before the next node runs. langgraph rejects a durability mode when there is no checkpointer.
+    """
+    return {"durability": "sync"} if checkpointer is not None else {}
+
+def run_config(run_id: str, recursion_limit: int = 1000) -> dict:
+    """Graph config that stores and looks up checkpoints under the run's id."""
+    return {"recursion_limit": recursion_limit, "configurable": {"thread_id": run_id}}
+
+def load_checkpoint(app, run_id: str) -> dict | None:
+    """The state saved after the last completed step of run_id, or None if the run has no checkpoint."""
+    snapshot = app.get_state(run_config(run_id))
+    return snapshot.values or None
+
+def usage_before_resume(state: dict) -> dict:
+    """
+    Prompt and completion tokens recorded in a checkpointed state's timeline, to add to the token
+    callback of the resumed process, which only sees the calls made after the resume.
+    """
+    timeline = state.get("timeline") or []
+    return {"prompt_tokens": sum(record.get("prompt_tokens", 0) for record in timeline),
+            "completion_tokens": sum(record.get("completion_tokens", 0) for record in timeline)}
@@ -0,0 +1,193 @@
+# Append-only JSONL log of unparseable LLM responses with the context they occurred in, written off the
+# step loop by a background thread. Files are rotated by size and compressed with gzip.
+import argparse
+import atexit
+import gzip
+import json
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ERROR_LOG_DIR = "./parse-errors"
+DEFAULT_ERROR_LOG_MAX_MB = 64
+# Entries written per file write; the writer drains whatever is queued up to this many
+_BATCH_SIZE = 256
+
+class ErrorLog:
+    """
+    Writes entries (JSON-serializable dicts) to <directory>/errors-<start time>-<pid>-<n>.jsonl. Once the file
+    reaches max_bytes it is compressed to .jsonl.gz and a new one is started. Every process writes its own
+    files, so parallel runs can share a directory. write() only queues the entry; a daemon thread does the I/O.
+    """
+
+    def __init__(self, directory: str = DEFAULT_ERROR_LOG_DIR, max_bytes: int = DEFAULT_ERROR_LOG_MAX_MB * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.written = 0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._file = None
+        self._path = None
+        self._started = time.strftime("%Y%m%d-%H%M%S")
+        self._files = 0
+
+    def write(self, entry: dict):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="error-log", daemon=True)
+                self._thread.start()
+        self._queue.put(entry)
+
+    def flush(self):
+        """Blocks until every queued entry is on disk."""
+        self._queue.join()
+
+    def close(self):
+        """Writes the queued entries and compresses the current file."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < _BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            closing = None in batch
+            entries = [entry for entry in batch if entry is not None]
+            try:
+                if entries:
+                    self._append(entries)
+                if closing:
+                    self._rotate()
+            except (OSError, TypeError, ValueError) as e:
+                logger.error(f"Failed to write {len(entries)} entries to the error log in {self.directory}: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if closing:
+                return
+
+    def _append(self, entries: list[dict]):
+        if self._file is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._path = os.path.join(self.directory, f"errors-{self._started}-{os.getpid()}-{self._files:05d}.jsonl")
+            self._files += 1
+            self._file = open(self._path, "a", encoding="utf-8")
+        self._file.write("".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries))
+        self._file.flush()
+        self.written += len(entries)
+        if self._file.tell() >= self.max_bytes:
+            self._rotate()
+
+    def _rotate(self):
+        # Runs on the writer thread only
+        if self._file is None:
+            return
+        self._file.close()
+        with open(self._path, "rb") as source, gzip.open(self._path + ".gz", "wb") as target:
+            shutil.copyfileobj(source, target)
+        os.remove(self._path)
+        self._file = None
+        self._path = None
+
+_error_log = None
+_error_log_lock = threading.Lock()
+
+def add_error_log_arguments(parser):
+    """Adds the --parse-error-dir and --parse-error-max-mb options."""
+    parser.add_argument("--parse-error-dir", type=str, default=DEFAULT_ERROR_LOG_DIR,
+                        help=f"Directory of the unparseable response log (default: {DEFAULT_ERROR_LOG_DIR}).")
+    parser.add_argument("--parse-error-max-mb", type=int, default=DEFAULT_ERROR_LOG_MAX_MB,
+                        help=f"Size at which a log file is compressed and a new one started (default: {DEFAULT_ERROR_LOG_MAX_MB}).")
+
+def configure_error_log(directory: str = DEFAULT_ERROR_LOG_DIR, max_mb: int = DEFAULT_ERROR_LOG_MAX_MB) -> ErrorLog:
+    """Sets up the process-wide log used by log_parse_error, closing the previous one."""
+    global _error_log
+    with _error_log_lock:
+        previous, _error_log = _error_log, ErrorLog(directory, max_mb * 1024 * 1024)
+    if previous is not None:
+        previous.close()
+    return _error_log
+
+def get_error_log() -> ErrorLog:
+    """The process-wide log, created with the default settings on first use."""
+    global _error_log
+    with _error_log_lock:
+        if _error_log is None:
+            _error_log = ErrorLog()
+        return _error_log
+
+def _close_error_log():
+    if _error_log is not None:
+        _error_log.close()
+
+# The writer is a daemon thread, so queued entries are written out when the interpreter exits
+atexit.register(_close_error_log)
+
+def log_parse_error(response: str, context: dict | None = None):
+    """
+    Queues an unparseable response for the error log. context describes where it happened, e.g. run_id,
+    model_name, puzzle_date, step and active_clue_ids (see graph.error_context).
+    """
+    get_error_log().write({"time": time.time(), **(context or {}), "response": response})
+
+# --- Reading ---
+
+def _log_files(directory: str) -> list[str]:
+    names = [name for name in os.listdir(directory)
+             if name.startswith("errors-") and name.endswith((".jsonl", ".jsonl.gz"))]
+    return [os.path.join(directory, name) for name in sorted(names)]
+
+def iter_errors(directory: str = DEFAULT_ERROR_LOG_DIR, **filters):
+    """
+    Yields the entries logged in directory, oldest file first, keeping those whose fields equal every
+    keyword filter (e.g. model_name="..."). Responses saved as one .txt file each by earlier versions
+    are yielded as {"file": name, "response": text} when no filter is given.
+    """
+    if not os.path.isdir(directory):
+        return
+    for path in _log_files(directory):
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # a line cut short by a crash
+                if all(entry.get(field) == value for field, value in filters.items()):
+                    yield entry
+    if not filters:
+        for name in sorted(os.listdir(directory)):
+            if name.endswith(".txt"):
+                with open(os.path.join(directory, name), encoding="utf-8") as f:
+                    yield {"file": name, "response": f.read()}
+
+def load_errors(directory: str = DEFAULT_ERROR_LOG_DIR, **filters) -> list[dict]:
+    """iter_errors as a list."""
+    return list(iter_errors(directory, **filters))
+
+def main():
+    parser = argparse.ArgumentParser(description="Print the unparseable responses logged in an error log directory.")
+    parser.add_argument("directory", nargs="?", default=DEFAULT_ERROR_LOG_DIR,
+                        help=f"Error log directory (default: {DEFAULT_ERROR_LOG_DIR}).")
+    parser.add_argument("--model-name", type=str, default=None, help="Only entries of this model.")
+    parser.add_argument("--run-id", type=str, default=None, help="Only entries of this run.")
+    args = parser.parse_args()
+    filters = {field: value for field, value in (("model_name", args.model_name), ("run_id", args.run_id)) if value}
+    for entry in iter_errors(args.directory, **filters):
+        print(json.dumps(entry, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,24 @@
 from typing_extensions import TypedDict
 from bracket_city_mcp.game.game import Game
-from bracket_city_mcp.puzzle_loader import load_game_data_by_date
 
+import asyncio
+import functools
 import logging
-from langgraph.graph import StateGraph, END
-from llm_utils import call_llm_with_retry, heal_llm_output
+from llm_utils import call_llm_with_retry, acall_llm_with_retry, heal_llm_output
+from llm_utils import stream_llm_with_retry, astream_llm_with_retry
+from llm_utils import hedged_llm_with_retry, ahedged_llm_with_retry
+from llm_stream import add_stream_stats
+from budget import BUDGET_EXHAUSTED, budget_exhausted
+from error_log import log_parse_error
+from hedge import add_hedge_stats, run_sync
+from llm_cache import CacheMissError
+from repair import repair_clue_answers
+from timeline import span, timed_node, atimed_node
 
 import os
-import uuid # Added for generating unique filenames
-from pathlib import Path # Added for path manipulation
+import time
 
 
-# Ensure the parse-errors directory exists
-Path("./parse-errors").mkdir(parents=True, exist_ok=True)
-
 class State(TypedDict):
     game: Game
     llm_message: str | None
@@ -23,6 +28,28 @@ class State(TypedDict):
     game_over: bool
     game_won: bool
     model_name: str # Added model_name to state
+    prompt_builder: "PromptBuilder | None" # Created by pre_hook_node on the first step
+    render_seconds: float # Total time spent building prompts
+    multi_answer: bool # Allow several clue_id/answer pairs per LLM response
+    llm_calls: int # Number of LLM round trips, tracked separately from step_count
+    stream: bool # Stream responses and stop generating once a clue_id/answer pair has been written
+    stream_stats: dict | None # Running totals from llm_stream.add_stream_stats
+    local_repairs: int # Unparseable responses fixed by repair.py without an LLM call
+    llm_heals: int # Unparseable responses sent to heal_llm_output
+    timeline: list[dict] # One span per node run (see timeline.py)
+    puzzle_date: str | None # Kept so a checkpointed run can be resumed from its run_id alone
+    run_id: str | None # Identifies the run in the parse error log
+    hedge: bool # Duplicate calls that take longer than the model's p90 latency
+    provider_routes: list[str] | None # OpenRouter providers to race every call across
+    hedge_stats: dict | None # Running totals from hedge.add_hedge_stats
+    wave: bool # Prompt for every active clue concurrently and apply the answers together
+    wave_messages: dict[str, str] | None # clue_id -> prompt for the current wave, in the game's clue order
+    wave_responses: dict[str, str] | None # clue_id -> response, in the same order as wave_messages
+    waves: int # Number of waves of concurrent calls, tracked separately from step_count
+    usage: dict | None # Prompt, completion and reasoning tokens and cost so far, summed from the timeline
+    budget: dict | None # Limits on the usage fields that end the game early (see budget.py)
+    status: str | None # "won", "lost" or budget.BUDGET_EXHAUSTED once the game is over
+    budget_exhausted: str | None # The limit that ended the game, when a budget did
 
 game_instructions = """
 You are an expert at the bracket city game tasked with solving a puzzle that is provided to you. 
@@ -37,42 +64,153 @@ clue_id: [your_clue_id]
 answer: [your_answer]
 """
 
+multi_answer_conclusion = """Let me know which clues you want to answer and what your guesses are. You may answer several clues at once.
+Answers are checked in the order you give them and checking stops at the first incorrect answer, so list the answers you are most confident in first.
+Each answer should be structured as
+clue_id: [your_clue_id]
+answer: [your_answer]
+"""
+
+wave_conclusion = """Please only answer the clue above.
+Your answer should be structured as
+clue_id: [your_clue_id]
+answer: [your_answer]
+"""
+
+class PromptBuilder:
+    """
+    Builds the LLM message for one game and keeps rendered text between steps.
+
+    Only clues without unanswered nested clues are active, so an active clue's rendered text can only
+    change when that clue itself is answered. The builder therefore caches each clue's text (and the
+    rendered game text) and answer_clue_node invalidates just the clue it answered; newly activated
+    clues are rendered on first use.
+    """
+
+    def __init__(self, game: Game, multi_answer: bool = False):
+        self.game = game
+        self.conclusion = multi_answer_conclusion if multi_answer else conclusion
+        self._clue_text = {}
+        self._game_text = None
+        self.last_render_seconds = 0.0
+        self.total_render_seconds = 0.0
+
+    def invalidate(self, clue_id: str):
+        """Drops cached text affected by answering clue_id."""
+        self._clue_text.pop(clue_id, None)
+        clue = self.game.clues.get(clue_id)
+        if clue is not None and clue.completed:
+            # A correct answer is substituted into the puzzle text
+            self._game_text = None
+
+    def rendered_clue_text(self, clue_id: str) -> str:
+        text = self._clue_text.get(clue_id)
+        if text is None:
+            text = self.game.clues.get(clue_id).get_rendered_text(self.game)
+            self._clue_text[clue_id] = text
+        return text
+
+    def game_text(self) -> str:
+        """The rendered game text, re-rendered only after a correct answer."""
+        if self._game_text is None:
+            self._game_text = self.game.get_rendered_game_text()
+        return self._game_text
+
+    def build(self) -> str:
+        """
+        Build the LLM message based on the current game state.
+        Target:
+        {game instructions}
+        {rendered_game_state}
+        {active clues + previous guesses}
+        {conclusion structure}
+        """
+        start = time.perf_counter()
+        parts = [game_instructions, "\n\n", "The game state is as follows:\n", self.game_text(), "\n\n", "The available clues are:\n"]
+        for clue in self.game.active_clues:
+            parts.append(f"clue_id: {clue}\n")
+            parts.append(f"- text: {self.rendered_clue_text(clue)}\n")
+            parts.append(f"- previous guesses: {self.game.clues.get(clue).previous_answers}\n\n")
+        parts.append(self.conclusion + "\n")
+        output = "".join(parts)
+        self.last_render_seconds = time.perf_counter() - start
+        self.total_render_seconds += self.last_render_seconds
+        return output
+
+    def build_for_clue(self, clue_id: str) -> str:
+        """The LLM message for wave mode: the full game state, but only one clue to answer."""
+        start = time.perf_counter()
+        parts = [game_instructions, "\n\n", "The game state is as follows:\n", self.game_text(), "\n\n",
+                 "The clue to solve is:\n",
+                 f"clue_id: {clue_id}\n",
+                 f"- text: {self.rendered_clue_text(clue_id)}\n",
+                 f"- previous guesses: {self.game.clues.get(clue_id).previous_answers}\n\n",
+                 wave_conclusion + "\n"]
+        output = "".join(parts)
+        self.last_render_seconds = time.perf_counter() - start
+        self.total_render_seconds += self.last_render_seconds
+        return output
+
 def build_llm_message(game: Game) -> str:
     """
-    Build the LLM message based on the current game state.
-    Target:
-    {game instructions}
-    {rendered_game_state}
-    {active clues + previous guesses}
-    {conclusion structure}
-    """
-    output = ""
-    output += game_instructions + "\n\n"
-    output += "The game state is as follows:\n"
-    output += game.get_rendered_game_text() + "\n\n"
-    output += "The available clues are:\n"
-    for clue in game.active_clues:
-        output += f"clue_id: {clue}\n"
-        output += f"- text: {game.clues.get(clue).get_rendered_text(game)}\n"
-        output += f"- previous guesses: {game.clues.get(clue).previous_answers}\n\n"
-    output += conclusion + "\n"
-    return output
+    Build the LLM message based on the current game state, without reusing text from earlier steps.
+    The graph keeps a PromptBuilder in its state instead.
+    """
+    return PromptBuilder(game).build()
 
 def pre_hook_node(state: State):
     # The full state dump can be very verbose, consider logging specific parts if needed
     # logging.debug(f"Current state: {state}")
     logging.info(f"Steps: {state['step_count']}, Clues Answered: {len(list(filter(lambda x: x.completed, state['game'].clues.values())))}, Total Clues: {len(state['game'].clues)}")
     if state["step_count"] == state["max_steps"]:
-        return {"game_over": True, "game_won": False}
+        return {"game_over": True, "game_won": False, "status": "lost"}
     elif state["game"].is_complete:
-        return {"game_over": True, "game_won": True}
+        return {"game_over": True, "game_won": True, "status": "won"}
+    elif reason := budget_exhausted(state):
+        logging.warning(f"Ending the game at step {state['step_count']}: {reason}")
+        return {"game_over": True, "game_won": False, "status": BUDGET_EXHAUSTED, "budget_exhausted": reason}
     else:
-        llm_message = build_llm_message(state["game"])
-        logging.debug(f"Generated prompt for LLM: {llm_message}")
-        return {"llm_message": llm_message, "llm_response": "", "game_over": False, "game_won": False}
+        prompt_builder = state.get("prompt_builder") or PromptBuilder(state["game"], state.get("multi_answer", False))
+        if state.get("wave", False):
+            # Every answer costs a step, so a wave never has more clues than there are steps left
+            clue_ids = state["game"].active_clues[:state["max_steps"] - state["step_count"]]
+            wave_messages = {clue_id: prompt_builder.build_for_clue(clue_id) for clue_id in clue_ids}
+            logging.debug(f"Generated {len(wave_messages)} prompts for wave {state.get('waves', 0) + 1}")
+            return {"wave_messages": wave_messages, "llm_message": None, "llm_response": "", "game_over": False,
+                    "game_won": False, "prompt_builder": prompt_builder, "render_seconds": prompt_builder.total_render_seconds}
+        llm_message = prompt_builder.build()
+        logging.debug(f"Generated prompt for LLM in {prompt_builder.last_render_seconds * 1000:.2f}ms: {llm_message}")
+        return {"llm_message": llm_message, "llm_response": "", "game_over": False, "game_won": False,
+                "prompt_builder": prompt_builder, "render_seconds": prompt_builder.total_render_seconds}
     
+def answer_pair_detector():
+    """
+    Line detector for streamed responses: matches once a clue_id line has been followed by an answer line.
+    Stopping there means the first pair is used, where parse_llm_response would take the last one written.
+    """
+    seen_clue_id = False
+    def detect(line: str) -> bool:
+        nonlocal seen_clue_id
+        if line.startswith("clue_id:"):
+            seen_clue_id = True
+        return seen_clue_id and line.startswith("answer:")
+    return detect
+
+def _stream_options(state: State) -> dict:
+    # Several answers can follow the first pair in multi-answer mode, so those streams run to completion
+    # and only record when the first answer arrived
+    multi_answer = state.get("multi_answer", False)
+    return {"detect_answer": answer_pair_detector(), "stop_on_answer": not multi_answer,
+            "cache_tag": "clue_answer_pair"}
+
 def call_llm_node(state: State):
     logging.debug(f"Calling LLM with message: {state['llm_message']}")
+    if state.get("wave", False):
+        return wave_llm_node(state)
+    if state.get("stream", False):
+        return stream_llm_node(state)
+    if state.get("hedge", False) or state.get("provider_routes"):
+        return hedged_llm_node(state)
     # Use the new function from llm_utils
     try:
         response_content = call_llm_with_retry(
@@ -80,21 +218,153 @@ def call_llm_node(state: State):
             prompt_message=state["llm_message"]
         )
         logging.debug(f"LLM Response before healing: {response_content}")
-        return {"llm_response": response_content}
+        return {"llm_response": response_content, "llm_calls": state.get("llm_calls", 0) + 1}
             
 
+    except CacheMissError:
+        raise  # in replay mode; a replay that cannot be reproduced must fail, not take another path
     except Exception as e_call:
         # If retries fail, log the error and potentially set an error state or stop the graph.
         logging.error(f"LLM call failed after multiple retries: {e_call}")
         # Return empty string to allow parse_llm_response to handle it and save error file
-        return {"llm_response": ""}
+        return {"llm_response": "", "llm_calls": state.get("llm_calls", 0) + 1}
+
+def stream_llm_node(state: State):
+    """call_llm_node for streamed runs: cancels the generation once an answer has been written."""
+    try:
+        response_content, info = stream_llm_with_retry(state["model_name"], state["llm_message"], **_stream_options(state))
+        logging.debug(f"LLM Response before healing: {response_content}")
+        return {"llm_response": response_content, "llm_calls": state.get("llm_calls", 0) + 1,
+                "stream_stats": add_stream_stats(state.get("stream_stats"), info)}
+    except CacheMissError:
+        raise
+    except Exception as e_call:
+        logging.error(f"LLM call failed after multiple retries: {e_call}")
+        return {"llm_response": "", "llm_calls": state.get("llm_calls", 0) + 1}
+
+async def astream_llm_node(state: State):
+    """Async counterpart of stream_llm_node."""
+    try:
+        response_content, info = await astream_llm_with_retry(state["model_name"], state["llm_message"], **_stream_options(state))
+        logging.debug(f"LLM Response before healing: {response_content}")
+        return {"llm_response": response_content, "llm_calls": state.get("llm_calls", 0) + 1,
+                "stream_stats": add_stream_stats(state.get("stream_stats"), info)}
+    except CacheMissError:
+        raise
+    except Exception as e_call:
+        logging.error(f"LLM call failed after multiple retries: {e_call}")
+        return {"llm_response": "", "llm_calls": state.get("llm_calls", 0) + 1}
+
+def hedged_llm_node(state: State):
+    """call_llm_node for hedged or raced calls: the first of several requests to answer wins."""
+    try:
+        response_content, info = hedged_llm_with_retry(state["model_name"], state["llm_message"],
+                                                       state.get("hedge", False), state.get("provider_routes"))
+        logging.debug(f"LLM Response before healing: {response_content}")
+        return {"llm_response": response_content, "llm_calls": state.get("llm_calls", 0) + 1,
+                "hedge_stats": add_hedge_stats(state.get("hedge_stats"), info)}
+    except CacheMissError:
+        raise
+    except Exception as e_call:
+        logging.error(f"LLM call failed after multiple retries: {e_call}")
+        return {"llm_response": "", "llm_calls": state.get("llm_calls", 0) + 1}
 
-def parse_llm_response(llm_response: str):
+async def ahedged_llm_node(state: State):
+    """Async counterpart of hedged_llm_node."""
+    try:
+        response_content, info = await ahedged_llm_with_retry(state["model_name"], state["llm_message"],
+                                                              state.get("hedge", False), state.get("provider_routes"))
+        logging.debug(f"LLM Response before healing: {response_content}")
+        return {"llm_response": response_content, "llm_calls": state.get("llm_calls", 0) + 1,
+                "hedge_stats": add_hedge_stats(state.get("hedge_stats"), info)}
+    except CacheMissError:
+        raise
+    except Exception as e_call:
+        logging.error(f"LLM call failed after multiple retries: {e_call}")
+        return {"llm_response": "", "llm_calls": state.get("llm_calls", 0) + 1}
+
+async def _acall_wave(state: State) -> tuple[dict[str, str], dict | None]:
+    """Sends every prompt of the wave at once. Returns the responses by clue_id and the updated hedge_stats."""
+    hedged = state.get("hedge", False) or state.get("provider_routes")
+
+    async def call(clue_id: str, message: str):
+        try:
+            if hedged:
+                return await ahedged_llm_with_retry(state["model_name"], message,
+                                                    state.get("hedge", False), state.get("provider_routes"))
+            return await acall_llm_with_retry(model_name=state["model_name"], prompt_message=message), None
+        except CacheMissError:
+            raise
+        except Exception as e_call:
+            logging.error(f"LLM call for clue '{clue_id}' failed after multiple retries: {e_call}")
+            return "", None
+
+    wave_messages = state["wave_messages"]
+    outcomes = await asyncio.gather(*(call(clue_id, message) for clue_id, message in wave_messages.items()))
+    hedge_stats = state.get("hedge_stats")
+    if hedged:
+        for _, info in outcomes:
+            hedge_stats = add_hedge_stats(hedge_stats, info)
+    return {clue_id: text for clue_id, (text, _) in zip(wave_messages, outcomes)}, hedge_stats
+
+def _wave_update(state: State, responses: dict[str, str], hedge_stats: dict | None) -> dict:
+    return {"wave_responses": responses, "hedge_stats": hedge_stats, "waves": state.get("waves", 0) + 1,
+            "llm_calls": state.get("llm_calls", 0) + len(responses)}
+
+def wave_llm_node(state: State):
+    """call_llm_node for wave mode: one concurrent call per clue of the wave."""
+    # Concurrent calls need an event loop; synchronous runs share the one hedge.run_sync drives
+    responses, hedge_stats = run_sync(lambda: _acall_wave(state))
+    return _wave_update(state, responses, hedge_stats)
+
+async def awave_llm_node(state: State):
+    """Async counterpart of wave_llm_node."""
+    responses, hedge_stats = await _acall_wave(state)
+    return _wave_update(state, responses, hedge_stats)
+
+async def acall_llm_node(state: State):
+    """Async counterpart of call_llm_node, picked up when the graph is run with app.ainvoke."""
+    logging.debug(f"Calling LLM asynchronously with message: {state['llm_message']}")
+    if state.get("wave", False):
+        return await awave_llm_node(state)
+    if state.get("stream", False):
+        return await astream_llm_node(state)
+    if state.get("hedge", False) or state.get("provider_routes"):
+        return await ahedged_llm_node(state)
+    try:
+        response_content = await acall_llm_with_retry(
+            model_name=state["model_name"],
+            prompt_message=state["llm_message"]
+        )
+        logging.debug(f"LLM Response before healing: {response_content}")
+        return {"llm_response": response_content, "llm_calls": state.get("llm_calls", 0) + 1}
+    except CacheMissError:
+        raise
+    except Exception as e_call:
+        logging.error(f"LLM call failed after multiple retries: {e_call}")
+        return {"llm_response": "", "llm_calls": state.get("llm_calls", 0) + 1}
+
+def error_context(state: State, stage: str, clue_id: str | None = None) -> dict:
+    """Where an unparseable response came from, for the parse error log (see error_log.py)."""
+    context = {"run_id": state.get("run_id"), "model_name": state.get("model_name"),
+               "puzzle_date": state.get("puzzle_date"), "step": state.get("step_count"),
+               "active_clue_ids": list(state["game"].active_clues), "stage": stage}
+    if clue_id is not None:
+        context["clue_id"] = clue_id
+    return context
+
+def save_parse_error(llm_response: str, context: dict | None = None):
+    """Queues an unparseable LLM response, with the context it occurred in, for the parse error log."""
+    log_parse_error(llm_response, context)
+    logging.debug(f"Logged unparseable LLM response ({context or 'no context'})")
+
+def parse_llm_response(llm_response: str, context: dict | None = None, save_errors: bool = True):
     """
     Parse the LLM response to extract the clue ID and answer.
     The response should be structured as:
     clue_id: [your_clue_id]
     answer: [your_answer]
+    Unparseable responses are logged with context (see error_context) unless save_errors is False.
     """
     lines = llm_response.split("\n")
     clue_id = None
@@ -113,51 +383,159 @@ def parse_llm_response(llm_response: str):
 
     if clue_id is None or answer is None:
         logging.warning(f"Could not parse clue_id or answer from LLM response: {llm_response}")
-        # The parse-errors directory should be created at the top of the script.
-        # Adding a try-except here for robustness in writing the error file.
-        error_filename = f"./parse-errors/{uuid.uuid4()}.txt"
-        try:
-            with open(error_filename, "w") as f:
-                f.write(llm_response)
-            logging.info(f"Saved unparseable LLM response to {error_filename}")
-        except Exception as e_write:
-            logging.error(f"Failed to write unparseable LLM response to {error_filename}: {e_write}")
+        if save_errors:
+            save_parse_error(llm_response, context)
         return None, None # Explicitly return a tuple of (None, None)
 
     return clue_id, answer
 
-def answer_clue_node(state: State):
-    # parse_llm_response now always returns a tuple (clue_id, answer) or (None, None)
-    clue_id, answer = parse_llm_response(state["llm_response"])
-
-    if clue_id is None or answer is None:
-        try:
-            healed_response_content = heal_llm_output(state["llm_response"])
-            logging.debug(f"LLM Response after healing: {healed_response_content}")
-            clue_id, answer = parse_llm_response(healed_response_content)
-        except Exception as e_heal:
-            logging.error(f"LLM healing failed: {e_heal}. Proceeding with unhealed response.")
-            # Fallback to unhealed response if healing fails to prevent cycle break
-
-    logging.debug(f"Attempting to answer clue_id: {clue_id} with answer: {answer}")
+def parse_llm_responses(llm_response: str, context: dict | None = None) -> list[tuple[str, str]]:
+    """
+    Parse every clue_id/answer pair from a multi-answer LLM response, in the order they appear.
+    Each pair is a clue_id line followed by an answer line. Returns an empty list (and logs
+    the response with context) when no complete pair is found.
+    """
+    pairs = []
+    clue_id = None
+    for line in llm_response.split("\n"):
+        if line.startswith("clue_id:"):
+            clue_id = line.split(":", 1)[1].strip()
+        elif line.startswith("answer:") and clue_id is not None:
+            pairs.append((clue_id, line.split(":", 1)[1].strip()))
+            clue_id = None
 
-    if clue_id is None or answer is None:
-        logging.warning(f"Cannot answer clue due to parsing failure (clue_id or answer is None). Response may have been saved to ./parse-errors/.")
-        return {"step_count": state["step_count"] + 1, "llm_message": None, "llm_response": None}
+    if not pairs:
+        logging.warning(f"Could not parse any clue_id/answer pair from LLM response: {llm_response}")
+        save_parse_error(llm_response, context)
+    return pairs
 
+def answer_clue(state: State, clue_id: str, answer: str) -> bool:
+    """Submits one answer to the game and returns whether it was correct."""
     game_instance = state["game"]
 
     # Check if the clue_id from LLM is valid before trying to answer
     if not game_instance.clues.get(clue_id):
         logging.error(f"Clue with id '{clue_id}' not found in game state. LLM may have hallucinated a clue_id.")
-        return {"step_count": state["step_count"] + 1, "llm_message": None, "llm_response": None}
+        return False
 
     game_instance.answer_clue(clue_id, answer)
+    if state.get("prompt_builder") is not None:
+        state["prompt_builder"].invalidate(clue_id)
     clue_after_answer = game_instance.clues.get(clue_id)
     is_correct = clue_after_answer.completed if clue_after_answer else False # Should exist
     logging.debug(f"Answered clue_id: {clue_id} with answer: {answer}. Correct: {is_correct}")
+    return is_correct
 
-    return {"step_count": state["step_count"] + 1,  "llm_message": None, "llm_response": None}
+def wave_answer(state: State, clue_id: str, response: str) -> tuple[str | None, dict]:
+    """
+    The answer to clue_id in its wave response, parsed, repaired locally or healed like a single-answer
+    response, and the updated repair counters. The prompt names the clue, so the answer is applied to it
+    even if the response gives another clue_id.
+    """
+    counts = {}
+    parsed_id, answer = parse_llm_response(response, error_context(state, "wave", clue_id))
+    if answer is None and response:
+        pairs = repair_clue_answers(response, [clue_id], state["game"].clues)
+        if pairs:
+            parsed_id, answer = pairs[-1]
+            logging.info(f"Repaired unparseable LLM response for clue '{clue_id}' locally: {answer}")
+            counts["local_repairs"] = state.get("local_repairs", 0) + 1
+    if answer is None:
+        counts["llm_heals"] = state.get("llm_heals", 0) + 1
+        try:
+            with span("heal", state["step_count"]):
+                parsed_id, answer = parse_llm_response(heal_llm_output(response),
+                                                       error_context(state, "healed", clue_id))
+        except CacheMissError:
+            raise
+        except Exception as e_heal:
+            logging.error(f"LLM healing failed for clue '{clue_id}': {e_heal}.")
+    if answer is not None and parsed_id != clue_id:
+        logging.warning(f"Response for clue '{clue_id}' names clue '{parsed_id}'; applying the answer to '{clue_id}'.")
+    return answer, counts
+
+def answer_wave_node(state: State):
+    """
+    answer_clue_node for wave mode. Answers are applied in the order of the wave's clues, whatever order
+    the responses arrived in, so a run is reproducible from its responses. Every clue of the wave costs a
+    step, answered or not, as if it had been sent in its own round trip.
+    """
+    game = state["game"]
+    step_count = state["step_count"]
+    counts = {}
+    for clue_id, response in state["wave_responses"].items():
+        if step_count >= state["max_steps"] or game.is_complete:
+            break
+        answer, repair_counts = wave_answer({**state, **counts}, clue_id, response)
+        counts.update(repair_counts)
+        step_count += 1
+        if answer is None:
+            logging.warning(f"Cannot answer clue '{clue_id}' due to parsing failure.")
+        elif clue_id not in game.active_clues:
+            logging.warning(f"Clue '{clue_id}' is no longer active. Skipping its answer.")
+        else:
+            answer_clue(state, clue_id, answer)
+    return {"step_count": step_count, "wave_messages": None, "wave_responses": None, **counts}
+
+def answer_clue_node(state: State):
+    if state.get("wave", False):
+        return answer_wave_node(state)
+    multi_answer = state.get("multi_answer", False)
+    if multi_answer:
+        pairs = parse_llm_responses(state["llm_response"], error_context(state, "multi_answer"))
+    else:
+        # parse_llm_response now always returns a tuple (clue_id, answer) or (None, None)
+        clue_id, answer = parse_llm_response(state["llm_response"], error_context(state, "response"))
+        pairs = [] if clue_id is None or answer is None else [(clue_id, answer)]
+
+    repair_counts = {}
+    if not pairs and state["llm_response"]:
+        # Most malformed responses only differ in markup or key spelling; fix those locally first
+        pairs = repair_clue_answers(state["llm_response"], state["game"].active_clues, state["game"].clues)
+        if not multi_answer:
+            pairs = pairs[-1:]
+        if pairs:
+            logging.info(f"Repaired unparseable LLM response locally: {pairs}")
+            repair_counts["local_repairs"] = state.get("local_repairs", 0) + 1
+
+    if not pairs:
+        repair_counts["llm_heals"] = state.get("llm_heals", 0) + 1
+        try:
+            with span("heal", state["step_count"]):
+                healed_response_content = heal_llm_output(state["llm_response"])
+            logging.debug(f"LLM Response after healing: {healed_response_content}")
+            clue_id, answer = parse_llm_response(healed_response_content, error_context(state, "healed"))
+            if clue_id is not None and answer is not None:
+                pairs = [(clue_id, answer)]
+        except CacheMissError:
+            raise
+        except Exception as e_heal:
+            logging.error(f"LLM healing failed: {e_heal}. Proceeding with unhealed response.")
+            # Fallback to unhealed response if healing fails to prevent cycle break
+
+    if not pairs:
+        logging.warning(f"Cannot answer clue due to parsing failure (clue_id or answer is None). It was logged to the parse error log.")
+        return {"step_count": state["step_count"] + 1, "llm_message": None, "llm_response": None, **repair_counts}
+
+    # Every submitted answer costs one step, as if it had been sent in its own round trip,
+    # so step counts stay comparable with single-answer runs.
+    step_count = state["step_count"]
+    for clue_id, answer in pairs:
+        if step_count >= state["max_steps"] or state["game"].is_complete:
+            break
+        logging.debug(f"Attempting to answer clue_id: {clue_id} with answer: {answer}")
+        if multi_answer and clue_id not in state["game"].active_clues and state["game"].clues.get(clue_id):
+            # The model may answer a parent clue whose nested clues are still unanswered
+            logging.warning(f"Clue '{clue_id}' is not active yet. Skipping the remaining answers in this response.")
+            step_count += 1
+            break
+        step_count += 1
+        if not answer_clue(state, clue_id, answer):
+            if len(pairs) > 1:
+                logging.info(f"Answer for clue '{clue_id}' was not accepted. Skipping the remaining answers in this response.")
+            break
+
+    return {"step_count": step_count, "llm_message": None, "llm_response": None, **repair_counts}
 
 # --- Conditional Edge Logic ---
 
@@ -170,33 +548,52 @@ def should_continue(state: State):
 
 # --- Graph Compilation ---
 
-# 1. Initialize the StateGraph
-workflow = StateGraph(State)
-
-# 2. Add the nodes
-workflow.add_node("pre_hook", pre_hook_node)
-workflow.add_node("call_llm", call_llm_node)
-workflow.add_node("answer_clue", answer_clue_node)
-
-# 3. Set the entry point
-workflow.set_entry_point("pre_hook")
-
-# 4. Add the conditional edge
-# After the pre_hook, it will check the `should_continue` function.
-# If it returns "end", the graph finishes.
-# If it returns "call_llm", it proceeds to that node.
-workflow.add_conditional_edges(
-    "pre_hook",
-    should_continue,
-    {
-        "end": END,
-        "call_llm": "call_llm",
-    },
-)
-
-# 5. Add the regular edges to form the loop
-workflow.add_edge("call_llm", "answer_clue")
-workflow.add_edge("answer_clue", "pre_hook")
-
-# 6. Compile the graph
-app = workflow.compile()
\ No newline at end of file
+@functools.cache
+def get_app(checkpointer=None):
+    """
+    Builds and compiles the solver graph on first use. langgraph is imported here rather than at module
+    load so that importing this module (e.g. for parse_llm_response) stays cheap. With a checkpointer
+    (see checkpoints.py) the state is saved after every step under the config's thread_id.
+    """
+    from langgraph.graph import StateGraph, END
+    from langchain_core.runnables import RunnableLambda
+
+    # 1. Initialize the StateGraph
+    workflow = StateGraph(State)
+
+    # 2. Add the nodes
+    # Every node records a span in state["timeline"]
+    workflow.add_node("pre_hook", timed_node("pre_hook", pre_hook_node))
+    # call_llm runs call_llm_node under app.invoke and acall_llm_node under app.ainvoke
+    workflow.add_node("call_llm", RunnableLambda(timed_node("call_llm", call_llm_node),
+                                                 afunc=atimed_node("call_llm", acall_llm_node), name="call_llm"))
+    workflow.add_node("answer_clue", timed_node("answer_clue", answer_clue_node))
+
+    # 3. Set the entry point
+    workflow.set_entry_point("pre_hook")
+
+    # 4. Add the conditional edge
+    # After the pre_hook, it will check the `should_continue` function.
+    # If it returns "end", the graph finishes.
+    # If it returns "call_llm", it proceeds to that node.
+    workflow.add_conditional_edges(
+        "pre_hook",
+        should_continue,
+        {
+            "end": END,
+            "call_llm": "call_llm",
+        },
+    )
+
+    # 5. Add the regular edges to form the loop
+    workflow.add_edge("call_llm", "answer_clue")
+    workflow.add_edge("answer_clue", "pre_hook")
+
+    # 6. Compile the graph
+    return workflow.compile(checkpointer=checkpointer)
+
+def __getattr__(name):
+    # Keeps `graph.app` working for existing callers while compiling lazily
+    if name == "app":
+        return get_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,110 @@
+# Hedged and raced LLM requests: a duplicate of a request that is slower than the model's p90, or one
+# request per equivalent provider route, where the first response wins and the others are cancelled.
+# Shared by bracket_city_eval and wordle_agent, so it must not import sibling modules.
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+from collections import deque
+
+# A model is hedged once this many latencies have been observed; until then its p90 is not meaningful
+MIN_SAMPLES = 10
+# Latencies kept per model
+_SAMPLES = 200
+HEDGE_PERCENTILE = 0.90
+
+_latency_lock = threading.Lock()
+_latencies = {}  # model_name -> deque of seconds per successful request
+
+def record_latency(model_name: str, seconds: float):
+    with _latency_lock:
+        _latencies.setdefault(model_name, deque(maxlen=_SAMPLES)).append(seconds)
+
+def hedge_delay(model_name: str) -> float | None:
+    """Seconds after which a request to model_name gets a duplicate: its observed p90, or None while unknown."""
+    with _latency_lock:
+        samples = sorted(_latencies.get(model_name, ()))
+    if len(samples) < MIN_SAMPLES:
+        return None
+    return samples[min(int(HEDGE_PERCENTILE * len(samples)), len(samples) - 1)]
+
+async def race(model_name: str, attempts: list, delays: list[float]) -> tuple[object, dict]:
+    """
+    Runs attempts (zero-argument coroutine functions), the i-th starting delays[i] seconds after the first
+    (delays are non-decreasing) or as soon as every running attempt has failed. Returns the result of the
+    first attempt to succeed and cancels the others; raises the last error if all of them fail.
+
+    info: attempts started, the index of the winner, how many were cancelled and the seconds taken.
+    """
+    start = time.perf_counter()
+    running = {}  # task -> (index, start)
+    started = 0
+    last_error = None
+
+    def launch():
+        nonlocal started
+        running[asyncio.ensure_future(attempts[started]())] = (started, time.perf_counter())
+        started += 1
+
+    try:
+        launch()
+        while running or started < len(attempts):
+            elapsed = time.perf_counter() - start
+            while started < len(attempts) and (delays[started] <= elapsed or not running):
+                launch()
+            timeout = max(0.0, delays[started] - elapsed) if started < len(attempts) else None
+            done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                index, attempt_start = running.pop(task)
+                if task.exception() is not None:
+                    last_error = task.exception()
+                    continue
+                record_latency(model_name, time.perf_counter() - attempt_start)
+                return task.result(), {"attempts": started, "winner": index, "cancelled": len(running),
+                                       "seconds": time.perf_counter() - start}
+        raise last_error
+    finally:
+        # The losers, or every attempt if the caller was cancelled
+        losers = list(running)
+        for loser in losers:
+            loser.cancel()
+        await asyncio.gather(*losers, return_exceptions=True)
+
+@functools.cache
+def _background_loop() -> asyncio.AbstractEventLoop:
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="hedge-loop", daemon=True).start()
+    return loop
+
+async def _in_context(context: contextvars.Context, coroutine_function):
+    # Carries the caller's context variables (e.g. the open timeline span) over to the loop's thread
+    for var, value in context.items():
+        var.set(value)
+    return await coroutine_function()
+
+def run_sync(coroutine_function):
+    """
+    Runs coroutine_function() to completion from synchronous code. Racing needs cancellable requests, so
+    synchronous callers share one background event loop, which also keeps its connection pools warm.
+    """
+    future = asyncio.run_coroutine_threadsafe(_in_context(contextvars.copy_context(), coroutine_function),
+                                              _background_loop())
+    return future.result()
+
+def add_hedge_stats(totals: dict | None, info: dict | None) -> dict:
+    """
+    Folds one hedged or raced call into running totals. Cancelled requests are billed for at least their
+    prompt, but the provider never reports them, so their tokens are estimated from the winner's usage.
+    """
+    totals = dict(totals or {"calls": 0, "extra_requests": 0, "cancelled": 0, "extra_request_wins": 0,
+                             "extra_prompt_tokens_estimate": 0, "extra_completion_tokens_estimate": 0})
+    if info is None:  # served from the response cache
+        return totals
+    totals["calls"] += 1
+    totals["extra_requests"] += info["attempts"] - 1
+    totals["cancelled"] += info["cancelled"]
+    totals["extra_request_wins"] += 1 if info["winner"] > 0 else 0
+    totals["extra_prompt_tokens_estimate"] += info.get("extra_prompt_tokens_estimate", 0)
+    totals["extra_completion_tokens_estimate"] += info.get("extra_completion_tokens_estimate", 0)
+    return totals
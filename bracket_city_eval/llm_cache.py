@@ -0,0 +1,193 @@
+# Disk-backed, content-addressed cache of LLM responses.
+# Shared by bracket_city_eval (llm_utils) and wordle_agent, so it only imports other shared modules,
+# in a way that works both as part of the bracket_city_eval package and as a top-level module.
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+try:
+    from .timeline import record_cache_lookup
+except ImportError:  # loaded as a top-level module by the bracket_city_eval scripts
+    from timeline import record_cache_lookup
+
+logger = logging.getLogger(__name__)
+
+CACHE_MODES = ["off", "read", "write", "readwrite"]
+DEFAULT_CACHE_PATH = "./llm-cache.sqlite"
+DEFAULT_CACHE_MAX_MB = 1024
+EVICT_BATCH = 256  # least recently used entries deleted per statement while the cache is over its limit
+
+class CacheMissError(Exception):
+    """Raised in read-only (replay) mode when a prompt has no cached response."""
+
+class LLMCache:
+    """
+    SQLite store of LLM responses keyed by a hash of (model, prompt, sampling params).
+
+    Modes:
+    - read: serve responses from the cache only; a miss raises CacheMissError instead of calling the LLM,
+      which lets whole games be replayed offline.
+    - write: always call the LLM and record the response.
+    - readwrite: serve hits from the cache and record misses.
+    Least recently used entries are evicted once the stored responses exceed max_bytes.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, mode: str = "readwrite", max_bytes: int = DEFAULT_CACHE_MAX_MB * 1024 * 1024):
+        if mode not in CACHE_MODES or mode == "off":
+            raise ValueError(f"Invalid cache mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # One connection shared by all threads, serialized by self._lock. WAL lets parallel sweep processes share the file.
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model_name TEXT NOT NULL,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses (last_access)")
+        self._conn.commit()
+        # Running size of the stored responses, kept up to date by put() so writes don't have to sum the table
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @property
+    def readable(self) -> bool:
+        return self.mode in ("read", "readwrite")
+
+    @property
+    def writable(self) -> bool:
+        return self.mode in ("write", "readwrite")
+
+    @staticmethod
+    def make_key(model_name: str, prompt: str, params: dict | None = None) -> str:
+        payload = json.dumps({"model": model_name, "prompt": prompt, "params": params or {}}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            row = self._conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            return row[0]
+
+    def put(self, key: str, model_name: str, response: str):
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self._lock:
+            replaced = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model_name, response, size, created_at, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model_name, response, size, now, now),
+            )
+            self._total_bytes += size - (replaced[0] if replaced else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Drops least recently used entries, a batch at a time, until the cache fits in max_bytes. Caller holds the lock."""
+        # Other processes may have written to the file as well, so the running total is re-read before evicting
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        evicted = 0
+        while self._total_bytes > self.max_bytes:
+            freed, count = self._conn.execute(
+                "SELECT COALESCE(SUM(size), 0), COUNT(*) FROM (SELECT size FROM responses ORDER BY last_access ASC LIMIT ?)",
+                (EVICT_BATCH,)).fetchone()
+            if count == 0:
+                break
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_access ASC LIMIT ?)",
+                (EVICT_BATCH,))
+            self._total_bytes -= freed
+            evicted += count
+        if evicted:
+            logger.info(f"Evicted {evicted} entries from LLM cache {self.path}")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+_cache: LLMCache | None = None
+
+def add_cache_arguments(parser):
+    """Adds the --cache/--cache-path/--cache-max-mb options shared by the game CLIs."""
+    parser.add_argument("--cache", type=str, default="off", choices=CACHE_MODES,
+                        help="LLM response cache mode; 'read' replays cached responses only (default: off).")
+    parser.add_argument("--cache-path", type=str, default=DEFAULT_CACHE_PATH,
+                        help=f"Path of the SQLite response cache (default: {DEFAULT_CACHE_PATH}).")
+    parser.add_argument("--cache-max-mb", type=int, default=DEFAULT_CACHE_MAX_MB,
+                        help=f"Size limit of the response cache before LRU eviction (default: {DEFAULT_CACHE_MAX_MB}).")
+
+def configure_cache(mode: str = "off", path: str = DEFAULT_CACHE_PATH, max_mb: int = DEFAULT_CACHE_MAX_MB) -> LLMCache | None:
+    """Sets up the process-wide cache used by the LLM call helpers. mode='off' disables it."""
+    global _cache
+    if _cache is not None:
+        _cache.close()
+    _cache = None if mode == "off" else LLMCache(path, mode, max_mb * 1024 * 1024)
+    if _cache is not None:
+        logger.info(f"LLM response cache enabled (mode: {mode}, path: {path}, max: {max_mb} MB)")
+    return _cache
+
+def get_cache() -> LLMCache | None:
+    return _cache
+
+def cached_completion(model_name: str, prompt: str, call, params: dict | None = None) -> str:
+    """
+    Returns the response for (model_name, prompt, params), from the configured cache when possible.
+    `call` is a zero-argument function that performs the real LLM call on a miss.
+    """
+    cache = _cache
+    if cache is None:
+        return call()
+    key = LLMCache.make_key(model_name, prompt, params)
+    if cache.readable:
+        cached = cache.get(key)
+        record_cache_lookup(cached is not None)
+        if cached is not None:
+            logger.debug(f"LLM cache hit (model: {model_name}, key: {key[:12]})")
+            return cached
+        if not cache.writable:
+            raise CacheMissError(f"No cached response for model {model_name} (key: {key[:12]})")
+    response = call()
+    if cache.writable:
+        cache.put(key, model_name, response)
+    return response
+
+async def acached_completion(model_name: str, prompt: str, acall, params: dict | None = None) -> str:
+    """Async counterpart of cached_completion; `acall` is a zero-argument coroutine function."""
+    cache = _cache
+    if cache is None:
+        return await acall()
+    key = LLMCache.make_key(model_name, prompt, params)
+    if cache.readable:
+        # The cache is a blocking SQLite file, so it is read and written off the event loop
+        cached = await asyncio.to_thread(cache.get, key)
+        record_cache_lookup(cached is not None)
+        if cached is not None:
+            logger.debug(f"LLM cache hit (model: {model_name}, key: {key[:12]})")
+            return cached
+        if not cache.writable:
+            raise CacheMissError(f"No cached response for model {model_name} (key: {key[:12]})")
+    response = await acall()
+    if cache.writable:
+        await asyncio.to_thread(cache.put, key, model_name, response)
+    return response
@@ -0,0 +1,198 @@
+# Streaming LLM calls that stop generating as soon as the response contains a usable answer.
+# Shared by bracket_city_eval (llm_utils) and wordle_agent, so it only imports other shared modules,
+# in a way that works both as part of the bracket_city_eval package and as a top-level module.
+import logging
+import threading
+import time
+
+from tenacity import retry
+
+try:
+    from .budget import record_usage
+    from .rate_limit import request_slot, arequest_slot, stop_retrying, wait_before_retry
+    from .timeline import record_retry
+except ImportError:  # loaded as a top-level module by the bracket_city_eval scripts
+    from budget import record_usage
+    from rate_limit import request_slot, arequest_slot, stop_retrying, wait_before_retry
+    from timeline import record_retry
+
+logger = logging.getLogger(__name__)
+
+# Output tokens of streams that ran to completion, per model. Used to estimate how many tokens an
+# early stop saved, since the provider never reports what the rest of the generation would have cost.
+_lengths_lock = threading.Lock()
+_completed_lengths = {}  # model_name -> [total output tokens, number of completed streams]
+
+def _record_completed_length(model_name: str, tokens: int):
+    with _lengths_lock:
+        totals = _completed_lengths.setdefault(model_name, [0, 0])
+        totals[0] += tokens
+        totals[1] += 1
+
+def _estimate_tokens_saved(model_name: str, tokens_received: int) -> int | None:
+    """Mean completed length minus what was received, or None before any stream of this model completed."""
+    with _lengths_lock:
+        totals = _completed_lengths.get(model_name)
+        if not totals or totals[1] == 0:
+            return None
+        return max(round(totals[0] / totals[1]) - tokens_received, 0)
+
+# Prompt tokens per prompt character reported by completed streams, per model, for estimating the prompt
+# tokens of cancelled streams. Until a stream of the model completes, about 4 characters per token is assumed.
+_CHARS_PER_TOKEN = 4
+_prompt_ratios = {}  # model_name -> [total prompt tokens, total prompt characters]
+
+def _record_prompt_tokens(model_name: str, prompt_chars: int, tokens: int):
+    with _lengths_lock:
+        totals = _prompt_ratios.setdefault(model_name, [0, 0])
+        totals[0] += tokens
+        totals[1] += prompt_chars
+
+def _estimate_prompt_tokens(model_name: str, prompt_chars: int) -> int:
+    with _lengths_lock:
+        totals = _prompt_ratios.get(model_name)
+        if not totals or totals[1] == 0:
+            return round(prompt_chars / _CHARS_PER_TOKEN)
+        return round(prompt_chars * totals[0] / totals[1])
+
+class _StreamReader:
+    """
+    Accumulates streamed chunks and feeds each completed line to `detect_answer`,
+    which returns True once the lines seen so far contain an answer.
+    """
+
+    def __init__(self, model_name: str, prompt_message: str, detect_answer, stop_on_answer: bool):
+        self.model_name = model_name
+        self.prompt_chars = len(prompt_message)
+        self.detect_answer = detect_answer
+        self.stop_on_answer = stop_on_answer
+        self.parts = []
+        self.pending_line = ""
+        self.chunks = 0
+        self.input_tokens = None
+        self.output_tokens = None
+        self.reasoning_tokens = None
+        self.start = time.perf_counter()
+        self.time_to_answer = None
+
+    def add(self, chunk) -> bool:
+        """Adds a chunk and returns True if the rest of the generation should be cancelled."""
+        if chunk.usage_metadata:
+            self.input_tokens = chunk.usage_metadata.get("input_tokens")
+            self.output_tokens = chunk.usage_metadata.get("output_tokens")
+            self.reasoning_tokens = (chunk.usage_metadata.get("output_token_details") or {}).get("reasoning")
+        text = chunk.content if isinstance(chunk.content, str) else ""
+        if not text:
+            return False
+        self.chunks += 1
+        self.parts.append(text)
+        if self.time_to_answer is not None or self.detect_answer is None:
+            return False
+        if "\n" not in text:
+            self.pending_line += text
+            return False
+        lines = (self.pending_line + text).split("\n")
+        self.pending_line = lines.pop()
+        for line in lines:
+            if self.detect_answer(line):
+                self.time_to_answer = time.perf_counter() - self.start
+                return self.stop_on_answer
+        return False
+
+    def finish(self, stopped_early: bool) -> tuple[str, dict]:
+        seconds = time.perf_counter() - self.start
+        if self.time_to_answer is None and self.detect_answer is not None and self.detect_answer(self.pending_line):
+            self.time_to_answer = seconds
+        # Most providers stream about one token per chunk; usage is only reported by completed streams
+        tokens_received = self.output_tokens if self.output_tokens is not None else self.chunks
+        if not stopped_early:
+            _record_completed_length(self.model_name, tokens_received)
+        # Cancelled streams never report usage, so their prompt tokens are estimated from the prompt's length
+        # like their output tokens are from the chunks. langchain drops the cost from streamed usage, so it is
+        # estimated from the tokens.
+        input_tokens = self.input_tokens
+        if input_tokens is not None:
+            _record_prompt_tokens(self.model_name, self.prompt_chars, input_tokens)
+        else:
+            input_tokens = _estimate_prompt_tokens(self.model_name, self.prompt_chars)
+        record_usage(self.model_name, input_tokens, tokens_received, self.reasoning_tokens)
+        info = {
+            "stopped_early": stopped_early,
+            "seconds": seconds,
+            "time_to_answer": self.time_to_answer,
+            "tokens_received": tokens_received,
+            "tokens_saved_estimate": _estimate_tokens_saved(self.model_name, tokens_received) if stopped_early else 0,
+        }
+        return "".join(self.parts), info
+
+@retry(stop=stop_retrying, wait=wait_before_retry, before_sleep=record_retry)
+def stream_completion(llm, model_name: str, prompt_message: str, detect_answer=None,
+                      stop_on_answer: bool = True) -> tuple[str, dict]:
+    """
+    Streams a completion from a langchain chat model and returns (text, info).
+    `detect_answer` is called with every completed line; once it returns True the stream is closed,
+    which drops the connection and cancels the remaining generation (unless stop_on_answer is False,
+    in which case only the time to the answer is recorded). Scheduled and retried by rate_limit like the
+    non-streaming calls, so the model should be built with max_retries=0.
+    """
+    from langchain_core.messages import HumanMessage
+    logger.info(f"Attempting to stream LLM response (model: {model_name})...")
+    reader = _StreamReader(model_name, prompt_message, detect_answer, stop_on_answer)
+    stopped_early = False
+    with request_slot(model_name, llm.openai_api_base):
+        stream = llm.stream([HumanMessage(content=prompt_message)], stream_usage=True)
+        try:
+            for chunk in stream:
+                if reader.add(chunk):
+                    stopped_early = True
+                    break
+        except Exception as e:
+            logger.warning(f"LLM stream failed. Error: {e}. Retrying if attempts remain...")
+            raise
+        finally:
+            stream.close()
+    text, info = reader.finish(stopped_early)
+    logger.info(f"LLM stream {'stopped after the answer' if stopped_early else 'completed'} "
+                f"({info['tokens_received']} tokens, {info['seconds']:.1f}s).")
+    return text, info
+
+@retry(stop=stop_retrying, wait=wait_before_retry, before_sleep=record_retry)
+async def astream_completion(llm, model_name: str, prompt_message: str, detect_answer=None,
+                             stop_on_answer: bool = True) -> tuple[str, dict]:
+    """Async counterpart of stream_completion."""
+    from langchain_core.messages import HumanMessage
+    logger.info(f"Attempting to stream LLM response asynchronously (model: {model_name})...")
+    reader = _StreamReader(model_name, prompt_message, detect_answer, stop_on_answer)
+    stopped_early = False
+    async with arequest_slot(model_name, llm.openai_api_base):
+        stream = llm.astream([HumanMessage(content=prompt_message)], stream_usage=True)
+        try:
+            async for chunk in stream:
+                if reader.add(chunk):
+                    stopped_early = True
+                    break
+        except Exception as e:
+            logger.warning(f"LLM stream failed. Error: {e}. Retrying if attempts remain...")
+            raise
+        finally:
+            await stream.aclose()
+    text, info = reader.finish(stopped_early)
+    logger.info(f"LLM stream {'stopped after the answer' if stopped_early else 'completed'} "
+                f"({info['tokens_received']} tokens, {info['seconds']:.1f}s).")
+    return text, info
+
+def add_stream_stats(totals: dict | None, info: dict | None) -> dict:
+    """
+    Folds one call's info into a game's running streaming totals (a new dict, suitable for graph state).
+    `info` is None for responses served from the cache.
+    """
+    totals = dict(totals or {"streamed_calls": 0, "early_stops": 0, "tokens_received": 0,
+                             "tokens_saved_estimate": 0, "time_to_answer_seconds": []})
+    if info is None:
+        return totals
+    totals["streamed_calls"] += 1
+    totals["early_stops"] += int(info["stopped_early"])
+    totals["tokens_received"] += info["tokens_received"]
+    totals["tokens_saved_estimate"] += info["tokens_saved_estimate"] or 0
+    totals["time_to_answer_seconds"] = totals["time_to_answer_seconds"] + [info["time_to_answer"]]
+    return totals
@@ -2,44 +2,322 @@
 import os
 import logging
 import time # For exponential backoff, though tenacity handles it internally
+import asyncio
+import functools
+import threading
+import weakref
+from typing import TYPE_CHECKING
 
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage
 from dotenv import load_dotenv
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import retry
+
+# The chat model registry is shared with wordle_agent, which imports this module as part of the package
+try:
+    from .budget import USAGE_REQUEST, record_message_usage
+    from .hedge import race, hedge_delay, run_sync
+    from .llm_cache import cached_completion, acached_completion
+    from .llm_stream import stream_completion, astream_completion
+    from .rate_limit import request_slot, arequest_slot, stop_retrying, wait_before_retry
+    from .timeline import record_retry
+except ImportError:  # loaded as a top-level module by the bracket_city_eval scripts
+    from budget import USAGE_REQUEST, record_message_usage
+    from hedge import race, hedge_delay, run_sync
+    from llm_cache import cached_completion, acached_completion
+    from llm_stream import stream_completion, astream_completion
+    from rate_limit import request_slot, arequest_slot, stop_retrying, wait_before_retry
+    from timeline import record_retry
+
+# langchain_openai and httpx take most of this module's import time, so they are imported on first use
+if TYPE_CHECKING:
+    import httpx
+    from langchain_openai import ChatOpenAI
 
 load_dotenv()
 
 # Configure logging for this module (optional, but good practice)
 logger = logging.getLogger(__name__)
 
-@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
+# Overridable so that runs can be pointed at another OpenAI-compatible endpoint, e.g. benchmarks.fake_server
+OPENROUTER_BASE_URL = os.environ.get("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+
+# --- Client registry ---
+# Building a ChatOpenAI per call means a new HTTP client (and TLS handshake) for every step of every game.
+# Instead, chat models are cached per (model, base URL) and every model pointing at the same base URL shares
+# one keep-alive connection pool. httpx pools are not shareable between sync and async clients, so each base
+# URL gets one sync pool (shared by all threads) and one async pool per event loop.
+
+def _pool_settings() -> dict:
+    import httpx
+    return {
+        "limits": httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=60),
+        "timeout": httpx.Timeout(600.0, connect=10.0),
+    }
+
+_registry_lock = threading.Lock()
+_http_clients = {}  # base_url -> httpx.Client
+_async_http_clients = weakref.WeakKeyDictionary()  # event loop -> {base_url -> httpx.AsyncClient}
+_chat_models = {}  # (model_name, base_url) -> ChatOpenAI using the sync pool
+_async_chat_models = weakref.WeakKeyDictionary()  # event loop -> {(model_name, base_url) -> ChatOpenAI}
+
+_stats_lock = threading.Lock()
+_stats = {
+    "clients_created": 0,
+    "clients_reused": 0,
+    "connections_opened": 0,
+    "connections_reused": 0,
+}
+_seen_streams = weakref.WeakSet()
+
+def _track_connection(response: "httpx.Response"):
+    """Counts whether a response came over a new or an already pooled connection."""
+    stream = response.extensions.get("network_stream")
+    if stream is None:
+        return
+    with _stats_lock:
+        if stream in _seen_streams:
+            _stats["connections_reused"] += 1
+        else:
+            _seen_streams.add(stream)
+            _stats["connections_opened"] += 1
+
+async def _atrack_connection(response: "httpx.Response"):
+    _track_connection(response)
+
+def _count_client(created: bool):
+    with _stats_lock:
+        _stats["clients_created" if created else "clients_reused"] += 1
+
+def get_chat_model(model_name: str, base_url: str = OPENROUTER_BASE_URL) -> "ChatOpenAI":
+    """
+    Returns the shared ChatOpenAI for (model_name, base_url), creating it on first use.
+    All models on the same base URL share one keep-alive connection pool; safe to use from several threads.
+    """
+    import httpx
+    from langchain_openai import ChatOpenAI
+
+    key = (model_name, base_url)
+    with _registry_lock:
+        llm = _chat_models.get(key)
+        created = llm is None
+        if created:
+            http_client = _http_clients.get(base_url)
+            if http_client is None:
+                http_client = httpx.Client(**_pool_settings(),
+                                           event_hooks={"response": [_track_connection]})
+                _http_clients[base_url] = http_client
+            llm = ChatOpenAI(
+                model_name=model_name,
+                openai_api_base=base_url,
+                openai_api_key=os.environ.get("OPENROUTER_API_KEY"),
+                http_client=http_client,
+                # Retries go through rate_limit, which needs to see every 429
+                max_retries=0,
+                # Asks OpenRouter to report each call's cost in its usage
+                extra_body=USAGE_REQUEST,
+            )
+            _chat_models[key] = llm
+    _count_client(created=created)
+    return llm
+
+def get_async_chat_model(model_name: str, base_url: str = OPENROUTER_BASE_URL) -> "ChatOpenAI":
+    """
+    Async counterpart of get_chat_model. Async pools are bound to the running event loop,
+    so models are cached per loop and share that loop's pool for the base URL.
+    """
+    import httpx
+    from langchain_openai import ChatOpenAI
+
+    loop = asyncio.get_running_loop()
+    key = (model_name, base_url)
+    with _registry_lock:
+        loop_models = _async_chat_models.setdefault(loop, {})
+        llm = loop_models.get(key)
+        created = llm is None
+        if created:
+            loop_clients = _async_http_clients.setdefault(loop, {})
+            http_async_client = loop_clients.get(base_url)
+            if http_async_client is None:
+                http_async_client = httpx.AsyncClient(**_pool_settings(),
+                                                      event_hooks={"response": [_atrack_connection]})
+                loop_clients[base_url] = http_async_client
+            llm = ChatOpenAI(
+                model_name=model_name,
+                openai_api_base=base_url,
+                openai_api_key=os.environ.get("OPENROUTER_API_KEY"),
+                http_async_client=http_async_client,
+                max_retries=0,
+                extra_body=USAGE_REQUEST,
+            )
+            loop_models[key] = llm
+    _count_client(created=created)
+    return llm
+
+def get_connection_stats() -> dict:
+    """Returns a snapshot of the client registry and connection reuse counters."""
+    with _stats_lock:
+        return dict(_stats)
+
+def _sampling_params(llm: "ChatOpenAI") -> dict:
+    """Sampling settings that change the response, used as part of the response cache key."""
+    return {"temperature": llm.temperature, "top_p": llm.top_p, "max_tokens": llm.max_tokens}
+
 def call_llm_with_retry(model_name: str, prompt_message: str) -> str:
     """
     Calls the LLM with the given model name and prompt message.
-    Includes retrying with exponential backoff (3 tries, wait 2^x seconds between retries).
+    Requests are scheduled by rate_limit, per provider and model, and retried with its policy: 3 tries
+    with exponential backoff, or up to 8 while the provider answers 429.
+    Goes through the response cache when one is configured (see llm_cache.configure_cache).
+    """
+    llm = get_chat_model(model_name)
+    return cached_completion(model_name, prompt_message,
+                             lambda: _call_llm(llm, model_name, prompt_message),
+                             params=_sampling_params(llm))
+
+async def acall_llm_with_retry(model_name: str, prompt_message: str) -> str:
+    """
+    Async variant of call_llm_with_retry, used when the graph is driven with ainvoke.
+    Same retry policy; the backoff sleeps yield to the event loop instead of blocking it.
+    """
+    llm = get_async_chat_model(model_name)
+    return await acached_completion(model_name, prompt_message,
+                                    lambda: _acall_llm(llm, model_name, prompt_message),
+                                    params=_sampling_params(llm))
+
+def hedged_llm_with_retry(model_name: str, prompt_message: str, hedge: bool = True,
+                          provider_routes: list[str] | None = None) -> tuple[str, dict | None]:
+    """
+    call_llm_with_retry with hedging and/or racing (see ahedged_llm_with_retry). Returns (text, info);
+    info is None when the response came from the cache.
+    """
+    return run_sync(lambda: ahedged_llm_with_retry(model_name, prompt_message, hedge, provider_routes))
+
+async def ahedged_llm_with_retry(model_name: str, prompt_message: str, hedge: bool = True,
+                                 provider_routes: list[str] | None = None) -> tuple[str, dict | None]:
+    """
+    acall_llm_with_retry that cuts tail latency at the price of extra requests. With provider_routes, one
+    request per OpenRouter provider goes out at once; with hedge, a duplicate follows once the call has taken
+    longer than the model's observed p90 latency. The first response wins and the rest are cancelled.
+    info (see hedge.race) adds the estimated tokens of the cancelled requests.
+    """
+    llm = get_async_chat_model(model_name)
+    infos = []
+
+    async def acall():
+        text, info = await _ahedged_call(llm, model_name, prompt_message, hedge, provider_routes)
+        infos.append(info)
+        return text
+
+    text = await acached_completion(model_name, prompt_message, acall, params=_sampling_params(llm))
+    return text, (infos[-1] if infos else None)
+
+async def _ahedged_call(llm: "ChatOpenAI", model_name: str, prompt_message: str, hedge: bool,
+                        provider_routes: list[str] | None) -> tuple[str, dict]:
+    routes = list(provider_routes or [None])
+    delays = [0.0] * len(routes)
+    delay = hedge_delay(model_name) if hedge else None
+    if delay is not None:
+        routes.append(routes[0])
+        delays.append(delay)
+    attempts = [functools.partial(_ainvoke_llm, llm, model_name, prompt_message, route) for route in routes]
+    response, info = await race(model_name, attempts, delays)
+    if info["winner"] > 0:
+        logger.info(f"Request {info['winner']} of {info['attempts']} answered first (model: {model_name}, "
+                    f"route: {routes[info['winner']]}) after {info['seconds']:.1f}s")
+    usage = response.usage_metadata or {}
+    info["extra_prompt_tokens_estimate"] = info["cancelled"] * usage.get("input_tokens", 0)
+    info["extra_completion_tokens_estimate"] = info["cancelled"] * usage.get("output_tokens", 0)
+    return response.content, info
+
+def _route_options(route: str | None) -> dict:
+    # Pins an OpenRouter request to one provider. extra_body replaces the model's, so it repeats USAGE_REQUEST.
+    if route is None:
+        return {}
+    return {"extra_body": {**USAGE_REQUEST, "provider": {"order": [route], "allow_fallbacks": False}}}
+
+def _stream_cache_params(llm: "ChatOpenAI", stop_on_answer: bool, cache_tag: str) -> dict:
+    # A stream that runs to completion returns the same text as a plain call and can share its entry
+    params = _sampling_params(llm)
+    if stop_on_answer:
+        params["early_stop"] = cache_tag
+    return params
+
+def stream_llm_with_retry(model_name: str, prompt_message: str, detect_answer, stop_on_answer: bool = True,
+                          cache_tag: str = "stream") -> tuple[str, dict | None]:
     """
+    Streaming variant of call_llm_with_retry that stops the generation once detect_answer matches a line
+    (see llm_stream.stream_completion). Returns (text, info); info is None when the response came from the cache.
+    Early-stopped responses are truncated, so they are cached under their own key, tagged with cache_tag.
+    """
+    llm = get_chat_model(model_name)
+    infos = []
+
+    def call():
+        text, info = stream_completion(llm, model_name, prompt_message, detect_answer, stop_on_answer)
+        infos.append(info)
+        return text
+
+    text = cached_completion(model_name, prompt_message, call,
+                             params=_stream_cache_params(llm, stop_on_answer, cache_tag))
+    return text, (infos[-1] if infos else None)
+
+async def astream_llm_with_retry(model_name: str, prompt_message: str, detect_answer, stop_on_answer: bool = True,
+                                 cache_tag: str = "stream") -> tuple[str, dict | None]:
+    """Async counterpart of stream_llm_with_retry."""
+    llm = get_async_chat_model(model_name)
+    infos = []
+
+    async def acall():
+        text, info = await astream_completion(llm, model_name, prompt_message, detect_answer, stop_on_answer)
+        infos.append(info)
+        return text
+
+    text = await acached_completion(model_name, prompt_message, acall,
+                                    params=_stream_cache_params(llm, stop_on_answer, cache_tag))
+    return text, (infos[-1] if infos else None)
+
+@retry(stop=stop_retrying, wait=wait_before_retry, before_sleep=record_retry)
+def _call_llm(llm: "ChatOpenAI", model_name: str, prompt_message: str) -> str:
+    from langchain_core.messages import HumanMessage
     logger.info(f"Attempting to call LLM (model: {model_name})...")
     try:
-        llm = ChatOpenAI(
-            model_name=model_name,
-            openai_api_base="https://openrouter.ai/api/v1",
-            openai_api_key=os.environ.get("OPENROUTER_API_KEY")
-        )
-        response = llm.invoke([HumanMessage(content=prompt_message)])
+        with request_slot(model_name, llm.openai_api_base):
+            response = llm.invoke([HumanMessage(content=prompt_message)])
         logger.info("LLM call successful.")
+        record_message_usage(response, model_name)
         return response.content
     except Exception as e:
         logger.warning(f"LLM call failed. Error: {e}. Retrying if attempts remain...")
         raise # Reraise the exception to trigger tenacity's retry mechanism
 
+@retry(stop=stop_retrying, wait=wait_before_retry, before_sleep=record_retry)
+async def _ainvoke_llm(llm: "ChatOpenAI", model_name: str, prompt_message: str, route: str | None = None):
+    """The response message of one call, optionally pinned to a provider route."""
+    from langchain_core.messages import HumanMessage
+    logger.info(f"Attempting to call LLM asynchronously (model: {model_name})...")
+    try:
+        async with arequest_slot(model_name, llm.openai_api_base):
+            response = await llm.ainvoke([HumanMessage(content=prompt_message)], **_route_options(route))
+        logger.info("LLM call successful.")
+        record_message_usage(response, model_name)
+        return response
+    except Exception as e:
+        logger.warning(f"LLM call failed. Error: {e}. Retrying if attempts remain...")
+        raise
+
+async def _acall_llm(llm: "ChatOpenAI", model_name: str, prompt_message: str) -> str:
+    return (await _ainvoke_llm(llm, model_name, prompt_message)).content
+
+def heal_prompt(broken_text: str) -> str:
+    """The healing request for broken_text; it asks for the clue_id/answer format parse_llm_response reads."""
+    return f"""
+Your task is to correct the formatting of the text provided below. NOTE: there will not always be a correct answer present. Don't try to force one if the text isn't explicit about which clue is supposed to be answered. The required output format is exactly two lines, as follows:clue_id: <clue id>
+answer: <answer text>Review the text and extract the clue_id and the answer.You MUST NOT include any extra text, conversation, explanations, or markdown formatting like ```. Only return the two lines in the specified format.Here is the text to fix:{broken_text}"""
+
 def heal_llm_output(broken_text: str, model_name: str = "openai/gpt-4.1-nano") -> str:
     """
     Takes malformed text and uses an LLM to correct its structure.
     """
-    prompt = f"""
-Your task is to correct the formatting of the text provided below. NOTE: there will not always be a correct answer present. Don't try to force one if the text isn't explicit about which clue is supposed to be answered. The required output format is exactly two lines, as follows:clue_id: <clue id>
-answer: <answer text>Review the text and extract the clue_id and the answer.You MUST NOT include any extra text, conversation, explanations, or markdown formatting like ```. Only return the two lines in the specified format.Here is the text to fix:{broken_text}"""
+    prompt = heal_prompt(broken_text)
 
     logger.info(f"Attempting to heal LLM output with model: {model_name}...")
     try:
@@ -51,3 +329,12 @@ answer: <answer text>Review the text and extract the clue_id and the answer.You
         # Depending on desired behavior, could return original text or raise
         # For now, re-raising the exception to make it visible if healing fails.
         raise
+
+async def aheal_llm_output(broken_text: str, model_name: str = "openai/gpt-4.1-nano") -> str:
+    """Async counterpart of heal_llm_output."""
+    logger.info(f"Attempting to heal LLM output asynchronously with model: {model_name}...")
+    try:
+        return await acall_llm_with_retry(model_name, heal_prompt(broken_text))
+    except Exception as e:
+        logger.error(f"LLM healing call failed after retries. Error: {e}")
+        raise
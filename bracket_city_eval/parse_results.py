@@ -1,21 +1,142 @@
+import argparse
+import csv
 import json
 import os
 
-results = []
-for filename in os.listdir("results"):
-    if filename.endswith(".json"):
-        with open(os.path.join("results", filename)) as f:
-            data = json.load(f)
-            if 'model_name' in data and '/' in data['model_name']:
-                provider, name = data['model_name'].split('/', 1)
-                data['model_provider'] = provider
-                data['model_name'] = name
-            results.append(data)
+from results_store import ResultsStore
+from timeline import USAGE_FIELDS, percentile
 
-with open("webapp/data/results.json", "w") as f:
-    json.dump(results, f)
+RESULTS_DIR = "results"
+JSON_EXPORT = "webapp/data/results.json"
+CSV_EXPORT = "results.csv"
+# Renamed whenever the exported columns change, so that the next export rebuilds both files
+EXPORT_POSITION = "parse_results:v2"
 
+def summarize_timeline(timeline):
+    """Scalar columns standing in for a run's timeline, which stays in the per-run result file."""
+    seconds = sorted(record["seconds"] for record in timeline)
+    return {
+        "timeline_spans": len(timeline),
+        "timeline_seconds": sum(seconds),
+        "timeline_p95_seconds": percentile(seconds, 0.95),
+        "timeline_queue_seconds": sum(record.get("queue_seconds", 0.0) for record in timeline),
+        "timeline_retries": sum(record.get("retries", 0) for record in timeline),
+    }
 
-import pandas as pd
-df = pd.DataFrame(results)
-df.to_csv("results.csv")
+def flatten(data):
+    """
+    Replaces the nested values of a result record with scalar columns: the timeline with its summary,
+    and dicts such as usage, budget and streaming with one <name>_<key> column per scalar entry.
+    """
+    flat = {}
+    for key, value in data.items():
+        if key == "timeline":
+            flat.update(summarize_timeline(value or []))
+        elif key == "usage":
+            flat.update({f"usage_{field}": (value or {}).get(field) for field in USAGE_FIELDS})
+        elif isinstance(value, dict):
+            flat.update({f"{key}_{name}": item for name, item in value.items() if not isinstance(item, (dict, list))})
+        elif not isinstance(value, list):
+            flat[key] = value
+    return flat
+
+def transform(data):
+    """Flattens a result record and splits the provider off the model name for the web app."""
+    data = flatten(data)
+    if 'model_name' in data and '/' in data['model_name']:
+        provider, name = data['model_name'].split('/', 1)
+        data['model_provider'] = provider
+        data['model_name'] = name
+    return data
+
+def append_json(path, records):
+    """
+    Appends records to the JSON array at path without reading it back: the closing bracket is
+    overwritten with the new records. Returns False if the file is missing or not an array.
+    """
+    if not os.path.exists(path):
+        return False
+    with open(path, "rb+") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size < 2:
+            return False
+        f.seek(size - 1)
+        if f.read(1) != b"]":
+            return False
+        if not records:
+            return True
+        f.seek(0)
+        empty = f.read(2) == b"[]"
+        body = ", ".join(json.dumps(record) for record in records)
+        f.seek(size - 1)
+        f.truncate()
+        f.write(((body if empty else ", " + body) + "]").encode())
+    return True
+
+def read_csv_header(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, newline="") as f:
+        return next(csv.reader(f), None)
+
+def count_csv_rows(path):
+    with open(path, newline="") as f:
+        return max(sum(1 for _ in csv.reader(f)) - 1, 0)
+
+def export(store, rebuild=False):
+    """
+    Brings results.json and results.csv up to date with the store. Only runs added since the last
+    export are written, unless an output is missing or the new runs add CSV columns, in which case
+    that output is rebuilt from every stored run. Nested values are flattened (see flatten); the full
+    timelines stay in the per-run result files.
+    """
+    import pandas as pd
+
+    last_rowid = 0 if rebuild else store.get_export_position(EXPORT_POSITION)
+    new_rows = list(store.iter_runs("bracket_city", after_rowid=last_rowid))
+    if not new_rows and not rebuild and os.path.exists(JSON_EXPORT) and os.path.exists(CSV_EXPORT):
+        print("No new results to export")
+        return
+    new_records = [transform(record) for _, record in new_rows]
+
+    os.makedirs(os.path.dirname(JSON_EXPORT), exist_ok=True)
+    if rebuild or last_rowid == 0 or not append_json(JSON_EXPORT, new_records):
+        all_records = [transform(record) for _, record in store.iter_runs("bracket_city")]
+        with open(JSON_EXPORT, "w") as f:
+            json.dump(all_records, f)
+
+    new_df = pd.DataFrame(new_records)
+    header = read_csv_header(CSV_EXPORT)
+    if rebuild or last_rowid == 0 or header is None or not set(new_df.columns) <= set(header[1:]):
+        df = pd.DataFrame([transform(record) for _, record in store.iter_runs("bracket_city")])
+        df.to_csv(CSV_EXPORT)
+    elif new_records:
+        # Keep the existing column order and continue the index where the file left off
+        new_df = new_df.reindex(columns=header[1:])
+        start = count_csv_rows(CSV_EXPORT)
+        new_df.index = range(start, start + len(new_df))
+        new_df.to_csv(CSV_EXPORT, mode="a", header=False)
+
+    if new_rows:
+        store.set_export_position(EXPORT_POSITION, new_rows[-1][0])
+    print(f"Exported {len(new_records)} new results")
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the stored Bracket City results to the leaderboard JSON and CSV files.")
+    parser.add_argument("--ingest", action="store_true",
+                        help=f"First copy the result files in {RESULTS_DIR}/ that are not in the store yet, "
+                             "e.g. ones written before results were stored in SQLite. Only needed once.")
+    args = parser.parse_args()
+
+    store = ResultsStore.for_results_dir(RESULTS_DIR)
+    try:
+        if args.ingest:
+            added = store.ingest_directory("bracket_city", RESULTS_DIR)
+            print(f"Ingested {added} result files written outside the store")
+        export(store)
+    finally:
+        store.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+# Local puzzle corpus and in-process cache of parsed games, so that multi-model runs load and parse
+# every puzzle once instead of once per game.
+import argparse
+import copy
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CORPUS_PATH = "./puzzles.sqlite"
+# SQLite maps up to this much of the corpus file into memory instead of reading it through syscalls
+_MMAP_BYTES = 256 * 1024 * 1024
+
+class PuzzleCorpus:
+    """
+    SQLite file of puzzle data keyed by date. Puzzles missing from the corpus are fetched with
+    bracket_city_mcp's load_game_data_by_date and stored, so every date is fetched at most once.
+    The file is opened on first use and read through a memory map.
+    """
+
+    def __init__(self, path: str = DEFAULT_CORPUS_PATH):
+        self.path = path
+        self.hits = 0
+        self.fetches = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connection(self) -> sqlite3.Connection:
+        # Caller holds the lock
+        if self._conn is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            # One connection shared by all threads, serialized by self._lock. WAL lets parallel runs share the file.
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(f"PRAGMA mmap_size={_MMAP_BYTES}")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS puzzles (
+                    date TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    fetched_at REAL NOT NULL
+                )""")
+            self._conn.commit()
+        return self._conn
+
+    def get(self, date_str: str) -> dict | None:
+        with self._lock:
+            row = self._connection().execute("SELECT data FROM puzzles WHERE date = ?", (date_str,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def put(self, date_str: str, data: dict):
+        with self._lock:
+            conn = self._connection()
+            conn.execute("INSERT OR REPLACE INTO puzzles (date, data, fetched_at) VALUES (?, ?, ?)",
+                         (date_str, json.dumps(data), time.time()))
+            conn.commit()
+
+    def load(self, date_str: str) -> dict:
+        """The puzzle data for date_str, fetched and stored on the first request for that date."""
+        data = self.get(date_str)
+        if data is not None:
+            self.hits += 1
+            return data
+        from bracket_city_mcp.puzzle_loader import load_game_data_by_date
+        data = load_game_data_by_date(date_str)
+        self.fetches += 1
+        self.put(date_str, data)
+        logger.info(f"Added puzzle {date_str} to the corpus {self.path}")
+        return data
+
+    def dates(self) -> list[str]:
+        with self._lock:
+            return [row[0] for row in self._connection().execute("SELECT date FROM puzzles ORDER BY date")]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+_corpus = PuzzleCorpus()
+_templates_lock = threading.Lock()
+_templates = {}  # date -> Game that is never played, only copied
+
+def configure_corpus(path: str = DEFAULT_CORPUS_PATH) -> PuzzleCorpus:
+    """Points the process at another corpus file and drops the cached games."""
+    global _corpus
+    _corpus.close()
+    _corpus = PuzzleCorpus(path)
+    with _templates_lock:
+        _templates.clear()
+    return _corpus
+
+def get_corpus() -> PuzzleCorpus:
+    return _corpus
+
+def add_corpus_arguments(parser):
+    parser.add_argument("--puzzle-corpus", type=str, default=DEFAULT_CORPUS_PATH,
+                        help=f"SQLite puzzle corpus; missing dates are fetched and added (default: {DEFAULT_CORPUS_PATH}).")
+
+def new_game(date_str: str):
+    """
+    A fresh Game for date_str. The puzzle is loaded from the corpus and parsed once per process;
+    later games are deep copies of that template, independent of each other and of the template.
+    """
+    with _templates_lock:
+        template = _templates.get(date_str)
+    if template is None:
+        from bracket_city_mcp.game.game import Game
+        template = Game(_corpus.load(date_str))
+        with _templates_lock:
+            # Another thread may have built the same template meanwhile; keep the first
+            template = _templates.setdefault(date_str, template)
+    return copy.deepcopy(template)
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the local Bracket City puzzle corpus.")
+    add_corpus_arguments(parser)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    fetch = subparsers.add_parser("fetch", help="Add the puzzles of the given dates to the corpus.")
+    fetch.add_argument("dates", nargs="+", help="Puzzle dates (e.g., 2025-05-12).")
+    subparsers.add_parser("list", help="Print the dates in the corpus.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+    corpus = configure_corpus(args.puzzle_corpus)
+    if args.command == "fetch":
+        for date_str in args.dates:
+            corpus.load(date_str)
+        print(f"{corpus.fetches} fetched, {corpus.hits} already in {args.puzzle_corpus}")
+    else:
+        for date_str in corpus.dates():
+            print(date_str)
+
+if __name__ == "__main__":
+    main()
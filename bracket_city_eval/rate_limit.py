@@ -0,0 +1,343 @@
+# Process-wide scheduling of LLM requests per (provider, model): a token bucket for the request rate, a
+# concurrency limit that backs off on 429s and slow responses, and a shared pause honoring Retry-After.
+# Shared by bracket_city_eval (llm_utils) and wordle_agent, so it only imports other shared modules,
+# in a way that works both as part of the bracket_city_eval package and as a top-level module.
+import asyncio
+import contextlib
+import email.utils
+import fnmatch
+import json
+import logging
+import threading
+import time
+from collections import deque
+from urllib.parse import urlparse
+
+try:
+    from .timeline import record_queue_wait
+except ImportError:  # loaded as a top-level module by the bracket_city_eval scripts
+    from timeline import record_queue_wait
+
+logger = logging.getLogger(__name__)
+
+# Tried in order after the rules from --rate-limits; the first rule whose patterns match applies.
+# OpenRouter's free variants allow 20 requests a minute. Paid models are only limited in concurrency
+# (requests_per_minute None) until the provider starts answering 429.
+DEFAULT_RULES = [
+    {"model": "*:free", "requests_per_minute": 20, "burst": 2, "max_concurrency": 2},
+    {"model": "*", "requests_per_minute": None, "max_concurrency": 64},
+]
+
+# Attempts per call for ordinary errors, and for 429s, whose waits are coordinated by the scheduler
+MAX_ATTEMPTS = 3
+MAX_RATE_LIMITED_ATTEMPTS = 8
+# Pause after a 429 without a usable Retry-After: doubles with every consecutive 429 of the same limiter
+_BASE_BACKOFF_SECONDS = 1.0
+_MAX_BACKOFF_SECONDS = 60.0
+# Concurrency shrinks while the recent latency is this many times the long-run latency. Both are moving
+# averages, since response lengths (and with them latencies) vary a lot from one request to the next.
+_SLOW_LATENCY_FACTOR = 2.0
+_RECENT_SMOOTHING = 0.2
+_BASELINE_SMOOTHING = 0.02
+# Queue waits and request times kept per limiter for the percentiles in stats()
+_SAMPLES = 1000
+
+def provider_of(base_url: str) -> str:
+    """The host serving a base URL, e.g. openrouter.ai, used as the provider part of a limiter key."""
+    return urlparse(base_url).netloc or base_url
+
+def is_rate_limit_error(exc: BaseException | None) -> bool:
+    """Whether an exception from an OpenAI-compatible client is a 429."""
+    if exc is None:
+        return False
+    status = getattr(exc, "status_code", None) or getattr(getattr(exc, "response", None), "status_code", None)
+    return status == 429
+
+def retry_after_seconds(exc: BaseException) -> float | None:
+    """
+    How long the provider asked us to wait, from Retry-After (seconds or an HTTP date), retry-after-ms,
+    or OpenRouter's X-RateLimit-Reset (epoch milliseconds). None when the response says nothing.
+    """
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return max(0.0, float(headers["retry-after-ms"]) / 1000)
+        if headers.get("retry-after"):
+            value = headers["retry-after"]
+            try:
+                return max(0.0, float(value))
+            except ValueError:
+                return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+        if headers.get("x-ratelimit-reset"):
+            return max(0.0, float(headers["x-ratelimit-reset"]) / 1000 - time.time())
+    except (TypeError, ValueError):
+        return None
+    return None
+
+class Limiter:
+    """
+    Request scheduling for one (provider, model). Thread-safe; the async path waits on the same state,
+    so sync and async callers in one process share it. Requests waiting for a concurrency slot are woken
+    when one is released; those waiting for a token or the end of a pause sleep until then.
+
+    A token bucket bounds the request rate, when the rule gives one. The concurrency limit grows by one every `limit` successful
+    requests while recent latency stays near the long-run latency, shrinks slightly while it is higher, and halves on
+    a 429. A 429 also pauses every request of the limiter until its Retry-After has passed.
+    """
+
+    def __init__(self, key: tuple[str, str], requests_per_minute: float | None, burst: int, max_concurrency: int):
+        self.key = key
+        self.rate = requests_per_minute / 60 if requests_per_minute else None
+        self.burst = max(1, burst)
+        self.max_concurrency = max(1, max_concurrency)
+        self.limit = float(self.max_concurrency)
+        self._lock = threading.Lock()
+        self._released = threading.Condition(self._lock)  # notified whenever a slot is returned
+        self._async_waiters = {}  # event loop -> asyncio.Event set, from any thread, when a slot is returned
+        self._tokens = float(self.burst)
+        self._refilled = time.monotonic()
+        self._in_flight = 0
+        self._blocked_until = 0.0
+        self._consecutive_429s = 0
+        self._recent_latency = None  # seconds per successful request, as moving averages
+        self._baseline_latency = None
+        self.requests = 0
+        self.rate_limited = 0
+        self.errors = 0
+        self.queue_seconds = 0.0
+        self.request_seconds = 0.0
+        self._queue_samples = deque(maxlen=_SAMPLES)
+        self._request_samples = deque(maxlen=_SAMPLES)
+
+    def _try_acquire(self) -> float:
+        """
+        Takes a request slot and returns 0, or returns how long to wait before trying again: infinite when every
+        slot is taken, since only a release can free one. Caller holds the lock.
+        """
+        now = time.monotonic()
+        if now < self._blocked_until:
+            return self._blocked_until - now
+        if self._in_flight >= int(self.limit):
+            return float("inf")
+        if self.rate is None:
+            self._in_flight += 1
+            return 0.0
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate)
+        self._refilled = now
+        if self._tokens < 1:
+            return (1 - self._tokens) / self.rate
+        self._tokens -= 1
+        self._in_flight += 1
+        return 0.0
+
+    def acquire(self):
+        """Blocks until a request slot is taken."""
+        with self._released:
+            while (wait := self._try_acquire()) > 0:
+                self._released.wait(None if wait == float("inf") else wait)
+
+    async def aacquire(self):
+        """Async counterpart of acquire; waiting yields to the event loop."""
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                wait = self._try_acquire()
+                if wait == 0:
+                    return
+                released = None
+                if wait == float("inf"):
+                    released = self._async_waiters.get(loop)
+                    if released is None:
+                        released = self._async_waiters[loop] = asyncio.Event()
+            if released is None:
+                await asyncio.sleep(wait)
+            else:
+                await released.wait()
+
+    def _notify_release(self):
+        # Caller holds the lock. Each event serves one release; later waiters of its loop get a new one.
+        self._released.notify_all()
+        for loop, released in self._async_waiters.items():
+            try:
+                loop.call_soon_threadsafe(released.set)
+            except RuntimeError:
+                pass  # the loop has been closed
+        self._async_waiters.clear()
+
+    def release(self, queue_seconds: float, request_seconds: float, exc: BaseException | None = None):
+        """Returns a slot taken with acquire and adapts the limits to how the request went."""
+        with self._lock:
+            self._in_flight -= 1
+            self._notify_release()
+            self.requests += 1
+            self.queue_seconds += queue_seconds
+            self.request_seconds += request_seconds
+            self._queue_samples.append(queue_seconds)
+            self._request_samples.append(request_seconds)
+            if is_rate_limit_error(exc):
+                self.rate_limited += 1
+                self._consecutive_429s += 1
+                self.limit = max(1.0, self.limit / 2)
+                wait = retry_after_seconds(exc)
+                if wait is None:
+                    wait = min(_MAX_BACKOFF_SECONDS, _BASE_BACKOFF_SECONDS * 2 ** (self._consecutive_429s - 1))
+                self._blocked_until = max(self._blocked_until, time.monotonic() + wait)
+                # Start again with a single request's worth of tokens once the pause is over
+                self._tokens = min(self._tokens, 1.0)
+                logger.warning(f"Rate limited on {self.key[0]} {self.key[1]}: pausing {wait:.1f}s, "
+                               f"concurrency limit now {int(self.limit)}")
+            elif isinstance(exc, asyncio.CancelledError):
+                pass  # e.g. the losing request of a race (see hedge.py)
+            elif exc is not None:
+                self.errors += 1
+            else:
+                self._consecutive_429s = 0
+                self._adapt_to_latency(request_seconds)
+
+    def _adapt_to_latency(self, seconds: float):
+        # Caller holds the lock
+        if self._baseline_latency is None:
+            self._recent_latency = self._baseline_latency = seconds
+        self._recent_latency += _RECENT_SMOOTHING * (seconds - self._recent_latency)
+        self._baseline_latency += _BASELINE_SMOOTHING * (seconds - self._baseline_latency)
+        if self._recent_latency > _SLOW_LATENCY_FACTOR * self._baseline_latency:
+            self.limit = max(1.0, self.limit - 1 / self.limit)
+        else:
+            self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+
+    def stats(self) -> dict:
+        with self._lock:
+            queue = sorted(self._queue_samples)
+            request = sorted(self._request_samples)
+            return {
+                "provider": self.key[0],
+                "model": self.key[1],
+                "requests": self.requests,
+                "rate_limited": self.rate_limited,
+                "errors": self.errors,
+                "in_flight": self._in_flight,
+                "concurrency_limit": int(self.limit),
+                "queue_seconds": self.queue_seconds,
+                "request_seconds": self.request_seconds,
+                "queue_p50": _percentile(queue, 0.50),
+                "queue_p95": _percentile(queue, 0.95),
+                "request_p50": _percentile(request, 0.50),
+                "request_p95": _percentile(request, 0.95),
+            }
+
+def _percentile(sorted_values: list[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(fraction * len(sorted_values)), len(sorted_values) - 1)]
+
+class RateLimiter:
+    """The limiters of a process, created on first use from the first matching rule."""
+
+    def __init__(self, rules: list[dict] | None = None):
+        self.rules = list(rules or []) + DEFAULT_RULES
+        self._lock = threading.Lock()
+        self._limiters = {}  # (provider, model) -> Limiter
+
+    def limiter(self, model_name: str, base_url: str) -> Limiter:
+        key = (provider_of(base_url), model_name)
+        with self._lock:
+            limiter = self._limiters.get(key)
+            if limiter is None:
+                rule = next(rule for rule in self.rules
+                            if fnmatch.fnmatch(model_name, rule.get("model", "*"))
+                            and fnmatch.fnmatch(key[0], rule.get("provider", "*")))
+                limiter = Limiter(key, rule.get("requests_per_minute"), rule.get("burst", 1), rule.get("max_concurrency", 1))
+                self._limiters[key] = limiter
+            return limiter
+
+    @contextlib.contextmanager
+    def slot(self, model_name: str, base_url: str):
+        """Waits for a request slot, then runs the enclosed request in it."""
+        limiter = self.limiter(model_name, base_url)
+        queued = time.perf_counter()
+        limiter.acquire()
+        started = time.perf_counter()
+        record_queue_wait(started - queued)
+        try:
+            yield
+        except BaseException as exc:
+            limiter.release(started - queued, time.perf_counter() - started, exc)
+            raise
+        limiter.release(started - queued, time.perf_counter() - started)
+
+    @contextlib.asynccontextmanager
+    async def aslot(self, model_name: str, base_url: str):
+        """Async counterpart of slot; waiting yields to the event loop."""
+        limiter = self.limiter(model_name, base_url)
+        queued = time.perf_counter()
+        await limiter.aacquire()
+        started = time.perf_counter()
+        record_queue_wait(started - queued)
+        try:
+            yield
+        except BaseException as exc:
+            limiter.release(started - queued, time.perf_counter() - started, exc)
+            raise
+        limiter.release(started - queued, time.perf_counter() - started)
+
+    def stats(self) -> list[dict]:
+        with self._lock:
+            limiters = list(self._limiters.values())
+        return [limiter.stats() for limiter in limiters]
+
+_scheduler = RateLimiter()
+
+def add_rate_limit_arguments(parser):
+    """Adds the --rate-limits option shared by the game CLIs."""
+    parser.add_argument("--rate-limits", type=str, default=None,
+                        help="JSON file with a list of rules, e.g. [{\"model\": \"*:free\", \"requests_per_minute\": 20, "
+                             "\"burst\": 2, \"max_concurrency\": 2}], tried before the built-in defaults.")
+
+def configure_rate_limits(path: str | None = None) -> RateLimiter:
+    """Replaces the process-wide scheduler, with the rules in the JSON file at path ahead of the defaults."""
+    global _scheduler
+    rules = []
+    if path:
+        with open(path) as f:
+            rules = json.load(f)
+        logger.info(f"Loaded {len(rules)} rate limit rule(s) from {path}")
+    _scheduler = RateLimiter(rules)
+    return _scheduler
+
+def request_slot(model_name: str, base_url: str):
+    """Context manager around one LLM request; see RateLimiter.slot."""
+    return _scheduler.slot(model_name, base_url)
+
+def arequest_slot(model_name: str, base_url: str):
+    return _scheduler.aslot(model_name, base_url)
+
+def get_rate_limit_stats() -> list[dict]:
+    """Per (provider, model): requests, 429s, the concurrency limit, and queue wait versus request time."""
+    return _scheduler.stats()
+
+def format_rate_limit_stats(stats: list[dict]) -> str:
+    lines = [f"{'provider':<20} {'model':<36} {'requests':>8} {'429s':>5} {'limit':>5} "
+             f"{'queue s':>8} {'queue p95':>9} {'request s':>9} {'request p95':>11}"]
+    for entry in stats:
+        lines.append(f"{entry['provider']:<20} {entry['model']:<36} {entry['requests']:>8} {entry['rate_limited']:>5} "
+                     f"{entry['concurrency_limit']:>5} {entry['queue_seconds']:>8.1f} {entry['queue_p95']:>9.2f} "
+                     f"{entry['request_seconds']:>9.1f} {entry['request_p95']:>11.2f}")
+    return "\n".join(lines)
+
+# --- tenacity policy for calls made through a request slot ---
+
+def stop_retrying(retry_state) -> bool:
+    """tenacity stop: MAX_ATTEMPTS attempts, or MAX_RATE_LIMITED_ATTEMPTS while the failures are 429s."""
+    attempts = MAX_RATE_LIMITED_ATTEMPTS if is_rate_limit_error(retry_state.outcome.exception()) else MAX_ATTEMPTS
+    return retry_state.attempt_number >= attempts
+
+def wait_before_retry(retry_state) -> float:
+    """
+    tenacity wait: none after a 429, since the next attempt queues behind the limiter's Retry-After pause
+    with every other caller of the model; 4-10s exponential backoff after other errors.
+    """
+    if is_rate_limit_error(retry_state.outcome.exception()):
+        return 0.0
+    return min(10.0, max(4.0, 2.0 ** (retry_state.attempt_number - 1)))
@@ -0,0 +1,128 @@
+# Local, deterministic repair of LLM responses that the strict parsers reject, tried before the LLM healer.
+# Shared by bracket_city_eval (graph) and wordle_agent, so it must not import sibling modules.
+import difflib
+import json
+import re
+
+_CODE_FENCE = re.compile(r"^\s*```[\w-]*\s*$", re.MULTILINE)
+_EMPHASIS = re.compile(r"(\*\*|__|\*|`)")
+_LINE_PREFIX = re.compile(r"^\s*(?:[-+>#]+|\d+[.)])\s*", re.MULTILINE)
+_CLUE_ID_LINE = re.compile(r"^\s*clue[\s_-]?id\s*[:=]\s*(.+?)\s*$", re.IGNORECASE)
+_ANSWER_LINE = re.compile(r"^\s*answer\s*[:=]\s*(.+?)\s*$", re.IGNORECASE)
+_JSON_OBJECT = re.compile(r"\{[^{}]*\}")
+_GUESS = re.compile(r"guess\s*[:=]\s*[\"'\[(]?\s*([a-z]{5})\b", re.IGNORECASE)
+_FIVE_LETTERS = re.compile(r"\b[a-z]{5}\b", re.IGNORECASE)
+# Clue ids that are close but not equal to an active clue id, e.g. a dropped or doubled character
+_FUZZY_CUTOFF = 0.85
+
+def strip_markdown(text: str) -> str:
+    """Removes code fences, bold/italic/code markers and list or heading prefixes."""
+    text = _CODE_FENCE.sub("", text)
+    text = _EMPHASIS.sub("", text)
+    return _LINE_PREFIX.sub("", text)
+
+def _clean_value(value) -> str:
+    """Strips the quotes, brackets and trailing punctuation that models wrap values in."""
+    value = str(value).strip().rstrip(".,;:!").strip()
+    while len(value) >= 2 and value[0] + value[-1] in ('""', "''", "[]", "()", "<>", "{}"):
+        value = value[1:-1].strip()
+    return value.rstrip(".,;:!").strip()
+
+def _json_pairs(text: str) -> list[tuple[str, str]]:
+    pairs = []
+    for match in _JSON_OBJECT.finditer(text):
+        try:
+            obj = json.loads(match.group(0))
+        except ValueError:
+            continue
+        if not isinstance(obj, dict):
+            continue
+        keys = {re.sub(r"[\s_-]", "", str(key)).lower(): value for key, value in obj.items()}
+        if "clueid" in keys and "answer" in keys:
+            pairs.append((_clean_value(keys["clueid"]), _clean_value(keys["answer"])))
+    return pairs
+
+def _line_pairs(text: str) -> list[tuple[str, str]]:
+    pairs = []
+    clue_id = None
+    for line in text.split("\n"):
+        clue_match = _CLUE_ID_LINE.match(line)
+        if clue_match:
+            clue_id = _clean_value(clue_match.group(1))
+            continue
+        answer_match = _ANSWER_LINE.match(line)
+        if answer_match and clue_id is not None:
+            pairs.append((clue_id, _clean_value(answer_match.group(1))))
+            clue_id = None
+    return pairs
+
+def match_clue_id(clue_id: str, active_clues, known_clues=()) -> str | None:
+    """
+    The clue id that clue_id refers to: an exact or case-insensitive match against the active clues
+    or the other known clues, else a single close match among the active clues.
+    """
+    active_clues = list(active_clues)
+    by_lower = {clue.lower(): clue for clue in known_clues}
+    by_lower.update({active.lower(): active for active in active_clues})
+    if clue_id.lower() in by_lower:
+        return by_lower[clue_id.lower()]
+    by_lower = {active.lower(): active for active in active_clues}
+    close = difflib.get_close_matches(clue_id.lower(), list(by_lower), n=2, cutoff=_FUZZY_CUTOFF)
+    if len(close) == 1:
+        return by_lower[close[0]]
+    return None
+
+def repair_clue_answers(text: str, active_clues=None, known_clues=()) -> list[tuple[str, str]]:
+    """
+    Every clue_id/answer pair that can be recovered from a malformed response, in order.
+    Handles markdown emphasis, case-insensitive or differently spelled keys, `=` separators,
+    values wrapped in quotes or brackets and JSON objects. When active_clues is given, clue ids are
+    mapped onto them (see match_clue_id) and pairs naming no clue are dropped. Returns [] when nothing
+    can be decided.
+    """
+    if not text:
+        return []
+    cleaned = strip_markdown(text)
+    pairs = _line_pairs(cleaned) or _json_pairs(text) or _json_pairs(cleaned)
+    pairs = [(clue_id, answer) for clue_id, answer in pairs if clue_id and answer]
+    if active_clues is None:
+        return pairs
+    repaired = []
+    for clue_id, answer in pairs:
+        matched = match_clue_id(clue_id, active_clues, known_clues)
+        if matched is not None:
+            repaired.append((matched, answer))
+    return repaired
+
+def repair_clue_answer(text: str, active_clues=None, known_clues=()) -> tuple[str | None, str | None]:
+    """Single-answer form of repair_clue_answers. Like parse_llm_response, the last pair wins."""
+    pairs = repair_clue_answers(text, active_clues, known_clues)
+    return pairs[-1] if pairs else (None, None)
+
+def repair_guess(text: str, is_word=None) -> str | None:
+    """
+    The guess in a malformed Wordle response: a `guess` key in any case or markup, a JSON "guess" value,
+    or, given an is_word(word) -> bool check against the word list, the only distinct word-list word
+    in the response. Returns None when nothing can be decided.
+    """
+    if not text:
+        return None
+    cleaned = strip_markdown(text)
+    match = _GUESS.search(cleaned)
+    if match:
+        return match.group(1).lower()
+    for obj_match in _JSON_OBJECT.finditer(text):
+        try:
+            obj = json.loads(obj_match.group(0))
+        except ValueError:
+            continue
+        if isinstance(obj, dict):
+            for key, value in obj.items():
+                value = _clean_value(value).lower()
+                if str(key).lower() == "guess" and re.fullmatch(r"[a-z]{5}", value):
+                    return value
+    if is_word is not None:
+        words = {token.lower() for token in _FIVE_LETTERS.findall(cleaned) if is_word(token.lower())}
+        if len(words) == 1:
+            return words.pop()
+    return None
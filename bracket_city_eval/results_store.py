@@ -0,0 +1,275 @@
+# Append-only SQLite store of per-run result records for both games, with leaderboard aggregates
+# that are kept up to date as runs are appended.
+# Shared by bracket_city_eval and wordle_agent, so it must not import sibling modules.
+import json
+import logging
+import os
+import sqlite3
+import time
+
+logger = logging.getLogger(__name__)
+
+RESULTS_DB_NAME = "results.db"
+
+# Where each game keeps the indexed fields in its result record
+GAME_FIELDS = {
+    "bracket_city": {"run_id": "run_id", "model_name": "model_name", "puzzle_key": "puzzle_date",
+                     "completed": "game_completed", "steps": "number_of_steps"},
+    "wordle": {"run_id": "id", "model_name": "model", "puzzle_key": "word",
+               "completed": "solved", "steps": "turns"},
+}
+
+# Leaderboard groupings: the columns a row is keyed by
+LEADERBOARD_DIMENSIONS = {
+    "model": ("model_name",),
+    "provider": ("provider",),
+    "puzzle": ("puzzle_key",),
+    "model_puzzle": ("model_name", "puzzle_key"),
+}
+# Columns the leaderboard can be sorted by
+LEADERBOARD_SORTS = ["model_name", "provider", "puzzle_key", "games", "wins", "win_rate", "mean_steps",
+                     "mean_prompt_tokens", "mean_completion_tokens", "mean_cost", "mean_seconds"]
+
+def provider_of(model_name: str | None) -> str:
+    """The OpenRouter provider prefix of a model name, e.g. "openai" for "openai/gpt-4.1-mini"."""
+    if not model_name or "/" not in model_name:
+        return "unknown"
+    return model_name.split("/", 1)[0]
+
+def run_metrics(game: str, record: dict) -> dict:
+    """The per-run numbers the leaderboard sums, from either game's result record."""
+    if game == "wordle":
+        usage = record.get("usage") or {}
+        return {"steps": record.get("turns") or 0, "prompt_tokens": usage.get("prompt_tokens", 0),
+                "completion_tokens": usage.get("completion_tokens", 0), "cost": usage.get("cost", 0.0),
+                "seconds": record.get("time")}
+    start, end = record.get("start_time"), record.get("end_time")
+    return {"steps": record.get("number_of_steps") or 0, "prompt_tokens": record.get("prompt_tokens") or 0,
+            "completion_tokens": record.get("completion_tokens") or 0, "cost": record.get("total_cost") or 0.0,
+            "seconds": end - start if start is not None and end is not None else None}
+
+class ResultsStore:
+    """
+    Result records indexed by game, model, puzzle (date or word) and run_id.
+    Runs are only ever appended; a run_id that is already stored is ignored. Rows get increasing rowids,
+    so consumers can process just the runs added since the last rowid they saw.
+    With read_only=True the store must exist; it is opened without creating or updating anything, for
+    readers such as the web app that must not contend with the writers.
+    """
+
+    def __init__(self, path: str, read_only: bool = False):
+        self.path = path
+        if read_only:
+            self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=30)
+            return
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS runs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                run_id TEXT NOT NULL UNIQUE,
+                game TEXT NOT NULL,
+                model_name TEXT,
+                puzzle_key TEXT,
+                completed INTEGER,
+                steps INTEGER,
+                recorded_at REAL NOT NULL,
+                record TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_runs_game_model ON runs (game, model_name);
+            CREATE INDEX IF NOT EXISTS idx_runs_game_puzzle ON runs (game, puzzle_key);
+            CREATE TABLE IF NOT EXISTS export_positions (
+                name TEXT PRIMARY KEY,
+                last_rowid INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS leaderboard (
+                game TEXT NOT NULL,
+                dimension TEXT NOT NULL,
+                model_name TEXT NOT NULL DEFAULT '',
+                provider TEXT NOT NULL DEFAULT '',
+                puzzle_key TEXT NOT NULL DEFAULT '',
+                games INTEGER NOT NULL DEFAULT 0,
+                wins INTEGER NOT NULL DEFAULT 0,
+                steps INTEGER NOT NULL DEFAULT 0,
+                prompt_tokens INTEGER NOT NULL DEFAULT 0,
+                completion_tokens INTEGER NOT NULL DEFAULT 0,
+                cost REAL NOT NULL DEFAULT 0,
+                seconds REAL NOT NULL DEFAULT 0,
+                timed_games INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (game, dimension, model_name, provider, puzzle_key)
+            );
+        """)
+        self._conn.commit()
+        self.refresh_leaderboard()
+
+    @classmethod
+    def for_results_dir(cls, results_dir: str) -> "ResultsStore":
+        """The store kept next to a game's per-run JSON files."""
+        return cls(os.path.join(results_dir, RESULTS_DB_NAME))
+
+    def append(self, game: str, record: dict) -> bool:
+        """Stores a result record. Returns False if its run_id was already stored."""
+        fields = GAME_FIELDS[game]
+        completed = record.get(fields["completed"])
+        cursor = self._conn.execute(
+            "INSERT OR IGNORE INTO runs (run_id, game, model_name, puzzle_key, completed, steps, recorded_at, record) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (record[fields["run_id"]], game, record.get(fields["model_name"]), record.get(fields["puzzle_key"]),
+             None if completed is None else int(bool(completed)), record.get(fields["steps"]), time.time(),
+             json.dumps(record)),
+        )
+        self._conn.commit()
+        added = cursor.rowcount == 1
+        if added:
+            self.refresh_leaderboard()
+        return added
+
+    def known_run_ids(self, game: str) -> set[str]:
+        return {row[0] for row in self._conn.execute("SELECT run_id FROM runs WHERE game = ?", (game,))}
+
+    def ingest_directory(self, game: str, directory: str) -> int:
+        """
+        Appends the <run_id>.json files in directory that are not stored yet and returns how many were added.
+        Files are named after their run_id, so stored runs are skipped without being opened.
+        """
+        if not os.path.isdir(directory):
+            return 0
+        known = self.known_run_ids(game)
+        added = 0
+        for entry in os.scandir(directory):
+            if not entry.name.endswith(".json") or entry.name[:-len(".json")] in known:
+                continue
+            try:
+                with open(entry.path) as f:
+                    record = json.load(f)
+                if self.append(game, record):
+                    added += 1
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Skipping unreadable result file {entry.path}: {e}")
+        return added
+
+    def max_rowid(self) -> int:
+        return self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM runs").fetchone()[0]
+
+    def iter_runs(self, game: str, model_name: str | None = None, puzzle_key: str | None = None, after_rowid: int = 0):
+        """Yields (rowid, record) for the game's runs in insertion order, optionally filtered."""
+        query = "SELECT id, record FROM runs WHERE game = ? AND id > ?"
+        params = [game, after_rowid]
+        if model_name is not None:
+            query += " AND model_name = ?"
+            params.append(model_name)
+        if puzzle_key is not None:
+            query += " AND puzzle_key = ?"
+            params.append(puzzle_key)
+        for rowid, record in self._conn.execute(query + " ORDER BY id", params):
+            yield rowid, json.loads(record)
+
+    def get_export_position(self, name: str) -> int:
+        """The last rowid an incremental exporter has written out (0 if it has not run yet)."""
+        row = self._conn.execute("SELECT last_rowid FROM export_positions WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    def set_export_position(self, name: str, rowid: int):
+        self._conn.execute("INSERT OR REPLACE INTO export_positions (name, last_rowid) VALUES (?, ?)", (name, rowid))
+        self._conn.commit()
+
+    # --- Leaderboard ---
+
+    def refresh_leaderboard(self) -> int:
+        """
+        Adds the runs appended since the last refresh to the leaderboard aggregates, in one transaction,
+        and returns how many were added. Opening a store and append() call this, so it only has work to
+        do for stores written before the leaderboard existed.
+        """
+        if self.get_export_position("leaderboard") >= self.max_rowid():
+            return 0
+        with self._conn:
+            # Taking the write lock first keeps two processes from adding the same runs
+            self._conn.execute("BEGIN IMMEDIATE")
+            last_rowid = self.get_export_position("leaderboard")
+            rows = self._conn.execute("SELECT id, game, model_name, puzzle_key, completed, record FROM runs "
+                                      "WHERE id > ? ORDER BY id", (last_rowid,)).fetchall()
+            if not rows:
+                return 0
+            for _, game, model_name, puzzle_key, completed, record in rows:
+                metrics = run_metrics(game, json.loads(record))
+                keys = {"model_name": model_name or "", "provider": provider_of(model_name), "puzzle_key": puzzle_key or ""}
+                for dimension, columns in LEADERBOARD_DIMENSIONS.items():
+                    # Model rows also carry their provider, which the model name determines
+                    key = {column: keys[column] if column in columns or (column == "provider" and "model_name" in columns)
+                           else "" for column in keys}
+                    self._conn.execute(
+                        "INSERT INTO leaderboard (game, dimension, model_name, provider, puzzle_key, games, wins, steps, "
+                        "prompt_tokens, completion_tokens, cost, seconds, timed_games) VALUES (?, ?, ?, ?, ?, 1, ?, ?, ?, ?, ?, ?, ?) "
+                        "ON CONFLICT (game, dimension, model_name, provider, puzzle_key) DO UPDATE SET "
+                        "games = games + 1, wins = wins + excluded.wins, steps = steps + excluded.steps, "
+                        "prompt_tokens = prompt_tokens + excluded.prompt_tokens, "
+                        "completion_tokens = completion_tokens + excluded.completion_tokens, cost = cost + excluded.cost, "
+                        "seconds = seconds + excluded.seconds, timed_games = timed_games + excluded.timed_games",
+                        (game, dimension, key["model_name"], key["provider"], key["puzzle_key"], int(bool(completed)),
+                         metrics["steps"], metrics["prompt_tokens"], metrics["completion_tokens"], metrics["cost"],
+                         metrics["seconds"] or 0.0, int(metrics["seconds"] is not None)))
+            self._conn.execute("INSERT OR REPLACE INTO export_positions (name, last_rowid) VALUES ('leaderboard', ?)",
+                               (rows[-1][0],))
+        return len(rows)
+
+    def leaderboard_version(self) -> int:
+        """Changes whenever the leaderboard does: the rowid of the last run it includes."""
+        return self.get_export_position("leaderboard")
+
+    def leaderboard(self, game: str, dimension: str, filters: dict | None = None, sort: str = "games",
+                    descending: bool = True, limit: int = 50, offset: int = 0) -> tuple[int, list[dict]]:
+        """
+        One page of the game's aggregates grouped by dimension (see LEADERBOARD_DIMENSIONS), and the number
+        of rows matching filters ({"model_name" | "provider" | "puzzle_key": value}). Rows hold totals and
+        per-game means; mean_seconds only counts runs that recorded their duration.
+        """
+        if dimension not in LEADERBOARD_DIMENSIONS:
+            raise ValueError(f"Unknown leaderboard dimension: {dimension}")
+        if sort not in LEADERBOARD_SORTS:
+            raise ValueError(f"Cannot sort the leaderboard by {sort}")
+        where = "game = ? AND dimension = ?"
+        params = [game, dimension]
+        for column, value in (filters or {}).items():
+            if column not in ("model_name", "provider", "puzzle_key"):
+                raise ValueError(f"Cannot filter the leaderboard by {column}")
+            where += f" AND {column} = ?"
+            params.append(value)
+        total = self._conn.execute(f"SELECT COUNT(*) FROM leaderboard WHERE {where}", params).fetchone()[0]
+        query = f"""
+            SELECT model_name, provider, puzzle_key, games, wins, steps, prompt_tokens, completion_tokens, cost,
+                   seconds, timed_games,
+                   CAST(wins AS REAL) / games AS win_rate, CAST(steps AS REAL) / games AS mean_steps,
+                   CAST(prompt_tokens AS REAL) / games AS mean_prompt_tokens,
+                   CAST(completion_tokens AS REAL) / games AS mean_completion_tokens,
+                   cost / games AS mean_cost,
+                   CASE WHEN timed_games > 0 THEN seconds / timed_games END AS mean_seconds
+            FROM leaderboard WHERE {where}
+            ORDER BY {sort} {'DESC' if descending else 'ASC'}, model_name, provider, puzzle_key
+            LIMIT ? OFFSET ?"""
+        cursor = self._conn.execute(query, params + [limit, offset])
+        columns = [description[0] for description in cursor.description]
+        items = []
+        for row in cursor:
+            item = dict(zip(columns, row))
+            for column in ("model_name", "provider", "puzzle_key"):
+                if not item[column] and column not in LEADERBOARD_DIMENSIONS[dimension]:
+                    del item[column]
+            items.append(item)
+        return total, items
+
+    def close(self):
+        self._conn.close()
+
+def append_result(results_dir: str, game: str, record: dict):
+    """Appends one result record to the store in results_dir. Failures are logged, never raised."""
+    try:
+        store = ResultsStore.for_results_dir(results_dir)
+        try:
+            store.append(game, record)
+        finally:
+            store.close()
+    except (sqlite3.Error, KeyError) as e:
+        logger.error(f"Failed to append result to the results store in {results_dir}: {e}")
@@ -13,17 +13,15 @@
 #models=("qwen/qwen3-8b" "qwen/qwen3-14b" "qwen/qwen3-30b-a3b" "qwen/qwen3-32b" "qwen/qwen3-235b-a22b")
 models=("x-ai/grok-4")
 
+# Build the date range
+dates=()
+for i in $(seq 12 24)
+do
+  dates+=("2025-05-${i}")
+done
 
-echo "test"
+echo "${models[@]} x ${dates[@]}"
 
-# Loop over each model in the 'models' array
-for model in "${models[@]}"; do
-    echo "$model"
-  # Start a second loop to iterate through the date range
-  for i in  $(seq 12 24) 
-  do
-    date_str="2025-05-${i}"
-    echo "$model $date_str"
-    uv run python bracket_city_graph.py --model-name ${model} --date-str ${date_str} &
-  done
-done
+# All games run in a single process; tune the concurrency limits to the provider's rate limits
+uv run python sweep.py --models "${models[@]}" --dates "${dates[@]}" \
+  --max-concurrency "${MAX_CONCURRENCY:-8}" --per-model-concurrency "${PER_MODEL_CONCURRENCY:-4}"
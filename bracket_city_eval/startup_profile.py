@@ -0,0 +1,63 @@
+# Import-time profiler behind the --startup-profile CLI option.
+# Shared by bracket_city_eval and wordle_agent, so it must not import sibling modules.
+import builtins
+import sys
+import time
+
+class ImportProfiler:
+    """
+    Times every module imported for the first time while installed, by wrapping builtins.__import__.
+    Records inclusive time (including the module's own imports) and self time (excluding them).
+    """
+
+    def __init__(self):
+        self.timings = {}  # module name -> [inclusive seconds, self seconds]
+        self._stack = []
+        self._original_import = None
+
+    def install(self):
+        self._original_import = builtins.__import__
+        builtins.__import__ = self._import
+        return self
+
+    def uninstall(self):
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level != 0 or name in sys.modules:
+            return self._original_import(name, globals, locals, fromlist, level)
+        self._stack.append(0.0)  # time spent in nested first-time imports
+        start = time.perf_counter()
+        try:
+            return self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = self._stack.pop()
+            if self._stack:
+                self._stack[-1] += elapsed
+            timing = self.timings.setdefault(name, [0.0, 0.0])
+            timing[0] += elapsed
+            timing[1] += elapsed - nested
+
+    def report(self, top: int = 25) -> str:
+        """Table of the slowest imports by inclusive time."""
+        total = sum(self_time for _, self_time in self.timings.values())
+        lines = [f"Import profile: {len(self.timings)} modules, {total * 1000:.0f} ms total",
+                 f"{'module':<50} {'inclusive ms':>12} {'self ms':>9}"]
+        ranked = sorted(self.timings.items(), key=lambda item: item[1][0], reverse=True)
+        for name, (inclusive, self_time) in ranked[:top]:
+            lines.append(f"{name:<50} {inclusive * 1000:>12.1f} {self_time * 1000:>9.1f}")
+        return "\n".join(lines)
+
+def start_profile(enabled: bool) -> ImportProfiler | None:
+    """Installs an ImportProfiler when enabled; call before the entry point imports its heavy modules."""
+    return ImportProfiler().install() if enabled else None
+
+def finish_profile(profiler: ImportProfiler | None):
+    """Uninstalls the profiler and prints its report to stderr."""
+    if profiler is None:
+        return
+    profiler.uninstall()
+    print(profiler.report(), file=sys.stderr)
@@ -0,0 +1,146 @@
+# Runs a model x date matrix of Bracket City games concurrently on a single event loop.
+import asyncio
+import logging
+import time
+import uuid
+
+from budget import (budget_limits, configure_model_prices, configure_sweep_budget, get_model_prices, get_sweep_usage,
+                    sweep_budget_exhausted)
+from bracket_city_graph import build_result, save_result
+from error_log import configure_error_log
+from llm_cache import configure_cache
+from puzzles import configure_corpus, new_game
+from rate_limit import configure_rate_limits, format_rate_limit_stats, get_rate_limit_stats
+from startup_profile import start_profile, finish_profile
+from utils import parse_sweep_args
+
+async def run_game(model_name: str, date_str: str, num_steps: int, global_limit: asyncio.Semaphore,
+                   model_limit: asyncio.Semaphore, results_dir: str, multi_answer: bool = False, stream: bool = False,
+                   hedge: bool = False, provider_routes: list[str] | None = None, wave: bool = False,
+                   budget: dict | None = None):
+    """
+    Plays a single game once both the per-model and the global slot are free,
+    and writes the same result record as bracket_city_graph.main.
+    Returns None without playing if the sweep budget (see budget.configure_sweep_budget) ran out while it waited.
+    """
+    from langchain_community.callbacks import get_openai_callback
+    from graph import get_app
+
+    # The model slot is taken first, so a game waiting on a busy model does not hold a global slot meanwhile
+    async with model_limit, global_limit:
+        if reason := sweep_budget_exhausted():
+            logging.warning(f"Skipping model: {model_name}, date: {date_str}: {reason}")
+            return None
+        run_id = str(uuid.uuid4())
+        logging.info(f"Starting run {run_id} (model: {model_name}, date: {date_str})")
+        # Every model plays the same dates, so after the first game of a date this is a copy of a parsed
+        # template; the first one may read or fetch the puzzle, which is blocking, so keep it off the event loop
+        game = await asyncio.to_thread(new_game, date_str)
+
+        initial_state = {
+            "game": game,
+            "step_count": 0,
+            "max_steps": num_steps,
+            "model_name": model_name,
+            "multi_answer": multi_answer,
+            "wave": wave,
+            "stream": stream,
+            "hedge": hedge,
+            "provider_routes": provider_routes,
+            "puzzle_date": date_str,
+            "run_id": run_id,
+            "budget": budget,
+        }
+
+        # Each task runs in its own context, so the callback only counts this game's tokens
+        with get_openai_callback() as cb:
+            start_time = time.time()
+            final_state = await get_app().ainvoke(initial_state, {"recursion_limit": 1000})
+            end_time = time.time()
+
+            logging.info(f"Run {run_id} finished (model: {model_name}, date: {date_str}). "
+                         f"Game Won: {final_state['game_won']}, Steps: {final_state['step_count']}")
+            result = build_result(final_state, cb, date_str, model_name, run_id, start_time, end_time)
+
+        await asyncio.to_thread(save_result, result, results_dir)
+        return result
+
+async def run_sweep(models: list[str], dates: list[str], num_steps: int = 50, max_concurrency: int = 8,
+                    per_model_concurrency: int = 2, results_dir: str = "./results", multi_answer: bool = False,
+                    stream: bool = False, hedge: bool = False, provider_routes: list[str] | None = None, wave: bool = False,
+                    budget: dict | None = None):
+    """
+    Runs every (model, date) pair, with at most max_concurrency games in flight overall
+    and at most per_model_concurrency games in flight for any one model. budget holds per-game limits.
+    Returns the result records of the games that finished; failures are logged and skipped, as are
+    games not started because the sweep budget ran out.
+    """
+    global_limit = asyncio.Semaphore(max_concurrency)
+    model_limits = {model_name: asyncio.Semaphore(per_model_concurrency) for model_name in models}
+
+    # Dates on the outer loop interleaves models, so the global slots are not all taken by the first model
+    pairs = [(model_name, date_str) for date_str in dates for model_name in models]
+
+    outcomes = await asyncio.gather(
+        *(run_game(model_name, date_str, num_steps, global_limit, model_limits[model_name], results_dir, multi_answer, stream,
+                   hedge, provider_routes, wave, budget)
+          for model_name, date_str in pairs),
+        return_exceptions=True,
+    )
+
+    results = []
+    for (model_name, date_str), outcome in zip(pairs, outcomes):
+        if isinstance(outcome, BaseException):
+            logging.error(f"Run failed (model: {model_name}, date: {date_str}): {outcome}")
+        elif outcome is not None:
+            results.append(outcome)
+    return results
+
+def main():
+    args = parse_sweep_args()
+    profiler = start_profile(args.startup_profile)
+
+    numeric_logging_level = getattr(logging, args.logging_level.upper(), None)
+    if not isinstance(numeric_logging_level, int):
+        raise ValueError(f"Invalid log level: {args.logging_level}")
+    logging.basicConfig(level=numeric_logging_level, format='%(asctime)s - %(levelname)s - %(module)s - %(message)s')
+    configure_cache(args.cache, args.cache_path, args.cache_max_mb)
+    configure_rate_limits(args.rate_limits)
+    configure_corpus(args.puzzle_corpus)
+    configure_error_log(args.parse_error_dir, args.parse_error_max_mb)
+    configure_sweep_budget(budget_limits(args, prefix="sweep_max_"))
+    # Replays make no calls, so they never fetch the price table
+    configure_model_prices(fetch=args.cache != "read")
+    if args.stream:
+        # Streamed calls are the only ones without a reported cost, so they need the price table; it is
+        # loaded before the event loop starts, since fetching it is a blocking request
+        get_model_prices()
+
+    logging.info(f"Sweeping {len(args.models)} model(s) x {len(args.dates)} date(s) "
+                 f"(max concurrency: {args.max_concurrency}, per model: {args.per_model_concurrency})")
+    start_time = time.time()
+    results = asyncio.run(run_sweep(
+        models=args.models,
+        dates=args.dates,
+        num_steps=args.num_steps,
+        max_concurrency=args.max_concurrency,
+        per_model_concurrency=args.per_model_concurrency,
+        results_dir=args.results_dir,
+        multi_answer=args.multi_answer,
+        stream=args.stream,
+        hedge=args.hedge,
+        provider_routes=args.race_providers,
+        wave=args.wave,
+        budget=budget_limits(args),
+    ))
+    logging.info(f"Sweep finished: {len(results)} / {len(args.models) * len(args.dates)} runs completed "
+                 f"in {time.time() - start_time:.1f}s")
+    from llm_utils import get_connection_stats
+    logging.info(f"LLM client stats: {get_connection_stats()}")
+    if get_sweep_usage() is not None:
+        logging.info(f"Sweep usage: {get_sweep_usage()}")
+    logging.info(f"Rate limiter (queue wait vs request time):\n{format_rate_limit_stats(get_rate_limit_stats())}")
+    finish_profile(profiler)
+
+if __name__ == "__main__":
+    main()
@@ -1,144 +1,218 @@
 import os
 import argparse
+import asyncio
+import hashlib
+import sqlite3
 import sys
 import logging
+import time
 
 # Add the parent directory to sys.path to allow direct import of llm_utils and graph
 # This assumes the script is run from within the bracket-city-eval directory or its parent
 sys.path.append(os.path.dirname(os.path.realpath(__file__)))
 
-from llm_utils import heal_llm_output
+from llm_utils import heal_prompt, aheal_llm_output
 from graph import parse_llm_response # Using the actual parser function
+from error_log import DEFAULT_ERROR_LOG_DIR, load_errors
+from rate_limit import add_rate_limit_arguments, configure_rate_limits
+from timeline import percentile, span
 
-# Configure basic logging for the script
-logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 logger = logging.getLogger(__name__)
 
+DEFAULT_HEAL_CACHE_PATH = "./heal-cache.sqlite"
+
+class HealCache:
+    """
+    Healing outcomes keyed by (model, heal prompt, hash of the broken text), with the latency, tokens and
+    cost of the call that produced them, so a re-run only evaluates new cases and still reports on all of
+    them. prompt_hash identifies the healing prompt (see heal_prompt_hash): outcomes of an earlier prompt
+    are kept but not served. Calls that raised are not stored and are retried on the next run.
+    """
+
+    def __init__(self, path: str = DEFAULT_HEAL_CACHE_PATH, prompt_hash: str = ""):
+        self.path = path
+        self.prompt_hash = prompt_hash
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(heals)")]
+        if columns and "prompt_hash" not in columns:
+            # Written before the prompt was part of the key, so it cannot tell which prompt produced them
+            self._conn.execute("DROP TABLE heals")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS heals (
+                model_name TEXT NOT NULL,
+                prompt_hash TEXT NOT NULL,
+                input_hash TEXT NOT NULL,
+                healed TEXT NOT NULL,
+                fixed INTEGER NOT NULL,
+                seconds REAL NOT NULL,
+                prompt_tokens INTEGER NOT NULL,
+                completion_tokens INTEGER NOT NULL,
+                cost REAL NOT NULL,
+                evaluated_at REAL NOT NULL,
+                PRIMARY KEY (model_name, prompt_hash, input_hash)
+            )""")
+        self._conn.commit()
+
+    def get_all(self, model_name: str) -> dict:
+        """input_hash -> outcome for every case of model_name stored so far."""
+        rows = self._conn.execute("SELECT input_hash, healed, fixed, seconds, prompt_tokens, completion_tokens, cost "
+                                  "FROM heals WHERE model_name = ? AND prompt_hash = ?", (model_name, self.prompt_hash))
+        return {row[0]: {"healed": row[1], "fixed": bool(row[2]), "seconds": row[3], "prompt_tokens": row[4],
+                         "completion_tokens": row[5], "cost": row[6], "error": None, "cached": True} for row in rows}
+
+    def put(self, model_name: str, input_hash: str, outcome: dict):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO heals (model_name, prompt_hash, input_hash, healed, fixed, seconds, prompt_tokens, "
+            "completion_tokens, cost, evaluated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (model_name, self.prompt_hash, input_hash, outcome["healed"], int(outcome["fixed"]), outcome["seconds"],
+             outcome["prompt_tokens"], outcome["completion_tokens"], outcome["cost"], time.time()))
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+def input_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def heal_prompt_hash() -> str:
+    """Changes whenever the healing prompt, including the format it asks for, does."""
+    return input_hash(heal_prompt(""))
+
+async def heal_case(model_name: str, text: str, limit: asyncio.Semaphore) -> dict:
+    """Heals one broken response and checks that the result parses. Latency excludes rate limiter queueing."""
+    async with limit:
+        healed, error = "", None
+        with span("heal") as spans:
+            try:
+                healed = await aheal_llm_output(text, model_name)
+            except Exception as e_heal:
+                error = str(e_heal)
+        record = spans[-1]
+    clue_id, answer = parse_llm_response(healed, save_errors=False) if error is None else (None, None)
+    return {"healed": healed, "fixed": bool(clue_id and answer), "error": error, "cached": False,
+            "seconds": record["seconds"] - record["queue_seconds"], "prompt_tokens": record["prompt_tokens"],
+            "completion_tokens": record["completion_tokens"], "cost": record["cost"]}
+
+async def evaluate(models: list[str], cases: dict, cache: HealCache, concurrency: int) -> tuple[dict, dict]:
+    """
+    Heals every case not in the cache with every model, at most `concurrency` calls at a time across models.
+    cases maps input_hash -> text. Returns ({model: {input_hash: outcome}}, {model: seconds spent on new cases}).
+    """
+    limit = asyncio.Semaphore(concurrency)
+    outcomes = {model_name: cache.get_all(model_name) for model_name in models}
+    wall_seconds = {}
+
+    async def run_model(model_name: str):
+        pending = [key for key in cases if key not in outcomes[model_name]]
+        if not pending:
+            return
+        logger.warning(f"{model_name}: healing {len(pending)} new cases ({len(cases) - len(pending)} cached)")
+        start = time.perf_counter()
+
+        async def run_case(key: str):
+            outcome = await heal_case(model_name, cases[key], limit)
+            outcomes[model_name][key] = outcome
+            if outcome["error"] is None:
+                cache.put(model_name, key, outcome)
+
+        await asyncio.gather(*(run_case(key) for key in pending))
+        wall_seconds[model_name] = time.perf_counter() - start
+
+    await asyncio.gather(*(run_model(model_name) for model_name in models))
+    return outcomes, wall_seconds
+
+def format_report(models: list[str], cases: dict, outcomes: dict, wall_seconds: dict) -> str:
+    """Per-model fix rate, throughput of this run, latency percentiles and cost over all cases."""
+    lines = [f"{'model':<36} {'cases':>6} {'new':>6} {'fixed':>6} {'rate':>7} {'errors':>6} {'cases/s':>8} "
+             f"{'p50 s':>7} {'p95 s':>7} {'p99 s':>7} {'cost $':>9}"]
+    for model_name in models:
+        results = [outcomes[model_name][key] for key in cases if key in outcomes[model_name]]
+        new = sum(1 for outcome in results if not outcome["cached"])
+        fixed = sum(1 for outcome in results if outcome["fixed"])
+        errors = sum(1 for outcome in results if outcome["error"] is not None)
+        latencies = sorted(outcome["seconds"] for outcome in results if outcome["error"] is None)
+        throughput = f"{new / wall_seconds[model_name]:.2f}" if wall_seconds.get(model_name) else "-"
+        lines.append(f"{model_name:<36} {len(cases):>6} {new:>6} {fixed:>6} {fixed / len(cases):>7.1%} {errors:>6} "
+                     f"{throughput:>8} {percentile(latencies, 0.50):>7.2f} {percentile(latencies, 0.95):>7.2f} "
+                     f"{percentile(latencies, 0.99):>7.2f} {sum(outcome['cost'] for outcome in results):>9.4f}")
+    return "\n".join(lines)
+
 def main():
-    parser = argparse.ArgumentParser(description="Evaluate the LLM output healing function.")
+    parser = argparse.ArgumentParser(description="Evaluate the LLM output healing function on the logged parse errors, for one or more models.")
     parser.add_argument(
         "--model-name",
         required=True,
-        help="The name of the LLM model to use for the healing process."
+        nargs="+",
+        help="The names of the LLM models to compare for the healing process."
     )
+    parser.add_argument("--error-dir", default=None,
+                        help=f"Parse error log directory (default: ./bracket-city-eval/parse-errors/ or {DEFAULT_ERROR_LOG_DIR}).")
+    parser.add_argument("--concurrency", type=int, default=16,
+                        help="Maximum number of healing calls in flight across all models (default: 16).")
+    parser.add_argument("--heal-cache", type=str, default=DEFAULT_HEAL_CACHE_PATH,
+                        help=f"SQLite file of healed outputs; cases already in it are not healed again (default: {DEFAULT_HEAL_CACHE_PATH}).")
+    add_rate_limit_arguments(parser)
     parser.add_argument(
         "--print-errors",
         action="store_true",
-        help="If present, print the details of each file that failed to be healed and parsed."
+        help="If present, print the details of each case that failed to be healed and parsed."
     )
     parser.add_argument(
         "--verbose",
         action="store_true",
-        help="If present, print the 'before' and 'after' text for every file processed."
+        help="If present, print the 'before' and 'after' text for every case processed."
     )
     args = parser.parse_args()
 
-    error_dir = './bracket-city-eval/parse-errors/'
+    # The LLM helpers log every call at INFO, which drowns the progress of thousands of cases
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, format='%(levelname)s: %(message)s')
+    configure_rate_limits(args.rate_limits)
+
+    error_dir = args.error_dir or './bracket-city-eval/parse-errors/'
     if not os.path.isdir(error_dir):
-        logger.error(f"Error directory not found: {error_dir}")
         # Also check one level up, in case script is run from repo root
-        alt_error_dir = './parse-errors/'
-        if os.path.isdir(alt_error_dir):
+        alt_error_dir = DEFAULT_ERROR_LOG_DIR
+        if args.error_dir is None and os.path.isdir(alt_error_dir):
             error_dir = alt_error_dir
-            logger.info(f"Found error directory at alternate path: {error_dir}")
         else:
-            sys.exit(f"Error: The directory {error_dir} (or {alt_error_dir}) does not exist. Please create it and populate it with .txt files of parse errors.")
-
-
-    total_files = 0
-    fixed_files = 0
-    failed_examples = []
-
-    logger.info(f"Processing files from: {error_dir}")
-    # Ensure we are only processing .txt files
-    try:
-        filenames = [f for f in os.listdir(error_dir) if f.endswith(".txt") and os.path.isfile(os.path.join(error_dir, f))]
-    except FileNotFoundError:
-        sys.exit(f"Error: The directory {error_dir} was not found during os.listdir().")
-
-
-    if not filenames:
-        logger.warning(f"No .txt files found in {error_dir}. Evaluation cannot proceed.")
+            sys.exit(f"Error: The directory {error_dir} does not exist. Run some games to populate the parse error log.")
+
+    # Identical broken responses are one case
+    cases = {}
+    for entry in load_errors(error_dir):
+        cases.setdefault(input_hash(entry["response"]), entry["response"])
+    if not cases:
+        logger.warning(f"No parse errors found in {error_dir}. Evaluation cannot proceed.")
         print(f"Final Score: 0 / 0 examples fixed.")
         return
+    print(f"Evaluating {len(cases)} cases from {error_dir} with {len(args.model_name)} model(s)")
 
-    for filename in filenames:
-        total_files += 1
-        filepath = os.path.join(error_dir, filename)
-
-        try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                original_text = f.read()
-        except Exception as e:
-            logger.error(f"Could not read file {filepath}: {e}")
-            failed_examples.append({
-                'filename': filename,
-                'original': f"Error reading file: {e}",
-                'healed': '',
-                'error': str(e),
-                'stage': 'read_file'
-            })
-            continue
-
-        if args.verbose:
-            logger.info(f"\n--- Processing: {filename} ---")
-            logger.info(f"Original Text:\n{original_text}")
-
-        try:
-            healed_text = heal_llm_output(original_text, args.model_name)
-            if args.verbose:
-                logger.info(f"Healed Text:\n{healed_text}")
-        except Exception as e_heal:
-            logger.error(f"Error during healing for {filename}: {e_heal}")
-            failed_examples.append({
-                'filename': filename,
-                'original': original_text,
-                'healed': '', # Healing failed
-                'error': str(e_heal),
-                'stage': 'healing'
-            })
-            continue # Skip parsing if healing failed
-
-        try:
-            # parse_llm_response returns (clue_id, answer) or (None, None)
-            clue_id, answer = parse_llm_response(healed_text)
-
-            if clue_id and answer: # Both must be non-empty and not None
-                fixed_files += 1
-                if args.verbose:
-                    logger.info(f"Successfully parsed: clue_id='{clue_id}', answer='{answer}'")
-            else:
-                # This case handles when parsing technically "succeeded" (no exception)
-                # but didn't find both required fields.
-                raise ValueError("Parsing returned incomplete data (clue_id or answer is missing/empty).")
-
-        except Exception as e_parse:
-            logger.warning(f"Failed to parse healed text for {filename}. Error: {e_parse}")
-            failed_examples.append({
-                'filename': filename,
-                'original': original_text,
-                'healed': healed_text,
-                'error': str(e_parse),
-                'stage': 'parsing'
-            })
+    cache = HealCache(args.heal_cache, heal_prompt_hash())
+    try:
+        outcomes, wall_seconds = asyncio.run(evaluate(args.model_name, cases, cache, args.concurrency))
+    finally:
+        cache.close()
 
     print(f"\n--- Evaluation Complete ---")
-    print(f"Final Score: {fixed_files} / {total_files} examples fixed.")
-
-    if args.print_errors and failed_examples:
-        print("\n--- Failed Examples ---")
-        for failure in failed_examples:
-            print(f"\nFilename: {failure['filename']}")
-            print(f"Stage of Failure: {failure['stage']}")
-            if failure['stage'] != 'read_file': # Original text might not be available if read failed
-                print(f"Original Text:\n{failure['original']}")
-            if failure['healed']: # Only print healed if it exists
-                print(f"Healed Text (attempted):\n{failure['healed']}")
-            print(f"Error: {failure['error']}")
-    elif args.print_errors and not failed_examples and total_files > 0 :
-        print("\nNo errors to print, all examples processed successfully or healing was effective!")
-    elif args.print_errors and not failed_examples and total_files == 0:
-        print("\nNo files were processed, so no errors to print.")
+    print(format_report(args.model_name, cases, outcomes, wall_seconds))
+
+    for model_name in args.model_name:
+        for key, outcome in outcomes[model_name].items():
+            if key not in cases:
+                continue
+            if args.verbose:
+                print(f"\n--- {model_name}: {key[:12]} ---\nOriginal Text:\n{cases[key]}\nHealed Text:\n{outcome['healed']}")
+            if args.print_errors and not outcome["fixed"]:
+                print(f"\n--- Failed: {model_name}: {key[:12]} ---")
+                print(f"Stage of Failure: {'healing' if outcome['error'] is not None else 'parsing'}")
+                print(f"Original Text:\n{cases[key]}")
+                if outcome["healed"]:
+                    print(f"Healed Text (attempted):\n{outcome['healed']}")
+                if outcome["error"] is not None:
+                    print(f"Error: {outcome['error']}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,187 @@
+# Per-node spans for the game graphs: wall time, tokens, retries and cache hits of every step.
+# Shared by bracket_city_eval and wordle_agent, so it must not import sibling modules.
+import argparse
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import time
+
+# The innermost open span of the current thread or asyncio task
+_current_span = contextvars.ContextVar("timeline_span", default=None)
+
+# Span fields that add up to a game's usage (see add_usage); cost is in dollars
+USAGE_FIELDS = ("prompt_tokens", "completion_tokens", "reasoning_tokens", "cost")
+
+# Called with the usage of every recorded call, whether or not a span is open (see budget.py)
+_usage_listeners = []
+
+def _new_span(node: str, step: int | None) -> dict:
+    return {"node": node, "step": step, "start": time.time(), "seconds": 0.0,
+            "prompt_tokens": 0, "completion_tokens": 0, "reasoning_tokens": 0, "cost": 0.0,
+            "retries": 0, "cache_hits": 0, "cache_misses": 0, "queue_seconds": 0.0}
+
+@contextlib.contextmanager
+def span(node: str, step: int | None = None):
+    """
+    Opens a span for the enclosed block and yields the list its finished spans are collected in:
+    those of nested span() blocks first, then its own. Tokens, retries and cache lookups are counted
+    on the innermost open span; seconds include nested spans.
+    """
+    record = _new_span(node, step)
+    collected = []
+    token = _current_span.set((record, collected))
+    start = time.perf_counter()
+    try:
+        yield collected
+    finally:
+        record["seconds"] = time.perf_counter() - start
+        _current_span.reset(token)
+        collected.append(record)
+        parent = _current_span.get()
+        if parent is not None:
+            # Nested spans are reported by the enclosing span's collector
+            parent[1].extend(collected)
+            collected.clear()
+
+def _count(field: str, amount: int = 1):
+    current = _current_span.get()
+    if current is not None:
+        current[0][field] += amount
+
+def record_tokens(prompt_tokens: int | None, completion_tokens: int | None, reasoning_tokens: int | None = None,
+                  cost: float | None = None):
+    usage = {"prompt_tokens": prompt_tokens or 0, "completion_tokens": completion_tokens or 0,
+             "reasoning_tokens": reasoning_tokens or 0, "cost": cost or 0.0}
+    for field, amount in usage.items():
+        _count(field, amount)
+    for listener in _usage_listeners:
+        listener(usage)
+
+def add_usage_listener(listener):
+    """Registers listener(usage) to be called with the fields of USAGE_FIELDS for every recorded call."""
+    _usage_listeners.append(listener)
+
+def record_retry(retry_state=None):
+    """Counts a retry; usable as a tenacity before_sleep callback."""
+    _count("retries")
+
+def record_cache_lookup(hit: bool):
+    _count("cache_hits" if hit else "cache_misses")
+
+def record_queue_wait(seconds: float):
+    """Time a request waited for the rate limiter (see rate_limit.py) before being sent."""
+    _count("queue_seconds", seconds)
+
+def _step_of(state) -> int | None:
+    return state.get("step_count") if isinstance(state, dict) else None
+
+def timed_node(name: str, node):
+    """Wraps a graph node so that its span (and those nested in it) are appended to state["timeline"]."""
+    @functools.wraps(node)
+    def wrapper(state):
+        with span(name, _step_of(state)) as spans:
+            update = node(state)
+        return _with_spans(state, update, spans)
+    return wrapper
+
+def atimed_node(name: str, node):
+    """Async counterpart of timed_node."""
+    @functools.wraps(node)
+    async def wrapper(state):
+        with span(name, _step_of(state)) as spans:
+            update = await node(state)
+        return _with_spans(state, update, spans)
+    return wrapper
+
+def _with_spans(state, update, spans) -> dict:
+    update = dict(update or {})
+    update["timeline"] = (state.get("timeline") or []) + spans
+    update["usage"] = add_usage(state.get("usage"), spans)
+    return update
+
+def add_usage(totals: dict | None, spans: list[dict]) -> dict:
+    """
+    Adds the usage fields of spans to running totals (a new dict, suitable for graph state). Tokens are
+    counted on the innermost span only, so nested spans can be summed with their parents.
+    """
+    totals = dict(totals or {field: 0 for field in USAGE_FIELDS})
+    for record in spans:
+        for field in USAGE_FIELDS:
+            # Absent from spans recorded before reasoning tokens and cost were tracked
+            totals[field] += record.get(field, 0)
+    return totals
+
+# --- Summary across a results set ---
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(fraction * len(sorted_values)), len(sorted_values) - 1)]
+
+def load_timelines(paths: list[str]) -> list[list[dict]]:
+    """Timelines of the result records in the given JSON files and directories of JSON files."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in sorted(os.listdir(path)) if name.endswith(".json"))
+        else:
+            files.append(path)
+    timelines = []
+    for filename in files:
+        with open(filename) as f:
+            record = json.load(f)
+        if record.get("timeline"):
+            timelines.append(record["timeline"])
+    return timelines
+
+def summarize(timelines: list[list[dict]]) -> dict:
+    """
+    Per-node count, latency percentiles (seconds), rate limiter queue time, token means, total cost,
+    retries and cache hit rate.
+    """
+    by_node = {}
+    for timeline in timelines:
+        for record in timeline:
+            by_node.setdefault(record["node"], []).append(record)
+    summary = {}
+    for node, records in by_node.items():
+        seconds = sorted(record["seconds"] for record in records)
+        lookups = sum(record["cache_hits"] + record["cache_misses"] for record in records)
+        summary[node] = {
+            "count": len(records),
+            "p50": percentile(seconds, 0.50),
+            "p95": percentile(seconds, 0.95),
+            "p99": percentile(seconds, 0.99),
+            "total_seconds": sum(seconds),
+            # Absent from results recorded before the rate limiter
+            "queue_seconds": sum(record.get("queue_seconds", 0.0) for record in records),
+            "mean_prompt_tokens": sum(record["prompt_tokens"] for record in records) / len(records),
+            "mean_completion_tokens": sum(record["completion_tokens"] for record in records) / len(records),
+            "cost": sum(record.get("cost", 0.0) for record in records),
+            "retries": sum(record["retries"] for record in records),
+            "cache_hit_rate": sum(record["cache_hits"] for record in records) / lookups if lookups else None,
+        }
+    return summary
+
+def format_summary(summary: dict, runs: int) -> str:
+    lines = [f"Timeline summary over {runs} runs",
+             f"{'node':<12} {'count':>7} {'p50 s':>8} {'p95 s':>8} {'p99 s':>8} {'total s':>9} {'queue s':>8} "
+             f"{'prompt tok':>11} {'compl tok':>10} {'cost $':>9} {'retries':>8} {'cache hit':>10}"]
+    for node, stats in sorted(summary.items(), key=lambda item: item[1]["total_seconds"], reverse=True):
+        hit_rate = "-" if stats["cache_hit_rate"] is None else f"{stats['cache_hit_rate']:.0%}"
+        lines.append(f"{node:<12} {stats['count']:>7} {stats['p50']:>8.3f} {stats['p95']:>8.3f} {stats['p99']:>8.3f} "
+                     f"{stats['total_seconds']:>9.1f} {stats['queue_seconds']:>8.1f} {stats['mean_prompt_tokens']:>11.0f} "
+                     f"{stats['mean_completion_tokens']:>10.0f} {stats['cost']:>9.4f} {stats['retries']:>8} {hit_rate:>10}")
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Print per-node latency percentiles across a set of run results.")
+    parser.add_argument("paths", nargs="+", help="Result JSON files or directories of them.")
+    args = parser.parse_args()
+    timelines = load_timelines(args.paths)
+    print(format_summary(summarize(timelines), len(timelines)))
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,78 @@
 # This file will contain utility functions for the bracket-city-eval project.
 import argparse
 
-def parse_args():
-    """Parses command-line arguments."""
-    parser = argparse.ArgumentParser(description="Run the Bracket City Solver Graph with specified parameters.")
-    parser.add_argument("--model-name", type=str, required=True, help="Name of the model to use.")
-    parser.add_argument("--date-str", type=str, required=True, help="Date string for the puzzle data (e.g., YYYY-MM-DD).")
+from budget import add_budget_arguments, add_sweep_budget_arguments
+from checkpoints import add_checkpoint_arguments
+from error_log import add_error_log_arguments
+from llm_cache import add_cache_arguments
+from puzzles import add_corpus_arguments
+from rate_limit import add_rate_limit_arguments
+
+def add_game_arguments(parser):
+    """Adds the options of how each game is played, shared by the single game and the sweep runners."""
     parser.add_argument("--logging-level", type=str, default="INFO",
                         choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"],
                         help="Logging level (default: INFO).")
     parser.add_argument("--num_steps", type=int, default=50, help="Maximum number of steps for the solver (default: 50).")
+    parser.add_argument("--multi-answer", action="store_true",
+                        help="Let the model answer several clues per LLM call. Each answer still counts as one step.")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream responses and cancel the generation once a clue_id/answer pair has been written.")
+    parser.add_argument("--wave", action="store_true",
+                        help="Prompt for every active clue concurrently, then apply the answers in clue order and repeat. "
+                             "Each answer still counts as one step.")
+    parser.add_argument("--hedge", action="store_true",
+                        help="Send a duplicate of any call slower than the model's observed p90 latency; the first response wins.")
+    parser.add_argument("--race-providers", type=str, nargs="+", default=None, metavar="PROVIDER",
+                        help="Race every call across these OpenRouter providers of the model; the first response wins.")
+    add_budget_arguments(parser)
+
+def add_runtime_arguments(parser):
+    """Adds the options of the shared caches, logs and rate limiter, and --startup-profile."""
+    add_cache_arguments(parser)
+    add_corpus_arguments(parser)
+    add_error_log_arguments(parser)
+    add_rate_limit_arguments(parser)
+    parser.add_argument("--startup-profile", action="store_true",
+                        help="Print the time spent importing each module when the run finishes.")
+
+def check_game_arguments(parser, args):
+    """Rejects combinations of add_game_arguments options that cannot be played together."""
+    if args.stream and (args.hedge or args.race_providers):
+        parser.error("--hedge and --race-providers do not apply to streamed calls")
+    if args.wave and (args.stream or args.multi_answer):
+        parser.error("--wave cannot be combined with --stream or --multi-answer")
+
+def parse_args():
+    """Parses command-line arguments."""
+    parser = argparse.ArgumentParser(description="Run the Bracket City Solver Graph with specified parameters.")
+    parser.add_argument("--model-name", type=str, help="Name of the model to use (required unless --resume is given).")
+    parser.add_argument("--date-str", type=str, help="Date string for the puzzle data, e.g. YYYY-MM-DD (required unless --resume is given).")
+    add_game_arguments(parser)
+    add_runtime_arguments(parser)
+    add_checkpoint_arguments(parser)
+
+    args = parser.parse_args()
+    # A resumed run takes its model and puzzle from the checkpoint
+    if args.resume is None and (args.model_name is None or args.date_str is None):
+        parser.error("--model-name and --date-str are required unless --resume is given")
+    check_game_arguments(parser, args)
+    return args
+
+def parse_sweep_args():
+    """Parses command-line arguments for the in-process model x date sweep runner."""
+    parser = argparse.ArgumentParser(description="Run a model x date sweep of Bracket City games concurrently in one process.")
+    parser.add_argument("--models", type=str, nargs="+", required=True, help="Names of the models to evaluate.")
+    parser.add_argument("--dates", type=str, nargs="+", required=True, help="Puzzle date strings to play (e.g., 2025-05-12 2025-05-13).")
+    parser.add_argument("--max-concurrency", type=int, default=8,
+                        help="Maximum number of games running at once across all models (default: 8).")
+    parser.add_argument("--per-model-concurrency", type=int, default=2,
+                        help="Maximum number of games running at once for a single model (default: 2).")
+    parser.add_argument("--results-dir", type=str, default="./results", help="Directory to write per-run result files to (default: ./results).")
+    add_game_arguments(parser)
+    add_sweep_budget_arguments(parser)
+    add_runtime_arguments(parser)
 
     args = parser.parse_args()
+    check_game_arguments(parser, args)
     return args
@@ -1,92 +1,369 @@
-
-from flask import Flask, render_template
-from flask_socketio import SocketIO, emit
+from flask import Flask, abort, jsonify, render_template, request, send_from_directory
+from flask_socketio import SocketIO, emit, join_room, leave_room
+import hashlib
 import sys
 import os
+import threading
+import uuid
 
 # Add the parent directory to the Python path to import the game logic
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from bracket_city_mcp.puzzle_loader import load_game_data_by_date
-from bracket_city_mcp.game.game import Game
-from graph import build_llm_message, parse_llm_response, heal_llm_output
+from graph import PromptBuilder, parse_llm_response, heal_llm_output
 from llm_utils import call_llm_with_retry
+from puzzles import new_game
+from repair import repair_clue_answer
+from results_store import LEADERBOARD_DIMENSIONS, RESULTS_DB_NAME, ResultsStore
 
 app = Flask(__name__, template_folder='templates', static_folder='static')
-socketio = SocketIO(app, cors_allowed_origins="*")
+# Games run in background threads that block on threading primitives (pause, locks, LLM calls), which
+# only works with the threading server; pinned so installing eventlet or gevent doesn't change it
+socketio = SocketIO(app, async_mode="threading", cors_allowed_origins="*")
+
+MAX_STEPS = 100
+
+# Where each game's runs write their results store
+RESULTS_DIRS = {
+    'bracket_city': os.environ.get('BRACKET_CITY_RESULTS_DIR', os.path.join(os.path.dirname(__file__), '..', 'results')),
+    'wordle': os.environ.get('WORDLE_RESULTS_DIR', os.path.join(os.path.dirname(__file__), '..', '..', 'wordle_agent', 'results')),
+}
+LEADERBOARD_PAGE_SIZE = 50
+LEADERBOARD_MAX_PAGE_SIZE = 500
+
+class GameSession:
+    """
+    One game running in a background task. Its events go to the socket.io room `game:<game_id>`,
+    so any number of viewers can watch it, and pause/cancel only affect this game.
+    """
+
+    def __init__(self, date_str, model_name, owner_sid, max_steps=MAX_STEPS):
+        self.game_id = str(uuid.uuid4())
+        self.room = f"game:{self.game_id}"
+        self.date_str = date_str
+        self.model_name = model_name
+        self.owner_sid = owner_sid
+        self.max_steps = max_steps
+        self.step_count = 0
+        self.status = "starting"
+        self._running = threading.Event()  # cleared while paused
+        self._running.set()
+        self._cancelled = threading.Event()
+        # What clients have been sent so far, as of `version`. Deltas are computed against it.
+        self._view_lock = threading.Lock()
+        self.version = 0
+        self.game_text = ""
+        self.clues = {}  # active clue id -> rendered text, in display order
+        self.prompt = ""
+
+    def pause(self, paused):
+        if paused:
+            self._running.clear()
+        else:
+            self._running.set()
+        self.status = "paused" if paused else "running"
+        self.emit('game_paused', {'paused': paused})
+
+    def cancel(self):
+        self._cancelled.set()
+        self._running.set()  # wake a paused game so it can stop
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def wait_if_paused(self):
+        """Blocks while the game is paused. Returns False if it was cancelled meanwhile."""
+        self._running.wait()
+        return not self.cancelled
+
+    def emit(self, event, data):
+        socketio.emit(event, {'game_id': self.game_id, **data}, to=self.room)
+
+    def publish(self, game_text=None, clues=None, prompt=None):
+        """
+        Sends a `game_delta` with what changed since the last version: text patches for the game text
+        and the prompt, and the clues that were added, changed or are no longer active.
+        """
+        with self._view_lock:
+            delta = {'base_version': self.version, 'version': self.version + 1, 'step_count': self.step_count}
+            if game_text is not None and game_text != self.game_text:
+                delta['game_text_patch'] = text_patch(self.game_text, game_text)
+                self.game_text = game_text
+            if prompt is not None and prompt != self.prompt:
+                delta['prompt_patch'] = text_patch(self.prompt, prompt)
+                self.prompt = prompt
+            if clues is not None:
+                removed = [clue_id for clue_id in self.clues if clue_id not in clues]
+                added = [{'id': clue_id, 'text': text} for clue_id, text in clues.items() if clue_id not in self.clues]
+                changed = [{'id': clue_id, 'text': text} for clue_id, text in clues.items()
+                           if clue_id in self.clues and self.clues[clue_id] != text]
+                if removed:
+                    delta['clues_removed'] = removed
+                if added:
+                    delta['clues_added'] = added
+                if changed:
+                    delta['clues_changed'] = changed
+                self.clues = dict(clues)
+            self.version += 1
+            # Emitted under the lock so that deltas reach a room in version order
+            self.emit('game_delta', delta)
+
+    def snapshot(self):
+        """The full view as of the current version, for clients that join late or fall out of sync."""
+        with self._view_lock:
+            return {'game_id': self.game_id, 'version': self.version, 'step_count': self.step_count,
+                    'game_text': self.game_text, 'prompt': self.prompt,
+                    'clues': [{'id': clue_id, 'text': text} for clue_id, text in self.clues.items()]}
+
+    def describe(self):
+        return {'game_id': self.game_id, 'date': self.date_str, 'model': self.model_name,
+                'status': self.status, 'step_count': self.step_count}
+
+_sessions_lock = threading.Lock()
+sessions = {}  # game_id -> GameSession
 
-game_paused = False
+def get_session(data):
+    with _sessions_lock:
+        return sessions.get((data or {}).get('game_id'))
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
-def get_clues_with_text(game_instance):
-    return [{'id': clue_id, 'text': game_instance.clues.get(clue_id).get_rendered_text(game_instance)} for clue_id in game_instance.active_clues]
+# One read-only connection to each game's results store per worker thread
+_results_stores = threading.local()
+_results_catch_up_lock = threading.Lock()
+_results_caught_up = set()  # games whose store has been opened for writing by this process
 
-@socketio.on('pause_game')
-def handle_pause_game(data):
-    global game_paused
-    game_paused = data.get('paused', False)
+def get_results_store(game):
+    """
+    This thread's read-only connection to the game's results store, or None while the store does not exist.
+    The first connection of the process opens the store for writing once, which brings its leaderboard up
+    to date if it was written before the leaderboard existed; after that the writers keep it current.
+    """
+    stores = getattr(_results_stores, 'stores', None)
+    if stores is None:
+        stores = _results_stores.stores = {}
+    if game not in stores:
+        db_path = os.path.join(RESULTS_DIRS[game], RESULTS_DB_NAME)
+        if not os.path.exists(db_path):
+            return None
+        with _results_catch_up_lock:
+            if game not in _results_caught_up:
+                ResultsStore(db_path).close()
+                _results_caught_up.add(game)
+        stores[game] = ResultsStore(db_path, read_only=True)
+    return stores[game]
 
-@socketio.on('start_game')
-def handle_start_game(data):
-    global game_paused
-    game_paused = False
+@app.route('/results/')
+@app.route('/results/<path:filename>')
+def results_page(filename='index.html'):
+    """The results page (index.html and script.js next to this file), which reads /api/leaderboard."""
+    if filename not in ('index.html', 'script.js'):
+        abort(404)
+    return send_from_directory(os.path.dirname(os.path.abspath(__file__)), filename)
 
-    date_str = data.get('date')
-    model_name = data.get('model')
+@app.route('/api/leaderboard/<dimension>')
+def leaderboard(dimension):
+    """
+    One page of the leaderboard aggregates, grouped by model, provider, puzzle or model_puzzle.
+    Query parameters: game, model, provider, puzzle (filters), sort, order (asc/desc), limit and offset.
+    The aggregates are updated as runs are stored, so this only reads them. The ETag changes with every
+    stored run, and a request whose If-None-Match still matches gets a 304 without running the query.
+    """
+    game = request.args.get('game', 'bracket_city')
+    if dimension not in LEADERBOARD_DIMENSIONS or game not in RESULTS_DIRS:
+        abort(404)
+    try:
+        limit = min(max(int(request.args.get('limit', LEADERBOARD_PAGE_SIZE)), 1), LEADERBOARD_MAX_PAGE_SIZE)
+        offset = max(int(request.args.get('offset', 0)), 0)
+    except ValueError:
+        return jsonify({'error': 'limit and offset must be integers'}), 400
+    filters = {column: request.args[name] for name, column in
+               (('model', 'model_name'), ('provider', 'provider'), ('puzzle', 'puzzle_key')) if request.args.get(name)}
 
-    if not date_str or not model_name:
-        emit('error', {'message': 'Date and model are required.'})
-        return
+    store = get_results_store(game)
+    version = store.leaderboard_version() if store is not None else 0
+    etag = hashlib.sha1(f"{version}:{dimension}:{sorted(request.args.items(multi=True))}".encode()).hexdigest()
+    if etag in request.if_none_match:
+        response = app.response_class(status=304)
+    else:
+        total, items = 0, []
+        if store is not None:
+            try:
+                total, items = store.leaderboard(game, dimension, filters, request.args.get('sort', 'games'),
+                                                 request.args.get('order', 'desc') != 'asc', limit, offset)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+        response = jsonify({'game': game, 'dimension': dimension, 'version': version, 'total': total,
+                            'limit': limit, 'offset': offset, 'items': items})
+    response.set_etag(etag)
+    # Clients may keep the response but must revalidate it, which costs a 304 when nothing changed
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def text_patch(old, new):
+    """
+    The edits turning old into new, as [start, end, replacement] with offsets into old.
+    Clients apply them from last to first so that earlier offsets stay valid. The game text only changes
+    where bracketed clues are replaced, so one edit spanning everything between the common prefix and
+    suffix is small, and finding it is linear in the text length, unlike a full diff.
+    """
+    if old == new:
+        return []
+    start = len(os.path.commonprefix([old, new]))
+    limit = min(len(old), len(new)) - start
+    end = 0
+    while end < limit and old[-1 - end] == new[-1 - end]:
+        end += 1
+    return [[start, len(old) - end, new[start:len(new) - end]]]
+
+def get_clues_with_text(game_instance, prompt_builder):
+    return {clue_id: prompt_builder.rendered_clue_text(clue_id) for clue_id in game_instance.active_clues}
+
+def error_context(session, game, stage):
+    """Context of an unparseable response for the parse error log, like graph.error_context."""
+    return {"run_id": session.game_id, "model_name": session.model_name, "puzzle_date": session.date_str,
+            "step": session.step_count, "active_clue_ids": list(game.active_clues), "stage": stage}
 
+def parse_or_repair(session, game, llm_response):
+    """parse_llm_response, then the local repair stage, then the LLM healer."""
+    clue_id, answer = parse_llm_response(llm_response, error_context(session, game, "response"))
+    if clue_id is not None and answer is not None:
+        return clue_id, answer
+    clue_id, answer = repair_clue_answer(llm_response, game.active_clues, game.clues)
+    if clue_id is not None:
+        session.emit('llm_response', {'response': f"clue_id: {clue_id}\nanswer: {answer}", 'repaired': True})
+        return clue_id, answer
     try:
-        game = Game(load_game_data_by_date(date_str))
-        emit('game_state', {'game_text': game.get_rendered_game_text(), 'clues': get_clues_with_text(game)})
+        healed_response = heal_llm_output(llm_response)
+        session.emit('llm_response', {'response': healed_response, 'healed': True})
+        return parse_llm_response(healed_response, error_context(session, game, "healed"))
+    except Exception as e:
+        session.emit('error', {'message': f'LLM healing failed: {e}'})
+        return None, None
 
-        step_count = 0
-        max_steps = 100  # You can make this configurable
+def run_game(session):
+    """Plays one game in a background task, checking for pause and cancel between LLM calls."""
+    try:
+        game = new_game(session.date_str)
+        prompt_builder = PromptBuilder(game)
+        session.status = "running"
+        session.publish(game_text=game.get_rendered_game_text(), clues=get_clues_with_text(game, prompt_builder))
 
-        while not game.is_complete and step_count < max_steps:
-            while game_paused:
-                socketio.sleep(1)
+        while not game.is_complete and session.step_count < session.max_steps:
+            if not session.wait_if_paused():
+                break
 
-            llm_message = build_llm_message(game)
-            emit('llm_prompt', {'prompt': llm_message})
+            llm_message = prompt_builder.build()
+            session.publish(prompt=llm_message)
 
             llm_response = call_llm_with_retry(
-                model_name=model_name,
+                model_name=session.model_name,
                 prompt_message=llm_message
             )
-            emit('llm_response', {'response': llm_response})
-
-            clue_id, answer = parse_llm_response(llm_response)
-
-            if clue_id is None or answer is None:
-                try:
-                    healed_response = heal_llm_output(llm_response)
-                    clue_id, answer = parse_llm_response(healed_response)
-                    emit('llm_response', {'response': healed_response, 'healed': True})
-                except Exception as e:
-                    emit('error', {'message': f'LLM healing failed: {e}'})
+            if session.cancelled:
+                break
+            session.emit('llm_response', {'response': llm_response})
 
+            clue_id, answer = parse_or_repair(session, game, llm_response)
 
             if clue_id and answer:
                 if game.clues.get(clue_id):
                     game.answer_clue(clue_id, answer)
-                    emit('clue_answered', {'clue_id': clue_id, 'answer': answer, 'correct': game.clues.get(clue_id).completed})
+                    prompt_builder.invalidate(clue_id)
+                    session.emit('clue_answered', {'clue_id': clue_id, 'answer': answer, 'correct': game.clues.get(clue_id).completed})
                 else:
-                    emit('error', {'message': f'Clue with id {clue_id} not found.'})
+                    session.emit('error', {'message': f'Clue with id {clue_id} not found.'})
 
-            step_count += 1
-            emit('game_state', {'game_text': game.get_rendered_game_text(), 'clues': get_clues_with_text(game), 'step_count': step_count})
-            socketio.sleep(1) # Add a small delay to allow the UI to update
+            session.step_count += 1
+            # The builder only re-renders the game text after a correct answer
+            session.publish(game_text=prompt_builder.game_text(), clues=get_clues_with_text(game, prompt_builder))
 
-        emit('game_over', {'won': game.is_complete, 'steps': step_count})
+        if session.cancelled:
+            session.status = "cancelled"
+            session.emit('game_cancelled', {'steps': session.step_count})
+        else:
+            session.status = "finished"
+            session.emit('game_over', {'won': game.is_complete, 'steps': session.step_count})
 
     except Exception as e:
-        emit('error', {'message': str(e)})
+        session.status = "failed"
+        session.emit('error', {'message': str(e)})
+    finally:
+        with _sessions_lock:
+            sessions.pop(session.game_id, None)
+
+@socketio.on('start_game')
+def handle_start_game(data):
+    date_str = data.get('date')
+    model_name = data.get('model')
+
+    if not date_str or not model_name:
+        emit('error', {'message': 'Date and model are required.'})
+        return
+
+    session = GameSession(date_str, model_name, request.sid)
+    with _sessions_lock:
+        sessions[session.game_id] = session
+    join_room(session.room)
+    emit('game_started', session.describe())
+    socketio.start_background_task(run_game, session)
+
+@socketio.on('pause_game')
+def handle_pause_game(data):
+    session = get_session(data)
+    if session is None:
+        emit('error', {'message': 'Game not found.'})
+        return
+    session.pause(data.get('paused', False))
+
+@socketio.on('cancel_game')
+def handle_cancel_game(data):
+    session = get_session(data)
+    if session is None:
+        emit('error', {'message': 'Game not found.'})
+        return
+    session.cancel()
+
+@socketio.on('join_game')
+def handle_join_game(data):
+    """Lets another viewer follow a running game."""
+    session = get_session(data)
+    if session is None:
+        emit('error', {'message': 'Game not found.'})
+        return
+    join_room(session.room)
+    emit('game_started', session.describe())
+    emit('game_snapshot', session.snapshot())
+
+@socketio.on('request_resync')
+def handle_request_resync(data):
+    """Sent by a client that missed a delta (its version does not match a delta's base_version)."""
+    session = get_session(data)
+    if session is None:
+        emit('error', {'message': 'Game not found.'})
+        return
+    emit('game_snapshot', session.snapshot())
+
+@socketio.on('leave_game')
+def handle_leave_game(data):
+    session = get_session(data)
+    if session is not None:
+        leave_room(session.room)
+
+@socketio.on('list_games')
+def handle_list_games():
+    with _sessions_lock:
+        emit('games', {'games': [session.describe() for session in sessions.values()]})
+
+@socketio.on('disconnect')
+def handle_disconnect(*args):
+    # Stop spending tokens on games whose owner has left
+    with _sessions_lock:
+        owned = [session for session in sessions.values() if session.owner_sid == request.sid]
+    for session in owned:
+        session.cancel()
 
 if __name__ == '__main__':
     socketio.run(app, debug=True)
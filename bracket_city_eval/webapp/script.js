@@ -1,77 +1,195 @@
+const LEADERBOARD_API = '/api/leaderboard';
+const PAGE_SIZE = 50;
+const SPECIFIC_DATE = '2025-05-14';
+
+// Leaderboard key columns of each grouping
+const DIMENSION_KEYS = {
+    model: ['model_name'],
+    provider: ['provider'],
+    puzzle: ['puzzle_key'],
+    model_puzzle: ['model_name', 'puzzle_key']
+};
+
+// Results table column -> leaderboard field it is sorted by
+const SORT_FIELDS = {
+    modelProvider: 'provider',
+    modelName: 'model_name',
+    totalGames: 'games',
+    completedGames: 'wins',
+    successRate: 'win_rate',
+    avgSteps: 'mean_steps',
+    avgDuration: 'mean_seconds',
+    avgCost: 'mean_cost',
+    avgPromptTokens: 'mean_prompt_tokens',
+    avgCompletionTokens: 'mean_completion_tokens'
+};
+
+// False once the API has failed, after which pages are computed from data/results.json
+let useApi = true;
+let localResults = null;
+
 async function fetchData() {
     const response = await fetch('data/results.json');
     const data = await response.json();
     return data;
 }
 
-function aggregateData(allResults) {
-    const aggregatedResults = {};
-    const dailyCompletion = {};
+// One page of a leaderboard grouping from the server.
+// The server sends ETags with Cache-Control: no-cache, so the browser revalidates and gets a 304 when nothing changed.
+async function fetchLeaderboardPage(dimension, params, offset) {
+    const query = new URLSearchParams({ game: 'bracket_city', ...params, limit: PAGE_SIZE, offset: offset });
+    const response = await fetch(`${LEADERBOARD_API}/${dimension}?${query}`);
+    if (!response.ok) {
+        throw new Error(`Leaderboard request failed: ${response.status}`);
+    }
+    return response.json();
+}
 
-    allResults.forEach(result => {
-        const modelNameFull = result.model_name;
-        const modelProvider = result.model_provider || 'unknown'; // Default to 'unknown' if not present
-        const modelNameShort = result.model_name; // This will be the part after the slash
-        const puzzleDate = result.puzzle_date;
-
-        // Aggregate by model
-        if (!aggregatedResults[modelNameFull]) {
-            aggregatedResults[modelNameFull] = {
-                modelProvider: modelProvider,
-                modelName: modelNameShort,
-                totalGames: 0,
-                completedGames: 0,
-                totalSteps: 0,
-                totalDuration: 0,
-                totalCost: 0,
-                totalPromptTokens: 0,
-                totalCompletionTokens: 0
-            };
+// The same page computed from the exported results.json, for when the page is hosted statically
+async function localLeaderboardPage(dimension, params, offset) {
+    if (localResults === null) {
+        localResults = await fetchData();
+    }
+    const keys = DIMENSION_KEYS[dimension];
+    const groups = {};
+
+    localResults.forEach(result => {
+        // parse_results splits the provider off the model name
+        const row = {
+            model_name: result.model_provider ? `${result.model_provider}/${result.model_name}` : result.model_name,
+            provider: result.model_provider || 'unknown',
+            puzzle_key: result.puzzle_date
+        };
+        if ((params.model && row.model_name !== params.model) || (params.provider && row.provider !== params.provider)
+                || (params.puzzle && row.puzzle_key !== params.puzzle)) {
+            return;
         }
-
-        aggregatedResults[modelNameFull].totalGames++;
-        if (result.game_completed) {
-            aggregatedResults[modelNameFull].completedGames++;
+        const key = keys.map(column => row[column]).join('\u0000');
+        if (!groups[key]) {
+            groups[key] = { games: 0, wins: 0, steps: 0, prompt_tokens: 0, completion_tokens: 0, cost: 0, seconds: 0, timed_games: 0 };
+            keys.forEach(column => groups[key][column] = row[column]);
+            if (keys.includes('model_name')) {
+                groups[key].provider = row.provider;
+            }
         }
-        aggregatedResults[modelNameFull].totalSteps += result.number_of_steps;
-        
-        if (result.start_time && result.end_time) {
-            aggregatedResults[modelNameFull].totalDuration += (result.end_time - result.start_time);
+        const group = groups[key];
+        group.games++;
+        if (result.game_completed) {
+            group.wins++;
         }
-        
-        aggregatedResults[modelNameFull].totalCost += result.total_cost;
-        aggregatedResults[modelNameFull].totalPromptTokens += result.prompt_tokens;
-        aggregatedResults[modelNameFull].totalCompletionTokens += result.completion_tokens;
-
-        // Aggregate by date for completion rate
-        if (!dailyCompletion[puzzleDate]) {
-            dailyCompletion[puzzleDate] = {
-                totalGames: 0,
-                completedGames: 0
-            };
+        group.steps += result.number_of_steps || 0;
+        group.prompt_tokens += result.prompt_tokens || 0;
+        group.completion_tokens += result.completion_tokens || 0;
+        group.cost += result.total_cost || 0;
+        if (result.start_time != null && result.end_time != null) {
+            group.seconds += result.end_time - result.start_time;
+            group.timed_games++;
         }
-        dailyCompletion[puzzleDate].totalGames++;
-        if (result.game_completed) {
-            dailyCompletion[puzzleDate].completedGames++;
+    });
+
+    const items = Object.values(groups).map(group => ({
+        ...group,
+        win_rate: group.wins / group.games,
+        mean_steps: group.steps / group.games,
+        mean_prompt_tokens: group.prompt_tokens / group.games,
+        mean_completion_tokens: group.completion_tokens / group.games,
+        mean_cost: group.cost / group.games,
+        mean_seconds: group.timed_games > 0 ? group.seconds / group.timed_games : null
+    }));
+    const sortBy = params.sort || 'games';
+    const direction = params.order === 'asc' ? 1 : -1;
+    items.sort((a, b) => {
+        const valA = a[sortBy];
+        const valB = b[sortBy];
+        if (typeof valA === 'string') {
+            return direction * valA.localeCompare(valB);
         }
+        return direction * ((valA ?? -Infinity) - (valB ?? -Infinity));
     });
+    return { total: items.length, items: items.slice(offset, offset + PAGE_SIZE) };
+}
 
-    return { aggregatedResults, dailyCompletion };
+async function loadLeaderboardPage(dimension, params, offset) {
+    if (useApi) {
+        try {
+            return await fetchLeaderboardPage(dimension, params, offset);
+        } catch (error) {
+            console.warn('Leaderboard API unavailable, aggregating data/results.json instead:', error);
+            useApi = false;
+        }
+    }
+    return localLeaderboardPage(dimension, params, offset);
+}
+
+// A leaderboard grouping shown one page at a time: the rows loaded so far are passed to render,
+// and the next page is only fetched when the "load more" button is clicked.
+function createLeaderboardSection(dimension, params, moreButtonId, render) {
+    const section = { dimension: dimension, params: params, items: [], total: 0 };
+    const button = document.getElementById(moreButtonId);
+
+    section.loadMore = async () => {
+        button.disabled = true;
+        const page = await loadLeaderboardPage(section.dimension, section.params, section.items.length);
+        section.items.push(...page.items);
+        section.total = page.total;
+        render(section.items);
+        button.textContent = `Load more (showing ${section.items.length} of ${section.total})`;
+        button.style.display = section.items.length < section.total ? '' : 'none';
+        button.disabled = false;
+    };
+
+    section.reload = async (newParams) => {
+        section.params = newParams;
+        section.items = [];
+        await section.loadMore();
+    };
+
+    button.addEventListener('click', section.loadMore);
+    return section;
 }
 
+// A leaderboard row in the shape the tables and graphs use
+function fromLeaderboardItem(item) {
+    const prefix = `${item.provider}/`;
+    return {
+        modelProvider: item.provider,
+        modelName: item.model_name.startsWith(prefix) ? item.model_name.slice(prefix.length) : item.model_name,
+        totalGames: item.games,
+        completedGames: item.wins,
+        totalSteps: item.steps,
+        totalDuration: item.seconds,
+        totalCost: item.cost,
+        totalPromptTokens: item.prompt_tokens,
+        totalCompletionTokens: item.completion_tokens
+    };
+}
+
+function toAggregatedResults(items) {
+    const aggregatedResults = {};
+    items.forEach(item => aggregatedResults[item.model_name] = fromLeaderboardItem(item));
+    return aggregatedResults;
+}
+
+let currentSortBy = 'modelName';
+let currentSortOrder = 'asc';
+
 function renderTable(aggregatedResults) {
+    const header = (key, label) => {
+        const order = key === currentSortBy ? ` ${currentSortOrder}` : '';
+        return `<th id="sort-${key}" class="sortable${order}" data-sort="${key}">${label}</th>`;
+    };
     let tableHTML = '<table>';
     tableHTML += '<thead><tr>' +
-                 '<th id="sort-modelProvider" class="sortable" data-sort="modelProvider">Model Provider</th>' +
-                 '<th id="sort-modelName" class="sortable" data-sort="modelName">Model Name</th>' +
-                 '<th id="sort-totalGames" class="sortable" data-sort="totalGames">Games Run</th>' +
-                 '<th id="sort-completedGames" class="sortable" data-sort="completedGames">Games Completed</th>' +
-                 '<th id="sort-successRate" class="sortable" data-sort="successRate">Success Rate (%)</th>' +
-                 '<th id="sort-avgSteps" class="sortable" data-sort="avgSteps">Avg Steps</th>' +
-                 '<th id="sort-avgDuration" class="sortable" data-sort="avgDuration">Avg Duration (s)</th>' +
-                 '<th id="sort-avgCost" class="sortable" data-sort="avgCost">Avg Cost ($)</th>' +
-                 '<th id="sort-avgPromptTokens" class="sortable" data-sort="avgPromptTokens">Avg Prompt Tokens</th>' +
-                 '<th id="sort-avgCompletionTokens" class="sortable" data-sort="avgCompletionTokens">Avg Completion Tokens</th>' +
+                 header('modelProvider', 'Model Provider') +
+                 header('modelName', 'Model Name') +
+                 header('totalGames', 'Games Run') +
+                 header('completedGames', 'Games Completed') +
+                 header('successRate', 'Success Rate (%)') +
+                 header('avgSteps', 'Avg Steps') +
+                 header('avgDuration', 'Avg Duration (s)') +
+                 header('avgCost', 'Avg Cost ($)') +
+                 header('avgPromptTokens', 'Avg Prompt Tokens') +
+                 header('avgCompletionTokens', 'Avg Completion Tokens') +
                  '</tr></thead>';
     tableHTML += '<tbody>';
 
@@ -108,65 +226,17 @@ function renderTable(aggregatedResults) {
     document.querySelectorAll('#results-table th.sortable').forEach(header => {
         header.addEventListener('click', () => {
             const sortBy = header.dataset.sort;
-            const currentOrder = header.dataset.order || 'asc';
-            const newOrder = currentOrder === 'asc' ? 'desc' : 'asc';
-
-            // Remove existing order indicators
-            document.querySelectorAll('#results-table th.sortable').forEach(h => {
-                h.removeAttribute('data-order');
-                h.classList.remove('asc', 'desc');
-            });
-
-            // Set new order indicator
-            header.dataset.order = newOrder;
-            header.classList.add(newOrder);
-
+            const newOrder = sortBy === currentSortBy && currentSortOrder === 'asc' ? 'desc' : 'asc';
             sortAndRenderTable(sortBy, newOrder);
         });
     });
 }
 
-
-
+// Sorting is done by the leaderboard, so the table starts again from the first page in the new order
 function sortAndRenderTable(sortBy, order) {
     currentSortBy = sortBy;
     currentSortOrder = order;
-
-    const aggregatedResultsArray = Object.values(window.lastAggregatedResults);
-
-    aggregatedResultsArray.sort((a, b) => {
-        let valA = a[sortBy];
-        let valB = b[sortBy];
-
-        // Handle calculated fields for sorting
-        if (sortBy === 'successRate') {
-            valA = (a.completedGames / a.totalGames) * 100 || 0;
-            valB = (b.completedGames / b.totalGames) * 100 || 0;
-        } else if (sortBy === 'avgSteps') {
-            valA = a.totalSteps / a.totalGames || 0;
-            valB = b.totalSteps / b.totalGames || 0;
-        } else if (sortBy === 'avgDuration') {
-            valA = a.totalDuration / a.totalGames || 0;
-            valB = b.totalDuration / b.totalGames || 0;
-        } else if (sortBy === 'avgCost') {
-            valA = a.totalCost / a.totalGames || 0;
-            valB = b.totalCost / b.totalGames || 0;
-        } else if (sortBy === 'avgPromptTokens') {
-            valA = a.totalPromptTokens / a.totalGames || 0;
-            valB = b.totalPromptTokens / b.totalGames || 0;
-        } else if (sortBy === 'avgCompletionTokens') {
-            valA = a.totalCompletionTokens / a.totalGames || 0;
-            valB = b.totalCompletionTokens / b.totalGames || 0;
-        }
-
-        if (typeof valA === 'string') {
-            return order === 'asc' ? valA.localeCompare(valB) : valB.localeCompare(valA);
-        } else {
-            return order === 'asc' ? valA - valB : valB - valA;
-        }
-    });
-
-    renderTable(aggregatedResultsArray.reduce((obj, item) => (obj[item.modelNameFull] = item, obj), {}));
+    return modelSection.reload({ sort: SORT_FIELDS[sortBy], order: order });
 }
 
 function renderDailyCompletionGraph(dailyCompletion) {
@@ -262,58 +332,33 @@ function renderDurationVsCompletionRateGraph(aggregatedResults) {
     Plotly.newPlot('duration-vs-completion-rate-graph', [scatterTrace], scatterLayout);
 }
 
-async function init() {
-    const allResults = await fetchData();
-    const { aggregatedResults, dailyCompletion } = aggregateData(allResults);
-    window.lastAggregatedResults = aggregatedResults; // Store for sorting
+// The table and the model graphs show the models loaded so far
+const modelSection = createLeaderboardSection('model', { sort: 'model_name', order: 'asc' }, 'results-table-more', items => {
+    const aggregatedResults = toAggregatedResults(items);
     renderTable(aggregatedResults);
-    renderDailyCompletionGraph(dailyCompletion);
     renderCompletionTokensVsSuccessRateGraph(aggregatedResults);
     renderDurationVsCompletionRateGraph(aggregatedResults);
-    renderSpecificDateTable('2025-05-14', allResults);
-}
+});
 
-init();
+// Latest dates first, so loading more extends the graph back in time
+const dailySection = createLeaderboardSection('puzzle', { sort: 'puzzle_key', order: 'desc' }, 'daily-completion-more', items => {
+    const dailyCompletion = {};
+    items.forEach(item => dailyCompletion[item.puzzle_key] = { totalGames: item.games, completedGames: item.wins });
+    renderDailyCompletionGraph(dailyCompletion);
+});
 
-function renderSpecificDateTable(date, allResults) {
-    const filteredResults = allResults.filter(result => result.puzzle_date === date);
-
-    const aggregatedSpecificResults = {};
-
-    filteredResults.forEach(result => {
-        const modelNameFull = result.model_name;
-        const modelProvider = result.model_provider || 'unknown';
-        const modelNameShort = result.model_name;
-
-        if (!aggregatedSpecificResults[modelNameFull]) {
-            aggregatedSpecificResults[modelNameFull] = {
-                modelProvider: modelProvider,
-                modelName: modelNameShort,
-                totalGames: 0,
-                completedGames: 0,
-                totalSteps: 0,
-                totalDuration: 0,
-                totalCost: 0,
-                totalPromptTokens: 0,
-                totalCompletionTokens: 0
-            };
-        }
+const specificDateSection = createLeaderboardSection('model_puzzle', { puzzle: SPECIFIC_DATE, sort: 'model_name', order: 'asc' },
+    `results-${SPECIFIC_DATE}-more`, items => renderSpecificDateTable(SPECIFIC_DATE, toAggregatedResults(items)));
 
-        aggregatedSpecificResults[modelNameFull].totalGames++;
-        if (result.game_completed) {
-            aggregatedSpecificResults[modelNameFull].completedGames++;
-        }
-        aggregatedSpecificResults[modelNameFull].totalSteps += result.number_of_steps;
-        
-        if (result.start_time && result.end_time) {
-            aggregatedSpecificResults[modelNameFull].totalDuration += (result.end_time - result.start_time);
-        }
-        
-        aggregatedSpecificResults[modelNameFull].totalCost += result.total_cost;
-        aggregatedSpecificResults[modelNameFull].totalPromptTokens += result.prompt_tokens;
-        aggregatedSpecificResults[modelNameFull].totalCompletionTokens += result.completion_tokens;
-    });
+async function init() {
+    // The first section to fail over to results.json decides for the others
+    await modelSection.loadMore();
+    await Promise.all([dailySection.loadMore(), specificDateSection.loadMore()]);
+}
 
+init();
+
+function renderSpecificDateTable(date, aggregatedSpecificResults) {
     let tableHTML = '<table>';
     tableHTML += '<thead><tr><th>Model Provider</th><th>Model Name</th><th>Games Run</th><th>Games Completed</th><th>Success Rate (%)</th><th>Avg Steps</th><th>Avg Duration (s)</th><th>Avg Cost ($)</th><th>Avg Prompt Tokens</th><th>Avg Completion Tokens</th></tr></thead>';
     tableHTML += '<tbody>';
@@ -344,5 +389,5 @@ function renderSpecificDateTable(date, allResults) {
     }
 
     tableHTML += '</tbody></table>';
-    document.getElementById('results-2025-05-14-table').innerHTML = tableHTML;
-}
\ No newline at end of file
+    document.getElementById(`results-${date}-table`).innerHTML = tableHTML;
+}
@@ -1,18 +1,178 @@
-document.addEventListener('DOMContentLoaded', () => {    const socket = io();    const startButton = document.getElementById('start-button');    const dateInput = document.getElementById('date-input');    const modelInput = document.getElementById('model-input');    const gameStateDiv = document.getElementById('game-state');    const llmPromptDiv = document.getElementById('llm-prompt');    const llmResponseDiv = document.getElementById('llm-response');    
-    const pauseButton = document.getElementById('pause-button');
-    let isPaused = false;
+document.addEventListener('DOMContentLoaded', () => {
+    const socket = io();
+    const startButton = document.getElementById('start-button');
+    const dateInput = document.getElementById('date-input');
+    const modelInput = document.getElementById('model-input');
+    const gamesDiv = document.getElementById('games');
+    const gameTemplate = document.getElementById('game-template');
+
+    // game_id -> panel elements
+    const panels = {};
+
+    function createPanel(game) {
+        const node = gameTemplate.content.firstElementChild.cloneNode(true);
+        const panel = {
+            root: node,
+            title: node.querySelector('.game-title'),
+            status: node.querySelector('.game-status'),
+            pauseButton: node.querySelector('.pause-button'),
+            cancelButton: node.querySelector('.cancel-button'),
+            closeButton: node.querySelector('.close-button'),
+            gameState: node.querySelector('.game-state'),
+            llmResponse: node.querySelector('.llm-response'),
+            llmPrompt: node.querySelector('.llm-prompt'),
+            isPaused: false,
+            // Local copy of the game view, kept in step with the server by game_delta events.
+            // version is null until the first snapshot or delta base is known.
+            view: { version: null, gameText: '', clues: new Map(), prompt: '', stepCount: 0 },
+        };
+        panel.title.textContent = `${game.model} - ${game.date}`;
+
+        panel.pauseButton.addEventListener('click', () => {
+            panel.isPaused = !panel.isPaused;
+            socket.emit('pause_game', { game_id: game.game_id, paused: panel.isPaused });
+        });
+        panel.cancelButton.addEventListener('click', () => {
+            socket.emit('cancel_game', { game_id: game.game_id });
+        });
+        panel.closeButton.addEventListener('click', () => {
+            socket.emit('leave_game', { game_id: game.game_id });
+            node.remove();
+            delete panels[game.game_id];
+        });
+
+        gamesDiv.appendChild(node);
+        panels[game.game_id] = panel;
+        return panel;
+    }
+
+    function finishPanel(panel, status) {
+        panel.status.textContent = status;
+        panel.pauseButton.style.display = 'none';
+        panel.cancelButton.style.display = 'none';
+        panel.closeButton.style.display = 'inline-block';
+    }
+
+    // Applies [start, end, replacement] edits (offsets into the old text), last to first
+    function applyPatch(text, patch) {
+        for (let i = patch.length - 1; i >= 0; i--) {
+            const [start, end, replacement] = patch[i];
+            text = text.slice(0, start) + replacement + text.slice(end);
+        }
+        return text;
+    }
+
+    function renderView(panel) {
+        const view = panel.view;
+        panel.gameState.innerHTML = `<h3>Game State</h3><pre>${view.gameText}</pre>`;
+        panel.gameState.innerHTML += `<h3>Active Clues:</h3><ul>${[...view.clues].map(([id, text]) => `<li><b>${id}:</b> ${text}</li>`).join('')}</ul>`;
+        if (view.stepCount) {
+            panel.gameState.innerHTML += `<p>Steps: ${view.stepCount}</p>`;
+        }
+        panel.llmPrompt.innerHTML = `<pre>${view.prompt}</pre>`;
+    }
 
     startButton.addEventListener('click', () => {
         const date = dateInput.value;
         const model = modelInput.value;
         socket.emit('start_game', { date, model });
-        startButton.style.display = 'none';
-        pauseButton.style.display = 'inline-block';
     });
 
-    pauseButton.addEventListener('click', () => {
-        isPaused = !isPaused;
-        pauseButton.textContent = isPaused ? 'Resume' : 'Pause';
-        socket.emit('pause_game', { 'paused': isPaused });
+    socket.on('game_started', (data) => {
+        if (!panels[data.game_id]) {
+            const panel = createPanel(data);
+            if (data.status === 'starting') {
+                // This client started the game, so it sees every delta from the first one
+                panel.view.version = 0;
+            }
+        }
+        panels[data.game_id].status.textContent = 'Running';
+    });
+
+    socket.on('game_snapshot', (data) => {
+        const panel = panels[data.game_id];
+        if (!panel) return;
+        panel.view = {
+            version: data.version,
+            gameText: data.game_text,
+            clues: new Map(data.clues.map(clue => [clue.id, clue.text])),
+            prompt: data.prompt,
+            stepCount: data.step_count,
+        };
+        renderView(panel);
+    });
+
+    socket.on('game_delta', (data) => {
+        const panel = panels[data.game_id];
+        if (!panel || panel.view.version === null) return; // a snapshot is on its way
+        const view = panel.view;
+        if (data.base_version < view.version) return; // already included in the snapshot
+        if (data.base_version > view.version) {
+            socket.emit('request_resync', { game_id: data.game_id });
+            return;
+        }
+        if (data.game_text_patch) {
+            view.gameText = applyPatch(view.gameText, data.game_text_patch);
+        }
+        if (data.prompt_patch) {
+            view.prompt = applyPatch(view.prompt, data.prompt_patch);
+        }
+        (data.clues_removed || []).forEach(id => view.clues.delete(id));
+        (data.clues_changed || []).forEach(clue => view.clues.set(clue.id, clue.text));
+        (data.clues_added || []).forEach(clue => view.clues.set(clue.id, clue.text));
+        view.stepCount = data.step_count;
+        view.version = data.version;
+        renderView(panel);
+    });
+
+    socket.on('game_paused', (data) => {
+        const panel = panels[data.game_id];
+        if (!panel) return;
+        panel.isPaused = data.paused;
+        panel.pauseButton.textContent = data.paused ? 'Resume' : 'Pause';
+        panel.status.textContent = data.paused ? 'Paused' : 'Running';
+    });
+
+    socket.on('llm_response', (data) => {
+        const panel = panels[data.game_id];
+        if (!panel) return;
+        let content = `<h3>LLM Response</h3>`;
+        if (data.healed) {
+            content += `<strong>(Healed)</strong>`;
+        } else if (data.repaired) {
+            content += `<strong>(Repaired)</strong>`;
+        }
+        content += `<pre>${data.response}</pre>`;
+        panel.llmResponse.innerHTML = content;
+    });
+
+    socket.on('clue_answered', (data) => {
+        const panel = panels[data.game_id];
+        if (!panel) return;
+        const result = data.correct ? 'Correct' : 'Incorrect';
+        panel.llmResponse.innerHTML += `<p>Answered clue ${data.clue_id} with "${data.answer}". Result: ${result}</p>`;
+    });
+
+    socket.on('game_over', (data) => {
+        const panel = panels[data.game_id];
+        if (!panel) return;
+        const message = data.won ? 'Won!' : 'Game over!';
+        panel.gameState.innerHTML += `<h3>${message}</h3><p>Total steps: ${data.steps}</p>`;
+        finishPanel(panel, message);
+    });
+
+    socket.on('game_cancelled', (data) => {
+        const panel = panels[data.game_id];
+        if (!panel) return;
+        finishPanel(panel, `Cancelled after ${data.steps} steps`);
+    });
+
+    socket.on('error', (data) => {
+        const panel = data.game_id && panels[data.game_id];
+        if (panel) {
+            panel.llmResponse.innerHTML += `<p class="error">Error: ${data.message}</p>`;
+        } else {
+            alert(`Error: ${data.message}`);
+        }
     });
-;    socket.on('game_state', (data) => {        gameStateDiv.innerHTML = `<h2>Game State</h2><pre>${data.game_text}</pre>`;        if (data.clues) {            gameStateDiv.innerHTML += `<h3>Active Clues:</h3><ul>${data.clues.map(clue => `<li><b>${clue.id}:</b> ${clue.text}</li>`).join('')}</ul>`;        }        if (data.step_count) {            gameStateDiv.innerHTML += `<p>Steps: ${data.step_count}</p>`;        }    });    socket.on('llm_prompt', (data) => {        llmPromptDiv.innerHTML = `<h3>LLM Prompt</h3><pre>${data.prompt}</pre>`;    });    socket.on('llm_response', (data) => {        let content = `<h3>LLM Response</h3>`;        if (data.healed) {            content += `<strong>(Healed)</strong>`;        }        content += `<pre>${data.response}</pre>`;        llmResponseDiv.innerHTML = content;    });    socket.on('clue_answered', (data) => {        const result = data.correct ? 'Correct' : 'Incorrect';        llmResponseDiv.innerHTML += `<p>Answered clue ${data.clue_id} with "${data.answer}". Result: ${result}</p>`;    });    socket.on('game_over', (data) => {        const message = data.won ? 'You won!' : 'Game over!';        gameStateDiv.innerHTML += `<h2>${message}</h2><p>Total steps: ${data.steps}</p>`;    });    socket.on('error', (data) => {        alert(`Error: ${data.message}`);    });});
\ No newline at end of file
+});
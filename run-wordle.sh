@@ -4,6 +4,7 @@
 
 # Example usage:
 # ./run-wordle.sh "openai/gpt-4.1-mini,openai/gpt-4o" "hello,world,apple"
+# Set WORKERS to change how many games run concurrently (default: 8).
 
 set -e
 
@@ -12,12 +13,5 @@ if [ -z "$1" ] || [ -z "$2" ]; then
   exit 1
 fi
 
-MODELS=$(echo $1 | tr "," " ")
-WORDS=$(echo $2 | tr "," " ")
-
-for model in $MODELS; do
-  for word in $WORDS; do
-    echo "Running Wordle with model: $model and word: $word"
-    uv run python -m wordle_agent.main --model $model --word $word --turns 100
-  done
-done
+echo "Running Wordle with models: $1 and words: $2"
+uv run python -m wordle_agent.batch --models "$1" --words "$2" --turns 100 --workers "${WORKERS:-8}"
@@ -1,19 +1,75 @@
 from wordle import wordle
-from .graph import app, State
+from .graph import get_app, State, map_color_to_code
+from .constraints import CandidateSet, load_word_list, pattern_code
+from .patterns import load_pattern_table, score_guesses, solve
+from bracket_city_eval.results_store import append_result
+from bracket_city_eval.checkpoints import invoke_options, load_checkpoint, open_checkpointer, run_config
 import json
 import uuid
 import os
 import time
 
 class WordleAgent:
-    def __init__(self, llm_name, word, turns=6, results_dir=None):
+    def __init__(self, llm_name, word, turns=6, results_dir=None, word_list=None, candidate_hint="none", pattern_table=None, stream=False,
+                 run_id=None, checkpoint_path=None, budget=None):
+        self.run_id = run_id or str(uuid.uuid4())
+        # When set, the state is checkpointed after every step and the game can be resumed by run_id
+        self.checkpoint_path = checkpoint_path
         self.llm_name = llm_name
         self.word = word
         self.turns = turns
         self.results_dir = results_dir
+        self.word_list = word_list
+        self.candidate_hint = candidate_hint
+        self.pattern_table = pattern_table
+        self.stream = stream
+        # Per-game limits on tokens and cost (see bracket_city_eval.budget)
+        self.budget = budget
+        self._checkpointer = None
 
-    def run(self):
-        initial_state = State(
+    @classmethod
+    def resume(cls, run_id, checkpoint_path, **kwargs):
+        """An agent that continues the checkpointed game run_id, with the model, word and options it was started with."""
+        checkpointer = open_checkpointer(checkpoint_path)
+        saved_state = load_checkpoint(get_app(checkpointer), run_id)
+        if saved_state is None:
+            raise ValueError(f"No checkpoint for run {run_id} in {checkpoint_path}")
+        agent = cls(llm_name=saved_state["model_name"], word=saved_state["game"].word, turns=saved_state["max_steps"],
+                    candidate_hint=saved_state["candidate_hint"], stream=saved_state["stream"], budget=saved_state.get("budget"),
+                    run_id=run_id, checkpoint_path=checkpoint_path, **kwargs)
+        # run() continues on the graph the checkpoint was just read from
+        agent._checkpointer = checkpointer
+        return agent
+
+    def get_checkpointer(self):
+        """The checkpointer of this agent's graph, opened on first use; None without a checkpoint_path."""
+        if self._checkpointer is None and self.checkpoint_path:
+            self._checkpointer = open_checkpointer(self.checkpoint_path)
+        return self._checkpointer
+
+    def run(self, resume=False):
+        """Plays the game, or with resume=True continues it from its last checkpoint."""
+        checkpointer = self.get_checkpointer()
+        start_time = time.time()
+        # None continues from the last checkpoint instead of starting over
+        final_state = get_app(checkpointer).invoke(None if resume else self.initial_state(), run_config(self.run_id),
+                                                   **invoke_options(checkpointer))
+        total_time = time.time() - start_time
+
+        if final_state["game_won"]:
+            print(f"Solved in {len(final_state['game'].guesses)} turns!")
+        elif final_state.get("budget_exhausted"):
+            print(f"Stopped by the budget ({final_state['budget_exhausted']}). The word was {final_state['game'].word}")
+        else:
+            print(f"Failed to solve. The word was {final_state['game'].word}")
+
+        results = self.build_results(final_state, total_time)
+        if self.results_dir:
+            self.save_results(results)
+        return results
+
+    def initial_state(self):
+        return State(
             game=wordle.Wordle(self.word, self.turns),
             llm_message=None,
             llm_response=None,
@@ -23,33 +79,58 @@ class WordleAgent:
             game_over=False,
             game_won=False,
             model_name=self.llm_name,
+            candidates=CandidateSet(load_word_list(self.word_list)) if self.word_list else None,
+            candidate_hint=self.candidate_hint,
+            rejection=None,
+            turn_rejections=0,
+            rejected_guesses=[],
+            stream=self.stream,
+            stream_stats=None,
+            local_repairs=0,
+            llm_heals=0,
+            timeline=[],
+            usage=None,
+            budget=self.budget,
+            status=None,
+            budget_exhausted=None,
         )
 
-        start_time = time.time()
-        final_state = app.invoke(initial_state, {"recursion_limit": 1000})
-        end_time = time.time()
-        total_time = end_time - start_time
-
-        if final_state["game_won"]:
-            print(f"Solved in {final_state['step_count']} turns!")
-        else:
-            print(f"Failed to solve. The word was {final_state['game'].word}")
+    def score_against_baseline(self, game):
+        """Per-turn regret of the played guesses and the entropy solver's game, from the precomputed pattern table."""
+        table = load_pattern_table(self.pattern_table)
+        played = [(guess.word, pattern_code([map_color_to_code(color) for color in guess.colors])) for guess in game.guesses]
+        scores = {"guess_scores": score_guesses(table, played)}
+        scores["total_regret"] = sum(s["regret"] for s in scores["guess_scores"] if s["regret"] is not None)
+        if self.word in table.answer_index:
+            scores["baseline_guesses"] = solve(table, self.word, self.turns)
+        return scores
 
-        if self.results_dir:
-            self.save_results(final_state, total_time)
-
-    def save_results(self, final_state, total_time):
-        os.makedirs(self.results_dir, exist_ok=True)
-        game_id = str(uuid.uuid4())
+    def build_results(self, final_state, total_time):
         results = {
-            "id": game_id,
+            "id": self.run_id,
             "model": self.llm_name,
             "word": self.word,
             "guesses": [guess.word for guess in final_state["game"].guesses],
             "llm_responses": final_state["llm_responses_history"],
+            "rejected_guesses": final_state.get("rejected_guesses", []),
+            "local_repairs": final_state.get("local_repairs", 0),
+            "llm_heals": final_state.get("llm_heals", 0),
+            "timeline": final_state.get("timeline", []),
             "solved": final_state["game_won"],
-            "turns": final_state["step_count"],
+            "status": final_state.get("status"),
+            "budget_exhausted": final_state.get("budget_exhausted"),
+            "usage": final_state.get("usage"),
+            "turns": len(final_state["game"].guesses),
             "time": total_time,
         }
-        with open(os.path.join(self.results_dir, f"{game_id}.json"), "w") as f:
-            json.dump(results, f, indent=4)
\ No newline at end of file
+        if self.stream:
+            results["streaming"] = final_state.get("stream_stats")
+        if self.pattern_table:
+            results.update(self.score_against_baseline(final_state["game"]))
+        return results
+
+    def save_results(self, results):
+        os.makedirs(self.results_dir, exist_ok=True)
+        with open(os.path.join(self.results_dir, f"{results['id']}.json"), "w") as f:
+            json.dump(results, f, indent=4)
+        append_result(self.results_dir, "wordle", results)
\ No newline at end of file
@@ -0,0 +1,113 @@
+import argparse
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .main import add_game_arguments
+from bracket_city_eval.budget import (add_sweep_budget_arguments, budget_limits, configure_model_prices,
+                                      configure_sweep_budget, get_sweep_usage, sweep_budget_exhausted)
+from bracket_city_eval.llm_cache import configure_cache
+from bracket_city_eval.rate_limit import configure_rate_limits, format_rate_limit_stats, get_rate_limit_stats
+from bracket_city_eval.startup_profile import start_profile, finish_profile
+
+def parse_list(value: str) -> list[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+def load_words(words: list[str] | None, word_file: str | None) -> list[str]:
+    """Target words from the command line and/or a newline separated file, in order and without duplicates."""
+    all_words = list(words or [])
+    if word_file:
+        with open(word_file, "r") as f:
+            all_words.extend(line.strip().lower() for line in f if line.strip())
+    return list(dict.fromkeys(all_words))
+
+def run_batch(models: list[str], words: list[str], workers: int = 8, **agent_kwargs) -> list[dict]:
+    """
+    Plays every (model, word) game on a pool of `workers` threads. Each game's results file is written
+    as soon as it finishes; failed games are logged and left out of the returned results, as are games
+    not started because the batch's budget (see bracket_city_eval.budget.configure_sweep_budget) ran out.
+    """
+    from .agent import WordleAgent
+
+    def play(model, word):
+        if reason := sweep_budget_exhausted():
+            logging.warning(f"Skipping model: {model}, word: {word}: {reason}")
+            return None
+        return WordleAgent(llm_name=model, word=word, **agent_kwargs).run()
+
+    results = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # Words on the outer loop so that early games are spread across all models
+        futures = {pool.submit(play, model, word): (model, word) for word in words for model in models}
+        for done, future in enumerate(as_completed(futures), start=1):
+            model, word = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                logging.error(f"Game failed (model: {model}, word: {word}): {e}")
+                continue
+            if result is None:
+                continue
+            results.append(result)
+            logging.info(f"[{done}/{len(futures)}] {model} / {word}: {'solved' if result['solved'] else 'failed'} in {result['turns']} turns")
+    return results
+
+def format_summary(results: list[dict]) -> str:
+    """Per-model table of games played, solve rate, mean turns on solved games and mean time per game."""
+    by_model = {}
+    for result in results:
+        by_model.setdefault(result["model"], []).append(result)
+
+    header = f"{'model':<40} {'games':>6} {'solved':>7} {'rate':>7} {'turns':>6} {'time(s)':>8}"
+    lines = [header, "-" * len(header)]
+    for model, games in sorted(by_model.items()):
+        solved = [g for g in games if g["solved"]]
+        mean_turns = sum(g["turns"] for g in solved) / len(solved) if solved else float("nan")
+        mean_time = sum(g["time"] for g in games) / len(games)
+        lines.append(f"{model:<40} {len(games):>6} {len(solved):>7} {len(solved) / len(games):>7.1%} {mean_turns:>6.2f} {mean_time:>8.1f}")
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Play Wordle for every combination of models and words in one process.")
+    parser.add_argument("--models", type=parse_list, required=True, help="Comma separated model names.")
+    parser.add_argument("--words", type=parse_list, default=None, help="Comma separated target words.")
+    parser.add_argument("--word-file", type=str, default=None, help="File with one target word per line.")
+    parser.add_argument("--workers", type=int, default=8, help="Number of games played concurrently (default: 8).")
+    add_game_arguments(parser)
+    add_sweep_budget_arguments(parser)
+    args = parser.parse_args()
+    profiler = start_profile(args.startup_profile)
+
+    logging.basicConfig(level=getattr(logging, args.log_level), format='%(asctime)s - %(levelname)s - %(threadName)s - %(message)s')
+    configure_cache(args.cache, args.cache_path, args.cache_max_mb)
+    configure_rate_limits(args.rate_limits)
+    configure_sweep_budget(budget_limits(args, prefix="sweep_max_"))
+    # Replays make no calls, so they never fetch the price table
+    configure_model_prices(fetch=args.cache != "read")
+
+    words = load_words(args.words, args.word_file)
+    if not words:
+        parser.error("no target words given; use --words and/or --word-file")
+
+    start_time = time.time()
+    results = run_batch(
+        args.models,
+        words,
+        workers=args.workers,
+        turns=args.turns,
+        results_dir=args.results_dir,
+        word_list=args.word_list,
+        candidate_hint=args.candidate_hint,
+        pattern_table=args.pattern_table,
+        stream=args.stream,
+        budget=budget_limits(args),
+    )
+    print(f"\n{len(results)} / {len(args.models) * len(words)} games finished in {time.time() - start_time:.1f}s\n")
+    print(format_summary(results))
+    if get_sweep_usage() is not None:
+        print(f"\nBatch usage: {get_sweep_usage()}")
+    print(f"\n{format_rate_limit_stats(get_rate_limit_stats())}")
+    finish_profile(profiler)
+
+if __name__ == "__main__":
+    main()
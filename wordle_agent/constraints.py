@@ -0,0 +1,92 @@
+import logging
+import numpy as np
+
+# Feedback for a guess is encoded as a base-3 number: position i contributes color * 3**i
+GRAY, YELLOW, GREEN = 0, 1, 2
+WORD_LENGTH = 5
+
+def load_word_list(path: str) -> list[str]:
+    """Loads a newline separated word list, keeping unique five letter alphabetic words in file order."""
+    with open(path, "r") as f:
+        words = [line.strip().lower() for line in f]
+    return list(dict.fromkeys(w for w in words if len(w) == WORD_LENGTH and w.isascii() and w.isalpha()))
+
+def encode_words(words) -> np.ndarray:
+    """
+    Encodes words as a (5, N) uint8 array of letter indices (a=0 ... z=25), one row per letter position.
+    Position-major layout keeps every per-position comparison on a contiguous array.
+    """
+    if len(words) == 0:
+        return np.zeros((WORD_LENGTH, 0), dtype=np.uint8)
+    raw = np.frombuffer("".join(words).encode("ascii"), dtype=np.uint8).reshape(-1, WORD_LENGTH)
+    return np.ascontiguousarray((raw - ord("a")).T)
+
+def feedback_codes(guess: np.ndarray, answers: np.ndarray) -> np.ndarray:
+    """
+    Computes the feedback pattern of one encoded guess (5 letter indices) against every encoded
+    answer (a (5, N) array from encode_words), as base-3 codes.
+    Repeated letters follow the game's rules: greens are assigned first, then yellows left to right
+    while unmatched copies of the letter remain in the answer.
+    """
+    greens = [answers[j] == guess[j] for j in range(WORD_LENGTH)]
+    codes = np.zeros(answers.shape[1], dtype=np.uint8)
+    available = {}  # letter -> copies in each answer not already matched by a green
+    claimed = {}  # letter -> copies already handed out as yellows earlier in the guess
+    for i in range(WORD_LENGTH):
+        letter = int(guess[i])
+        if letter not in available:
+            available[letter] = sum(((answers[j] == letter) & ~greens[j]).view(np.uint8) for j in range(WORD_LENGTH))
+            claimed[letter] = np.zeros(answers.shape[1], dtype=np.uint8)
+        yellow = ~greens[i] & (available[letter] > claimed[letter])
+        claimed[letter] += yellow.view(np.uint8)
+        codes += greens[i].view(np.uint8) * np.uint8(GREEN * 3 ** i) + yellow.view(np.uint8) * np.uint8(YELLOW * 3 ** i)
+    return codes
+
+def pattern_code(colors) -> int:
+    """Encodes a sequence of per-letter colors (GRAY/YELLOW/GREEN) as a base-3 pattern code."""
+    return int(sum(int(color) * 3 ** i for i, color in enumerate(colors)))
+
+class CandidateSet:
+    """
+    The words still consistent with all the feedback seen so far, kept as an index array over a word list.
+    Each update compares the guess against the remaining candidates only, so it gets cheaper as the set shrinks.
+    """
+
+    def __init__(self, words: list[str]):
+        self.words = np.array(words)
+        self.codes = encode_words(words)
+        self._index = {word: i for i, word in enumerate(words)}
+        self.remaining = np.arange(len(words))
+
+    @property
+    def count(self) -> int:
+        return len(self.remaining)
+
+    def is_known_word(self, word: str) -> bool:
+        return word in self._index
+
+    def is_consistent(self, word: str) -> bool:
+        """True when the word could still be the answer given the feedback so far."""
+        i = self._index.get(word)
+        if i is None:
+            return False
+        # remaining stays sorted, so a binary search is enough
+        pos = np.searchsorted(self.remaining, i)
+        return pos < self.count and self.remaining[pos] == i
+
+    def update(self, guess: str, colors) -> int:
+        """Keeps only candidates that would have produced the observed feedback. Returns the remaining count."""
+        if len(guess) != WORD_LENGTH or not guess.isascii() or not guess.isalpha():
+            return self.count
+        observed = pattern_code(colors)
+        codes = feedback_codes(encode_words([guess.lower()])[:, 0], self.codes[:, self.remaining])
+        self.remaining = self.remaining[codes == observed]
+        if self.count == 0:
+            logging.warning("No words in the word list match the feedback so far; candidate checks are disabled.")
+        return self.count
+
+    def sample(self, k: int, seed: int | None = None) -> list[str]:
+        """Returns up to k remaining candidates, chosen at random."""
+        rng = np.random.default_rng(seed)
+        picked = rng.choice(self.remaining, size=min(k, self.count), replace=False)
+        return [str(w) for w in self.words[np.sort(picked)]]
@@ -1,11 +1,22 @@
 from typing_extensions import TypedDict
 from wordle import wordle
-from langgraph.graph import StateGraph, END
+import functools
 import os
 import logging
 import re
-from llmutils.llm_with_retry import call_llm_with_retry
-from llmutils.self_healing import heal_llm_output
+from bracket_city_eval.budget import BUDGET_EXHAUSTED, budget_exhausted, record_usage
+from bracket_city_eval.llm_cache import CacheMissError, cached_completion
+from bracket_city_eval.llm_stream import stream_completion, add_stream_stats
+from bracket_city_eval.llm_utils import get_chat_model
+from bracket_city_eval.rate_limit import request_slot
+from bracket_city_eval.repair import repair_guess
+from bracket_city_eval.timeline import span, timed_node
+from .constraints import CandidateSet, GRAY, YELLOW, GREEN
+
+OPENROUTER_BASE_URL = os.environ.get("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+
+# Guesses that break the known constraints are sent back to the model at most this many times per turn
+MAX_REJECTIONS_PER_TURN = 3
 
 class State(TypedDict):
     game: wordle.Wordle
@@ -17,6 +28,20 @@ class State(TypedDict):
     game_over: bool
     game_won: bool
     model_name: str
+    candidates: CandidateSet | None # Words still consistent with the feedback, when a word list is given
+    candidate_hint: str # "none", "count" or "sample": what to tell the model about the candidates
+    rejection: str | None # Why the last guess was sent back without being played
+    turn_rejections: int
+    rejected_guesses: list[str]
+    stream: bool # Stream responses and stop generating once a guess has been written
+    stream_stats: dict | None # Running totals from llm_stream.add_stream_stats
+    local_repairs: int # Unparseable responses fixed by bracket_city_eval.repair without an LLM call
+    llm_heals: int # Unparseable responses sent to the LLM healer
+    timeline: list[dict] # One span per node run (see bracket_city_eval.timeline)
+    usage: dict | None # Prompt, completion and reasoning tokens and cost so far, summed from the timeline
+    budget: dict | None # Limits on the usage fields that end the game early (see bracket_city_eval.budget)
+    status: str | None # "won", "lost" or BUDGET_EXHAUSTED once the game is over
+    budget_exhausted: str | None # The limit that ended the game, when a budget did
 
 def get_prompt_template():
     prompt_path = os.path.join(os.path.dirname(__file__), "prompt.md")
@@ -38,13 +63,39 @@ def map_color_to_char(color: wordle.LetterColor):
     else: # LetterColor.GRAY
         return "X"
 
+def map_color_to_code(color: wordle.LetterColor):
+    if color == wordle.LetterColor.GREEN:
+        return GREEN
+    elif color == wordle.LetterColor.YELLOW:
+        return YELLOW
+    else: # LetterColor.GRAY
+        return GRAY
+
+def format_constraint_notes(state: State):
+    """Extra prompt lines about a rejected guess and the remaining candidates. Empty when there is nothing to add."""
+    notes = []
+    if state.get("rejection"):
+        notes.append(state["rejection"])
+    candidates = state.get("candidates")
+    if candidates is not None and candidates.count > 0:
+        if state.get("candidate_hint") == "count":
+            notes.append(f"{candidates.count} words in the word list are still consistent with the feedback.")
+        elif state.get("candidate_hint") == "sample":
+            notes.append(f"{candidates.count} words in the word list are still consistent with the feedback, "
+                         f"for example: {', '.join(candidates.sample(10))}.")
+    return "".join(note + "\n\n" for note in notes)
+
 def pre_hook_node(state: State):
     if len(state["game"].guesses) >= state["game"].turns or (len(state["game"].guesses) > 0 and state["game"].guesses[-1].word == state["game"].word):
-        return {"game_over": True, "game_won": len(state["game"].guesses) > 0 and state["game"].guesses[-1].word == state["game"].word}
+        won = len(state["game"].guesses) > 0 and state["game"].guesses[-1].word == state["game"].word
+        return {"game_over": True, "game_won": won, "status": "won" if won else "lost"}
+    if reason := budget_exhausted(state):
+        logging.warning(f"Ending the game after {len(state['game'].guesses)} guesses: {reason}")
+        return {"game_over": True, "game_won": False, "status": BUDGET_EXHAUSTED, "budget_exhausted": reason}
     
     game_history = format_history(state["game"])
     prompt_template = get_prompt_template()
-    llm_message = prompt_template.format(game_history=game_history)
+    llm_message = prompt_template.format(game_history=game_history, constraint_notes=format_constraint_notes(state))
     
     return {
         "llm_message": llm_message,
@@ -52,17 +103,66 @@ def pre_hook_node(state: State):
         "game_won": False,
     }
 
+def stream_llm_node(state: State):
+    """call_llm_node for streamed runs: cancels the generation once a `guess:` line has been written."""
+    logging.debug(f"Streaming LLM response for message: {state['llm_message']}")
+    history = state.get("llm_responses_history", [])
+    infos = []
+
+    def call():
+        # The pooled chat model shared with bracket_city_eval, which also asks OpenRouter to report each call's cost
+        llm = get_chat_model(state["model_name"], OPENROUTER_BASE_URL)
+        text, info = stream_completion(llm, state["model_name"], state["llm_message"],
+                                       detect_answer=lambda line: parse_guess(line) is not None)
+        infos.append(info)
+        return text
+
+    try:
+        # Early-stopped responses are truncated, so they get their own cache entries
+        response_content = cached_completion(state["model_name"], state["llm_message"], call, params={"early_stop": "guess"})
+        logging.debug(f"LLM Response before healing: {response_content}")
+        history.append(response_content)
+        return {"llm_responses_history": history, "llm_response": response_content,
+                "stream_stats": add_stream_stats(state.get("stream_stats"), infos[-1] if infos else None)}
+    except CacheMissError:
+        raise  # in replay mode; a replay that cannot be reproduced must fail, not take another path
+    except Exception as e_call:
+        logging.error(f"LLM call failed after multiple retries: {e_call}")
+        return {"llm_response": "", "llm_responses_history": history}
+
+def with_token_count(model_name: str, call):
+    """
+    Runs an llmutils call in a rate limiter slot and records its token usage and cost on the current timeline
+    span. llmutils only returns text, so usage is collected from its langchain calls with get_openai_callback,
+    whose cost only knows OpenAI's own model names; the cost is estimated from OpenRouter's prices instead.
+    llmutils retries internally, so the slot covers all of its attempts.
+    """
+    from langchain_community.callbacks import get_openai_callback
+    with get_openai_callback() as cb, request_slot(model_name, OPENROUTER_BASE_URL):
+        result = call()
+    record_usage(model_name, cb.prompt_tokens, cb.completion_tokens, cb.reasoning_tokens)
+    return result
+
 def call_llm_node(state: State):
+    if state.get("stream", False):
+        return stream_llm_node(state)
+    from llmutils.llm_with_retry import call_llm_with_retry
     logging.debug(f"Calling LLM with message: {state['llm_message']}")
     try:
-        response_content = call_llm_with_retry(
-            model_name=state["model_name"],
-            prompt_message=state["llm_message"]
+        response_content = cached_completion(
+            state["model_name"],
+            state["llm_message"],
+            lambda: with_token_count(state["model_name"], lambda: call_llm_with_retry(
+                model_name=state["model_name"],
+                prompt_message=state["llm_message"]
+            )),
         )
         logging.debug(f"LLM Response before healing: {response_content}")
         history = state.get("llm_responses_history", [])
         history.append(response_content)
         return {"llm_responses_history": history, "llm_response": response_content}
+    except CacheMissError:
+        raise
     except Exception as e_call:
         logging.error(f"LLM call failed after multiple retries: {e_call}")
         return {"llm_response": "", "llm_responses_history": state.get("llm_responses_history", [])}
@@ -74,30 +174,65 @@ def parse_guess(response: str) -> str | None:
     return None
 
 def take_turn_node(state: State):
+    from llmutils.self_healing import heal_llm_output
     guess = parse_guess(state["llm_response"])
+    candidates = state.get("candidates")
+    repair_counts = {}
+    if not guess:
+        # Most malformed responses only differ in markup; fix those locally before paying for a healing call
+        guess = repair_guess(state["llm_response"], candidates.is_known_word if candidates is not None else None)
+        if guess:
+            logging.info(f"Repaired unparseable LLM response locally: guess {guess}")
+            repair_counts["local_repairs"] = state.get("local_repairs", 0) + 1
     if not guess:
         logging.warning(f"Could not parse guess from LLM response: {state['llm_response']}. Attempting to heal.")
+        repair_counts["llm_heals"] = state.get("llm_heals", 0) + 1
         try:
-            healed_response = heal_llm_output(
-                broken_text=state["llm_response"],
-                expected_format="guess: <five letter word>",
-                model_name=state["model_name"]
-            )
+            with span("heal", state["step_count"]):
+                healed_response = cached_completion(
+                    state["model_name"],
+                    state["llm_response"],
+                    lambda: with_token_count(state["model_name"], lambda: heal_llm_output(
+                        broken_text=state["llm_response"],
+                        expected_format="guess: <five letter word>",
+                        model_name=state["model_name"]
+                    )),
+                    params={"heal_expected_format": "guess: <five letter word>"},
+                )
             guess = parse_guess(healed_response)
             if not guess:
                 logging.error(f"Failed to heal and parse guess from response: {healed_response}")
-                return {"step_count": state["step_count"] + 1}
+                return {"step_count": state["step_count"] + 1, **repair_counts}
+        except CacheMissError:
+            raise
         except Exception as e_heal:
             logging.error(f"Failed to heal and make a guess: {e_heal}")
-            return {"step_count": state["step_count"] + 1}
+            return {"step_count": state["step_count"] + 1, **repair_counts}
+
+    # Only known words can be checked against the feedback: the word list may hold just the possible answers,
+    # so a word missing from it can still be a valid guess. Rejections are not turns, so step_count is left alone.
+    if (candidates is not None and candidates.count > 0 and candidates.is_known_word(guess)
+            and not candidates.is_consistent(guess) and state.get("turn_rejections", 0) < MAX_REJECTIONS_PER_TURN):
+        reason = "contradicts the feedback from your previous guesses"
+        logging.warning(f"Rejected guess {guess} before playing it: it {reason}.")
+        return {
+            "rejection": f"Your guess '{guess}' was not played because it {reason}. Choose a different word.",
+            "turn_rejections": state.get("turn_rejections", 0) + 1,
+            "rejected_guesses": state.get("rejected_guesses", []) + [guess],
+            **repair_counts,
+        }
 
     try:
         state["game"].guess_word(guess)
-        logging.info(f"Guess: {guess} -> {"".join(map_color_to_char(color) for color in state["game"].guesses[-1].colors)}")
-        return {"step_count": state["step_count"] + 1}
+        colors = state["game"].guesses[-1].colors
+        logging.info(f"Guess: {guess} -> {"".join(map_color_to_char(color) for color in colors)}")
+        if candidates is not None:
+            remaining = candidates.update(guess, [map_color_to_code(color) for color in colors])
+            logging.debug(f"{remaining} candidate words remaining")
+        return {"step_count": state["step_count"] + 1, "rejection": None, "turn_rejections": 0, **repair_counts}
     except ValueError as e:
         logging.warning(f"Invalid guess: {e}.")
-        return {"step_count": state["step_count"] + 1}
+        return {"step_count": state["step_count"] + 1, **repair_counts}
 
     return {
         "llm_message": None,
@@ -110,24 +245,39 @@ def should_continue(state: State):
     else:
         return "call_llm"
 
-workflow = StateGraph(State)
+@functools.cache
+def get_app(checkpointer=None):
+    """
+    Builds and compiles the game graph on first use, keeping langgraph out of the import path.
+    With a checkpointer (see bracket_city_eval.checkpoints) the state is saved after every step.
+    """
+    from langgraph.graph import StateGraph, END
+
+    workflow = StateGraph(State)
+
+    # Every node records a span in state["timeline"]
+    workflow.add_node("pre_hook", timed_node("pre_hook", pre_hook_node))
+    workflow.add_node("call_llm", timed_node("call_llm", call_llm_node))
+    workflow.add_node("take_turn", timed_node("take_turn", take_turn_node))
 
-workflow.add_node("pre_hook", pre_hook_node)
-workflow.add_node("call_llm", call_llm_node)
-workflow.add_node("take_turn", take_turn_node)
+    workflow.set_entry_point("pre_hook")
 
-workflow.set_entry_point("pre_hook")
+    workflow.add_conditional_edges(
+        "pre_hook",
+        should_continue,
+        {
+            "end": END,
+            "call_llm": "call_llm",
+        },
+    )
 
-workflow.add_conditional_edges(
-    "pre_hook",
-    should_continue,
-    {
-        "end": END,
-        "call_llm": "call_llm",
-    },
-)
+    workflow.add_edge("call_llm", "take_turn")
+    workflow.add_edge("take_turn", "pre_hook")
 
-workflow.add_edge("call_llm", "take_turn")
-workflow.add_edge("take_turn", "pre_hook")
+    return workflow.compile(checkpointer=checkpointer)
 
-app = workflow.compile()
\ No newline at end of file
+def __getattr__(name):
+    # Keeps `graph.app` working for existing callers while compiling lazily
+    if name == "app":
+        return get_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,20 +1,58 @@
 import logging
 import argparse
 import os
-from .agent import WordleAgent
+from bracket_city_eval.budget import add_budget_arguments, budget_limits, configure_model_prices
+from bracket_city_eval.checkpoints import add_checkpoint_arguments
+from bracket_city_eval.llm_cache import add_cache_arguments, configure_cache
+from bracket_city_eval.rate_limit import add_rate_limit_arguments, configure_rate_limits
+from bracket_city_eval.startup_profile import start_profile, finish_profile
 
-def main():
-    parser = argparse.ArgumentParser(description="Play a game of Wordle with an LLM agent.")
-    parser.add_argument("--model", type=str, default="openai/gpt-4.1-mini", help="The name of the language model to use.")
+def add_game_arguments(parser):
+    """Options shared by the single game and the batch entry points."""
     parser.add_argument("--turns", type=int, default=6, help="The number of turns to play.")
-    parser.add_argument("--word", type=str, required=True, help="The target word to guess.")
     parser.add_argument("--log-level", type=str, default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"], help="The logging level to use.")
     parser.add_argument("--results-dir", type=str, default=os.path.join(os.path.dirname(__file__), "results"), help="The directory to save the results to.")
+    parser.add_argument("--word-list", type=str, default=None, help="Word list file; enables rejecting guesses from it that break the known constraints (other words are played as they are).")
+    parser.add_argument("--candidate-hint", type=str, default="none", choices=["none", "count", "sample"], help="What to tell the model about the remaining candidate words (requires --word-list).")
+    parser.add_argument("--pattern-table", type=str, default=None, help="Pattern table built with wordle_agent.patterns; adds per-turn regret and an entropy baseline to the results.")
+    parser.add_argument("--stream", action="store_true", help="Stream responses and cancel the generation once a guess has been written.")
+    add_budget_arguments(parser)
+    add_cache_arguments(parser)
+    add_rate_limit_arguments(parser)
+    parser.add_argument("--startup-profile", action="store_true", help="Print the time spent importing each module when the run finishes.")
+
+def main():
+    parser = argparse.ArgumentParser(description="Play a game of Wordle with an LLM agent.")
+    parser.add_argument("--model", type=str, default="openai/gpt-4.1-mini", help="The name of the language model to use.")
+    parser.add_argument("--word", type=str, help="The target word to guess (required unless --resume is given).")
+    add_game_arguments(parser)
+    add_checkpoint_arguments(parser)
     args = parser.parse_args()
+    if args.resume is None and args.word is None:
+        parser.error("--word is required unless --resume is given")
+    profiler = start_profile(args.startup_profile)
 
     logging.basicConfig(level=getattr(logging, args.log_level), format='%(asctime)s - %(levelname)s - %(message)s')
-    agent = WordleAgent(llm_name=args.model, word=args.word, turns=args.turns, results_dir=args.results_dir)
-    agent.run()
+    configure_cache(args.cache, args.cache_path, args.cache_max_mb)
+    configure_rate_limits(args.rate_limits)
+    # Replays make no calls, so they never fetch the price table
+    configure_model_prices(fetch=args.cache != "read")
+    # Imported here so that --help and argument errors do not pay for numpy, langchain and langgraph
+    from .agent import WordleAgent
+    if args.resume:
+        # The model, word and game options come from the checkpoint
+        agent = WordleAgent.resume(args.resume, args.checkpoint_path, results_dir=args.results_dir,
+                                   word_list=args.word_list, pattern_table=args.pattern_table)
+        agent.run(resume=True)
+    else:
+        agent = WordleAgent(llm_name=args.model, word=args.word, turns=args.turns, results_dir=args.results_dir,
+                            word_list=args.word_list, candidate_hint=args.candidate_hint, pattern_table=args.pattern_table,
+                            stream=args.stream, checkpoint_path=args.checkpoint_path if args.checkpoint else None,
+                            budget=budget_limits(args))
+        if args.checkpoint:
+            logging.info(f"Checkpointing run {agent.run_id} to {args.checkpoint_path}; continue it with --resume {agent.run_id}")
+        agent.run()
+    finish_profile(profiler)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
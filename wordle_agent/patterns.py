@@ -0,0 +1,165 @@
+import argparse
+import functools
+import json
+import logging
+import os
+import time
+import numpy as np
+
+from .constraints import encode_words, feedback_codes, load_word_list
+
+NUM_PATTERNS = 3 ** 5
+# Rows of the guess x answer table scored at once when computing entropies, to bound memory use
+_ENTROPY_CHUNK = 2048
+
+def _words_path(path: str) -> str:
+    return os.path.splitext(path)[0] + ".words.json"
+
+def build_pattern_matrix(guesses: list[str], answers: list[str]) -> np.ndarray:
+    """Computes the (guesses x answers) table of base-3 feedback codes as uint8."""
+    answer_codes = encode_words(answers)
+    guess_codes = encode_words(guesses)
+    matrix = np.empty((len(guesses), len(answers)), dtype=np.uint8)
+    for i in range(len(guesses)):
+        matrix[i] = feedback_codes(guess_codes[:, i], answer_codes)
+    return matrix
+
+class PatternTable:
+    """
+    Precomputed feedback for every (guess, answer) pair, stored as a .npy file that is memory-mapped on load,
+    so it opens instantly and its pages are shared between processes. The word lists live in a sidecar
+    <name>.words.json file next to it.
+    """
+
+    def __init__(self, guesses: list[str], answers: list[str], matrix: np.ndarray):
+        self.guesses = guesses
+        self.answers = answers
+        self.matrix = matrix
+        self.guess_index = {word: i for i, word in enumerate(guesses)}
+        self.answer_index = {word: i for i, word in enumerate(answers)}
+
+    @classmethod
+    def build(cls, guesses: list[str], answers: list[str], path: str) -> "PatternTable":
+        matrix = build_pattern_matrix(guesses, answers)
+        np.save(path, matrix)
+        with open(_words_path(path), "w") as f:
+            json.dump({"guesses": guesses, "answers": answers}, f)
+        return cls.load(path)
+
+    @classmethod
+    def load(cls, path: str) -> "PatternTable":
+        with open(_words_path(path), "r") as f:
+            words = json.load(f)
+        matrix = np.load(path, mmap_mode="r")
+        if matrix.shape != (len(words["guesses"]), len(words["answers"])):
+            raise ValueError(f"Pattern table {path} does not match its word lists")
+        return cls(words["guesses"], words["answers"], matrix)
+
+    def all_answers(self) -> np.ndarray:
+        return np.arange(len(self.answers))
+
+    def feedback(self, guess: str, candidates: np.ndarray) -> np.ndarray:
+        """Feedback codes of `guess` against the candidate answer ids; guesses missing from the table are scored directly."""
+        if guess in self.guess_index:
+            return self.matrix[self.guess_index[guess], candidates]
+        return feedback_codes(encode_words([guess])[:, 0], encode_words([self.answers[i] for i in candidates]))
+
+    def filter(self, candidates: np.ndarray, guess: str, code: int) -> np.ndarray:
+        """Keeps the candidate answer ids that would give `code` for `guess`."""
+        return candidates[self.feedback(guess, candidates) == code]
+
+    def entropy(self, guess: str, candidates: np.ndarray) -> float:
+        """Expected information (bits) from playing `guess` when the answer is uniform over `candidates`."""
+        counts = np.bincount(self.feedback(guess, candidates), minlength=NUM_PATTERNS)
+        return float(_entropy(counts[None, :])[0])
+
+    def entropies(self, candidates: np.ndarray) -> np.ndarray:
+        """Expected information of every guess in the table against `candidates`."""
+        result = np.empty(len(self.guesses))
+        offsets = None
+        for start in range(0, len(self.guesses), _ENTROPY_CHUNK):
+            block = np.asarray(self.matrix[start:start + _ENTROPY_CHUNK][:, candidates], dtype=np.int64)
+            if offsets is None or len(offsets) != len(block):
+                offsets = (np.arange(len(block)) * NUM_PATTERNS)[:, None]
+            counts = np.bincount((block + offsets).ravel(), minlength=len(block) * NUM_PATTERNS)
+            result[start:start + len(block)] = _entropy(counts.reshape(len(block), NUM_PATTERNS))
+        return result
+
+    def best_guess(self, candidates: np.ndarray) -> tuple[str, float]:
+        """The entropy-maximizing guess and its entropy, preferring guesses that could be the answer on ties."""
+        if len(candidates) == 1:
+            return self.answers[candidates[0]], 0.0
+        scores = self.entropies(candidates)
+        # Small bonus so that, of equally informative guesses, one that might win outright is chosen
+        is_candidate = np.zeros(len(self.guesses), dtype=bool)
+        candidate_words = {self.answers[i] for i in candidates}
+        is_candidate[[self.guess_index[w] for w in candidate_words if w in self.guess_index]] = True
+        best = int(np.argmax(scores + is_candidate * 1e-9))
+        return self.guesses[best], float(scores[best])
+
+def _entropy(counts: np.ndarray) -> np.ndarray:
+    totals = counts.sum(axis=1, keepdims=True)
+    p = np.divide(counts, totals, out=np.zeros(counts.shape), where=totals > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(p > 0, p * np.log2(1 / p), 0.0).sum(axis=1)
+
+@functools.lru_cache(maxsize=None)
+def load_pattern_table(path: str) -> PatternTable:
+    """Loads (once per process) the pattern table at path."""
+    return PatternTable.load(path)
+
+def solve(table: PatternTable, answer: str, max_turns: int = 6) -> list[str]:
+    """Plays the entropy-maximizing strategy against `answer` and returns its guesses."""
+    answer_id = table.answer_index[answer]
+    candidates = table.all_answers()
+    guesses = []
+    while len(guesses) < max_turns:
+        guess, _ = table.best_guess(candidates)
+        guesses.append(guess)
+        if guess == answer:
+            break
+        code = int(table.matrix[table.guess_index[guess], answer_id])
+        candidates = table.filter(candidates, guess, code)
+    return guesses
+
+def score_guesses(table: PatternTable, played: list[tuple[str, int]]) -> list[dict]:
+    """
+    Scores each played guess (word, observed feedback code) against the entropy-maximizing choice
+    given the feedback before it. Regret is the information (bits) given up relative to that best guess.
+    Guesses that are not in the table are scored and filtered on by computing their feedback directly.
+    """
+    candidates = table.all_answers()
+    scores = []
+    for word, code in played:
+        best_word, best_entropy = table.best_guess(candidates)
+        entropy = table.entropy(word, candidates)
+        scores.append({
+            "guess": word,
+            "candidates_before": int(len(candidates)),
+            "entropy": entropy,
+            "best_guess": best_word,
+            "best_entropy": best_entropy,
+            "regret": max(best_entropy - entropy, 0.0),
+        })
+        candidates = table.filter(candidates, word, code)
+        if len(candidates) == 0:
+            # The answer is not in the table's answer list; nothing further can be scored
+            break
+    return scores
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the precomputed Wordle feedback pattern table.")
+    parser.add_argument("--guesses", type=str, required=True, help="Word list of allowed guesses.")
+    parser.add_argument("--answers", type=str, default=None, help="Word list of possible answers (default: same as --guesses).")
+    parser.add_argument("--out", type=str, required=True, help="Output .npy path; the word lists are written next to it.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    guesses = load_word_list(args.guesses)
+    answers = load_word_list(args.answers) if args.answers else guesses
+    start = time.time()
+    table = PatternTable.build(guesses, answers, args.out)
+    logging.info(f"Built {table.matrix.shape[0]} x {table.matrix.shape[1]} pattern table in {time.time() - start:.1f}s: {args.out}")
+
+if __name__ == "__main__":
+    main()